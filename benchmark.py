@@ -0,0 +1,135 @@
+"""The benchmark module.
+
+Time and memory-profile cleaning, (each branch of :func:`clean.clean`, and the helpers they call,) on synthetic data,
+(see :mod:`synthetic`,) at several scales:
+
+    $ python benchmark.py [ROWS ...]
+
+For each scale, (`scales` by default,) generate raw tables with a `Master` of that many rows into a temporary directory,
+clean every dataframe into another, (in `clean.build_order`,) and then run each helper in `helpers` on the cleaned
+dataframes.  Each stage runs in a process of its own, so one stage's memory doesn't count against the next, and reports
+how long it took and how much it grew the process's peak memory, (its maximum resident set size,) beyond what loading
+its inputs took.  The results are printed as a table, one row per stage, with seconds and peak MB for each scale.
+
+"""
+import os, sys, time, shutil, tempfile, gc, multiprocessing
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+import clean
+import synthetic
+
+# the numbers of rows of `Master` to benchmark at
+scales = [10000, 100000, 1000000]
+
+# the helpers to benchmark, after everything is cleaned: each one's name, the cleaned dataframes it takes, (loaded before
+# it's timed,) and the function to call with them; helpers that take `master` get `master_all`, which has every row
+helpers = OrderedDict([('get_refused_vectorized',              (['master_all'], clean.get_refused_vectorized)),
+                       ('get_age_entered_vectorized',          (['master_all'], clean.get_age_entered_vectorized)),
+                       ('bucketize',                           (['master_all'], lambda df: clean.bucketize(df['AgeEntered'], clean.age_bucket_spec))),
+                       ('get_family_composition',              (['master_all'], clean.get_family_composition)),
+                       ('get_race_ethnicity_4_way_vectorized', (['master_all'], clean.get_race_ethnicity_4_way_vectorized)),
+                       ('get_disabilities',                    ([], lambda: clean.get_disabilities('entry_disabilities'))),
+                       ('get_income',                          ([], lambda: clean.get_income('entry_income'))),
+                       ('get_ncb',                             ([], lambda: clean.get_ncb('entry_ncb'))),
+                       ('get_income_and_ncb',                  (['master_all'], lambda df: clean.get_income_and_ncb(df['EntryID']))),
+                       ('first_entries',                       (['master_all'], clean.first_entries)),
+                       ('get_services',                        (['master_all', 'services'], clean.get_services)),
+                       ('get_case_outcome_vectorized',         (['master_all'], clean.get_case_outcome_vectorized)),
+                       ('get_reentries',                       (['master_all'], clean.get_reentries)),
+                       ('get_delta_reentries',                 (['master_all'], lambda df: clean.get_delta_reentries(df, np.timedelta64(12, 'M')))),
+                       ('deduplicate_entry_id',                (['master_all'], clean.deduplicate_entry_id))])
+
+def benchmark(scales=scales, seed=0):
+    """Given numbers of rows, benchmark cleaning synthetic data with a `Master` of that many rows, and return a table of
+    each stage's seconds and peak memory growth, in MB, at each scale.  A stage that fails, (e.g. runs out of memory,)
+    gets NaNs, and so do the stages after it at that scale, if they need what it cleans.
+
+    :param scales: The numbers of rows of `Master`.
+    :type scales: list of int.
+    :param seed: The random seed for :func:`synthetic.generate`.
+    :type seed: int.
+    :rtype: pandas.DataFrame.
+
+    """
+    results = OrderedDict()
+    for n in scales:
+        root = tempfile.mkdtemp(prefix='benchmark_')
+        try:
+            clean.raw_path = os.path.join(root, 'raw')
+            clean.auxiliary_path = clean.raw_path
+            clean.clean_dir = os.path.join(root, 'clean')
+            for directory in (clean.raw_path, os.path.join(clean.clean_dir, 'pickles'),
+                              os.path.join(clean.clean_dir, clean.store_format + 's' if clean.store_format else 'csvs')):
+                os.makedirs(directory)
+            print "Generating {} rows".format(n)
+            synthetic.generate(n, clean.raw_path, seed=seed)
+            for df_name in clean.build_order(sorted(clean.raw_names)):
+                results[('clean', df_name), n] = measure('clean({})'.format(df_name), [], lambda df_name=df_name: clean.clean(df_name))
+            for name, (inputs, f) in helpers.iteritems():
+                results[('helper', name), n] = measure(name, inputs, f)
+        finally:
+            shutil.rmtree(root)
+    table = pd.DataFrame([[results[stage, n][i] for n in scales for i in (0, 1)] for stage in unique_stages(results)],
+                         index=pd.MultiIndex.from_tuples(unique_stages(results), names=['Kind', 'Stage']),
+                         columns=pd.MultiIndex.from_product([scales, ['Seconds', 'Peak MB']], names=['Rows', None]))
+    return table
+
+def unique_stages(results):
+    """Given the results of :func:`benchmark`, return the stages, in the order they ran.
+
+    """
+    return clean.unique_in_order([stage for stage, n in results])
+
+def measure(stage, inputs, f):
+    """Given a stage's name, the cleaned dataframes it takes, and its function, run it in a process of its own, and
+    return the seconds it took, and how much it grew the process's peak memory, in MB, beyond what loading its inputs
+    took; or NaNs, if it failed.
+
+    :param stage: The stage's name.
+    :type stage: str.
+    :param inputs: The cleaned dataframes to load and pass to `f`.
+    :type inputs: list of str.
+    :param f: The function.
+    :type f: function.
+    :rtype: tuple of float.
+
+    """
+    receiver, sender = multiprocessing.Pipe(False)
+    def run():
+        try:
+            frames = [clean.load_clean(df_name) for df_name in inputs]
+            gc.collect()
+            before = clean.peak_memory()
+            start = time.time()
+            f(*frames)
+            seconds = time.time() - start
+            sender.send((seconds, (clean.peak_memory() - before) / 2.**20))
+        except Exception:
+            sender.send((np.NaN, np.NaN))
+            raise
+    process = multiprocessing.Process(target=run)
+    process.start()
+    sender.close()
+    try:
+        result = receiver.recv()
+    except EOFError:
+        # the process was killed, (e.g. by the OOM killer,) before it could send anything
+        result = (np.NaN, np.NaN)
+    process.join()
+    print "{}: {:.2f} seconds, {:.1f} MB".format(stage, *result)
+    return result
+
+def print_usage():
+    print "benchmark.py"
+    print "Usage: python benchmark.py [ROWS ...]"
+    print
+    print "Benchmark cleaning synthetic data with a Master of each number of ROWS, ({} by default)".format(', '.join(str(s) for s in scales))
+
+if __name__ == '__main__':
+    if any(not a.isdigit() for a in sys.argv[1:]):
+        print_usage()
+    else:
+        table = benchmark([int(a) for a in sys.argv[1:]] or scales)
+        print
+        print table.to_string(float_format=lambda x: '{:.2f}'.format(x))
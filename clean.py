@@ -8,7 +8,7 @@ There are several functions that operate on `master`, and they all function on `
 """
 import pandas as pd
 import numpy as np
-import os, sys, datetime, dateutil
+import os, sys, datetime, dateutil, operator, hashlib, json, time, multiprocessing, resource
 
 # the path where the raw data resides
 raw_path = '/mnt/data/allchicago/data/'
@@ -18,121 +18,109 @@ auxiliary_path = '/mnt/data/allchicago/auxiliary_data/'
 script_dir = os.path.dirname(__file__)
 clean_dir = os.path.join(script_dir, 'clean')
 
+# the columnar format in which to store cleaned dataframes, alongside the pickles, instead of CSVs: 'parquet', 'feather',
+# or None, (for CSVs)
+store_format = 'parquet'
+# the number of rows in each parquet row group; :func:`load_clean` skips row groups that its `filters` rule out
+row_group_size = 100000
+# whether :func:`clean` traces the time, memory, and shape of each stage of cleaning, (see :class:`Trace`)
+profile = False
+
 def clean(df_name):
-    """Given the data frame name, load the raw data and cleaned dependencies, clean the raw data, and save it as a CSV
-    and a pickle.
+    """Given the data frame name, load the raw data and cleaned dependencies, clean the raw data, save it as a CSV and a
+    pickle, and return it.
+
+    If `profile` is set, trace the time, memory, and shape of each stage of cleaning, (see :class:`Trace`,) to
+    `profile_path(df_name)`, and print them.
 
     :param df_name: The dataframe to clean.  This should be in the form `entry_details`, not `EntryDetails`.
     :type df: str.
 
     """
+    trace = Trace(df_name)
+    # `load_raw` reads with the table's schema in `raw_schemas`, so dates are already parsed, and some replacements and
+    # row filters are already applied
     df = load_raw(df_name)
+    trace.stage('load_raw', df)
 
     # clean `master` and `master_all`
     if df_name.startswith('master'):
         # load `providers` and merge
         providers = load_clean('providers')
         df = pd.merge(df, providers, left_on='ProviderID', right_on='Provider', how='left')
+        trace.stage('providers', df)
 
-        df['DateCreated'] = pd.to_datetime(df['DateCreated'], format="%m/%d/%Y")
-        df['DateUpdated'] = pd.to_datetime(df['DateUpdated'], format="%m/%d/%Y")
-        # if we're cleaning `master`, (not `master_all`,) only take records after September 2012
-        if df_name == 'master':
-            df = df[df['DateCreated'] > switch_date]
-
-        df['Refused'] = df.apply(get_refused, axis=1)
+        df['Refused'] = get_refused_vectorized(df)
 
         df.replace({'Relationship to HoH': master_relationship_to_hoh_replacements}, inplace=True)
 
-        df['ProgramEntryDate'] = pd.to_datetime(df['ProgramEntryDate'], format="%m/%d/%Y")
         # replace default value of 1980-01-01 with pd.NaT
         df['ProgramEntryDate'].replace(datetime.datetime(1980,1,1), pd.NaT, inplace=True)
-        df['ProgramExitDate'] = pd.to_datetime(df['ProgramExitDate'], format="%m/%d/%Y")
         # replace default value of 1980-01-01 with pd.NaT
         df['ProgramExitDate'].replace(datetime.datetime(1980,1,1), pd.NaT, inplace=True)
         # compute `LengthOfStay` if possible
         df['LengthOfStay'] = (df['ProgramExitDate'] - df['ProgramEntryDate']).map(get_days_geq_0)
 
-        df['YearOfBirth'].replace('#NUM!', np.NaN, inplace=True)
-        df['YearOfBirth'] = pd.to_datetime(df['YearOfBirth'], format="%Y")
-
         # generate AgeEntered
-        df['AgeEntered'] = df.apply(get_age_entered, axis=1)
+        df['AgeEntered'] = get_age_entered_vectorized(df)
         # generate AgeEnteredBucket and AgeEnteredBucketDFSS for different categorizations
-        df['AgeEnteredBucket'] = df['AgeEntered'].apply(get_age_bucket)
-        df['AgeEnteredBucketDFSS'] = df['AgeEntered'].apply(get_dfss_age_bucket)
+        df['AgeEnteredBucket'] = bucketize(df['AgeEntered'], age_bucket_spec)
+        df['AgeEnteredBucketDFSS'] = bucketize(df['AgeEntered'], dfss_age_bucket_spec)
+        trace.stage('refused, dates, and age', df)
 
-        df = pd.merge(df, get_family_composition(df), on='EntryID', how='left')
+        df = df.join(get_family_composition(df))
+        trace.stage('family composition', df)
 
         df['Ethnicity'].replace(master_ethnicity_nans, np.NaN, inplace=True)
 
         df.replace({'PrimaryRace': master_primary_race_replacements}, inplace=True)
 
-        df['Race/Ethnicity (4-way)'] = df.apply(get_race_ethnicity_4_way, axis=1)
+        df['Race/Ethnicity (4-way)'] = get_race_ethnicity_4_way_vectorized(df)
 
         df['Veteran?'].replace(master_veteran_nans, np.NaN, inplace=True)
         # fill in all nulls with 'No (HUD)'
         # TODO this should just be a :func:`fillna`.
         df['Veteran?Imputed'] = df['Veteran?'].apply(impute_veteran)
+        trace.stage('race, ethnicity, and veteran', df)
 
-        # get entry disability information, merge, and fill in any missing rows with `False`s
-        df = pd.merge(df, get_disabilities('entry_disabilities').rename(columns=lambda x: x+" Entry"), left_on='EntryID', right_index=True, how='left')
-        df.fillna({d: False for d in disability_types_entry}, inplace=True)
+        # get entry disability information, as bool columns, (`False` for stays without any,) and join it
+        df = df.join(get_disabilities('entry_disabilities').dense(pd.unique(df['EntryID']), suffix=' Entry'), on='EntryID')
         df['Disabled? Entry'] = df[disability_types_entry].any(axis=1)
+        trace.stage('entry disabilities', df)
 
-        # get review disability information, merge, and fill in any missing rows with `False`s
-        df = pd.merge(df, get_disabilities('review_disabilities').rename(columns=lambda x: x+" Review"), left_on='EntryID', right_index=True, how='left')
-        df.fillna({d: False for d in disability_types_review}, inplace=True)
+        # get review disability information, as bool columns, (`False` for stays without any,) and join it
+        df = df.join(get_disabilities('review_disabilities').dense(pd.unique(df['EntryID']), suffix=' Review'), on='EntryID')
         df['Disabled? Review'] = df[disability_types_review].any(axis=1)
 
         # use entry and review disability information to compute "general" disability information
         for dt in disability_types:
             df[dt] = df[dt+' Entry'] | df[dt+' Review']
         df['Disabled?'] = df[disability_types].any(axis=1)
+        trace.stage('review disabilities', df)
 
-        # get entry income information, merge, and fill in any missing rows with `0`s
-        entry_income_granular, entry_income_total = get_income('entry_income')
-        df = pd.merge(df, entry_income_granular, left_on='EntryID', right_index=True, how='left')
-        df = pd.merge(df, entry_income_total, left_on='EntryID', right_index=True, how='left')
-        df.fillna({i: 0 for i in income_types}, inplace=True)
-        df.fillna({'Last30DayIncome': 0}, inplace=True)
-        # bucket entry income
-        df['Last30DayIncomeBucket'] = df['Last30DayIncome'].apply(get_income_bucket)
-
-        # get exit income information, merge, and fill in any missing rows with `0`s
-        exit_income_granular, exit_income_total = get_income('exit_income')
-        df = pd.merge(df, exit_income_granular.rename(columns=lambda x: x+" Exit"), left_on='EntryID', right_index=True, how='left')
-        df = pd.merge(df, exit_income_total.rename(columns=lambda x: x+" Exit"), left_on='EntryID', right_index=True, how='left')
-        df.fillna({i: 0 for i in income_types_exit}, inplace=True)
-        df.fillna({'Last30DayIncome Exit': 0}, inplace=True)
-        # bucket exit income
-        df['Last30DayIncomeExitBucket'] = df['Last30DayIncome Exit'].apply(get_income_bucket)
-
-        # get entry ncb information, merge, and fill in any missing rows with `False`s
-        df = pd.merge(df, get_ncb('entry_ncb'), left_on='EntryID', right_index=True, how='left')
-        df.fillna({d: False for d in ncb_types}, inplace=True)
-
-        # get exit ncb information, merge, and fill in any missing rows with `False`s
-        df = pd.merge(df, get_ncb('exit_ncb'), left_on='EntryID', right_index=True, how='left', suffixes=('',' Exit'))
-        df.fillna({d: False for d in ncb_types_exit}, inplace=True)
+        # get entry and exit income and ncb information, with missing rows already filled in with `0`s and `False`s, and
+        # incomes bucketed, and join it all at once
+        df = df.join(get_income_and_ncb(df['EntryID']), on='EntryID')
+        trace.stage('income and ncb', df)
 
         df.replace({'PreviousLivingSituation': master_previous_living_situation_replacements}, inplace=True)
 
         df.replace({'LengthOfStayInPreviousLivingSituation': master_length_of_stay_in_previous_living_situation_replacements}, inplace=True)
+        trace.stage('previous living situation', df)
 
         # if we're cleaning `master`, compute legacy information about the first time a client entered the homelessness
         # system, both into a program in general, and specifically into a "Homelessness Program" (see
         # `providers_homelessness_programs`).
         if df_name == 'master':
-            # master
-            master_all = load_clean('master_all')
-            # get info about first entry in a program in general
-            df = pd.merge(df, first_entry(master_all), on='EntryID', how='left')
-            # get info about first entry in a "Homelessness Program" in general
-            df = pd.merge(df, first_entry(master_all[master_all['HomelessnessProgram?'] == True]), on='EntryID', suffixes=('','HomelessnessProgram'), how='left')
+            # master, (just the columns we need)
+            master_all = load_clean('master_all', columns=first_entry_columns)
+            # get info about first entry in a program in general, and in a "Homelessness Program" in general
+            df = pd.merge(df, first_entries(master_all), on='EntryID', how='left')
+            del master_all
             # compute days since first entries
-            df['DaysSinceFirstEntryBucket'] = df['DaysSinceFirstEntry'].apply(get_days_since_first_entry_bucket)
-            df['DaysSinceFirstEntryHomelessnessProgramBucket'] = df['DaysSinceFirstEntryHomelessnessProgram'].apply(get_days_since_first_entry_bucket)
+            df['DaysSinceFirstEntryBucket'] = bucketize(df['DaysSinceFirstEntry'], days_since_first_entry_bucket_spec)
+            df['DaysSinceFirstEntryHomelessnessProgramBucket'] = bucketize(df['DaysSinceFirstEntryHomelessnessProgram'], days_since_first_entry_bucket_spec)
+            trace.stage('first entries', df)
 
         # load census zip data, and compare zip codes to see if they are valid
         zips = {z for z in load_auxiliary('zips')['zip'].values}
@@ -143,11 +131,12 @@ def clean(df_name):
         # check if a client was reviewed by looking for their `EntryID` in `review_details`
         reviews = {e for e in load_clean('review_details')['EntryID']}
         df['Reviewed?'] = df['EntryID'].apply(lambda e: e in reviews)
+        trace.stage('zips, destination, and reviews', df)
 
         # find what services a client got, and compute if they got any
-        df = pd.merge(df, get_services(df).rename(columns=lambda x: x+" Service"), left_on='EntryID', right_index=True, how='left')
-        df.fillna({d: False for d in service_types}, inplace=True)
+        df = df.join(get_services(df).dense(pd.unique(df['EntryID']), suffix=' Service'), on='EntryID')
         df['Services?'] = df[service_types].any(axis=1)
+        trace.stage('services', df)
 
         ############
         # Outcomes #
@@ -155,8 +144,9 @@ def clean(df_name):
 
         # compute `CaseOutcome` and `CaseSuccess` from `DestinationAtExit`; `CaseSuccess` is just whether or not
         # `CaseOutcome` is `Permanent`
-        df['CaseOutcome'] = df.apply(get_case_outcome, axis=1)
+        df['CaseOutcome'] = get_case_outcome_vectorized(df)
         df['CaseSuccess'] = df['CaseOutcome'].apply(lambda o: np.NaN if pd.isnull(o) else o == 'Permanent')
+        trace.stage('case outcome', df)
 
         # get reentry information, merge, and compute reentry outcomes
         df = pd.merge(df, get_reentries(df), on=['ClientUniqueID','ProgramExitDate'], suffixes=('','Reentry'), how='left')
@@ -165,6 +155,7 @@ def clean(df_name):
         # only merge rows whose `CaseOutcome` is 'Permanent'
         df['Reentered6MonthFromPermanent'] = get_delta_reentries(df, np.timedelta64(6,'M'))[df['CaseOutcome'] == 'Permanent']
         df['Reentered12MonthFromPermanent'] = get_delta_reentries(df, np.timedelta64(12,'M'))[df['CaseOutcome'] == 'Permanent']
+        trace.stage('reentries', df)
 
         # compute income outcomes
         df['EarnedIncomeExitHas'] = df['Earned Income (HUD) Exit'] > 0
@@ -175,9 +166,16 @@ def clean(df_name):
         # compute ncb outcomes
         df['NCBIncomeHas'] = df[ncb_types+ncb_types_exit].any(axis=1)
         df['NCBIncomeExitHas'] = df[ncb_types_exit].any(axis=1)
+        trace.stage('income and ncb outcomes', df)
 
         # remove duplicate entries
         df = deduplicate_entry_id(df)
+        trace.stage('deduplicate', df)
+
+        # store the mapped string columns compactly, as categoricals
+        for column, categories in master_categoricals.iteritems():
+            df[column] = categorize(df[column], categories)
+        trace.stage('categoricals', df)
 
     elif df_name == 'providers':
         df = df[:-1] # ignore blank last row
@@ -190,67 +188,170 @@ def clean(df_name):
         df['ProgramType'] = df.apply(get_program_type, axis=1)
         df['ProgramTypeAggregate'] = df['ProgramType'].replace(providers_program_type_aggregates)
         df['HomelessnessProgram?'] = df['ProgramType'].apply(lambda t: np.NaN if pd.isnull(t) else (t in providers_homelessness_programs))
+        trace.stage('program types', df)
 
     elif df_name == 'entry_details':
         # ignore blank last 45,292 rows
         df = df[:-45292]
+        trace.stage('blank rows', df)
 
-    elif df_name == 'entry_disabilities':
-        df.replace({'DisabilityType': disability_type_replacements}, inplace=True)
-
-    elif df_name == 'entry_income' or df_name == 'exit_income':
-        df['StartDate'] = pd.to_datetime(df['StartDate'], format="%m/%d/%Y")
-        df['EndDate'] = pd.to_datetime(df['EndDate'], format="%m/%d/%Y")
-
-        df.replace({'SourceOfIncome': income_replacements}, inplace=True)
-
-    elif df_name == 'entry_ncb' or df_name == 'exit_ncb':
-        df['StartDate'] = pd.to_datetime(df['StartDate'], format="%m/%d/%Y")
-        df['EndDate'] = pd.to_datetime(df['EndDate'], format="%m/%d/%Y")
-
-        df.replace({'SourceOfNonCashBenefit': ncb_replacements}, inplace=True)
+    # `entry_disabilities`, `review_disabilities`, `entry_income`, `exit_income`, `entry_ncb`, and `exit_ncb` are fully
+    # cleaned as they're read, (see `raw_schemas`)
 
     elif df_name == 'review_details':
         # ignore blank last row
         df = df[:-1]
 
-        df['ReviewDate'] = pd.to_datetime(df['ReviewDate'], format="%m/%d/%Y")
-
-        df['HousingStatus'].replace(review_details_housing_status_nans, np.NaN, inplace=True)
         df['HousingStatusAggregate'] = df['HousingStatus'].replace(review_details_housing_status_aggregates)
-
-    elif df_name == 'review_disabilities':
-        df.replace({'DisabilityType': disability_type_replacements}, inplace=True)
+        trace.stage('housing status', df)
 
     elif df_name == 'services':
         df.rename(columns={'ServiceDescription])': 'ServiceDescription'}, inplace=True)
 
-        df['DateCreated'] = pd.to_datetime(df['DateCreated'], format="%m/%d/%Y")
-        df['DateUpdated'] = pd.to_datetime(df['DateUpdated'], format="%m/%d/%Y")
-
-        df['ServiceStartDate'] = pd.to_datetime(df['ServiceStartDate'], format="%m/%d/%Y")
-        df['ServiceEndDate'] = pd.to_datetime(df['ServiceEndDate'], format="%m/%d/%Y")
         # compute `LengthOfService` if possible
         df['LengthOfService'] = (df['ServiceEndDate'] - df['ServiceStartDate']).map(lambda x: x/np.timedelta64(1, 'D'))
 
         # compute Level 1 and Level 2 of AIRS taxonomy for each service
         df['ServiceTypeL1'] = df['ServiceCode'].apply(lambda x: x[0])
         df['ServiceTypeL2'] = df['ServiceCode'].apply(lambda x: x[:2] if len(x) > 1 else np.NaN)
+        trace.stage('service types', df)
 
-    # write output to pickel and CSV
+    # write output to pickel, and to the columnar store, if we're using one, or CSV, if we're not
     df.to_pickle(pickle_path(df_name))
-    df.to_csv(csv_path(df_name))
+    if store_format:
+        write_store(df, df_name)
+    else:
+        df.to_csv(csv_path(df_name))
+    trace.stage('write', df)
+    trace.finish()
+
+    return df
+
+class Trace:
+    """A trace of the stages of cleaning a dataframe, for finding the stage that's slow, runs out of memory, or merges in
+    more rows than it should.  If `profile` isn't set, it does nothing.
 
-    return None
+    After each stage, call :meth:`stage` with the dataframe so far; the trace records how long the stage took, how much
+    it changed resident memory, how much it raised peak resident memory, and the rows and columns of the dataframe before
+    and after it.  :meth:`finish` writes the trace to `profile_path(df_name)`, and prints it.
+
+    """
+    columns = ['Stage', 'Seconds', 'RSS MB', 'RSS Change MB', 'Peak MB', 'Peak Change MB', 'Rows In', 'Rows Out',
+               'Columns In', 'Columns Out']
+
+    def __init__(self, df_name, enabled=None):
+        """Start tracing cleaning a dataframe.
+
+        :param df_name: The dataframe.  This should be in the form `entry_details`, not `EntryDetails`.
+        :type df_name: str.
+        :param enabled: Whether to trace; `profile` if not given.
+        :type enabled: bool.
+
+        """
+        self.df_name = df_name
+        self.enabled = profile if enabled is None else enabled
+        self.stages = []
+        if self.enabled:
+            # the first stage starts from nothing
+            self.last = (time.time(), resident_memory(), peak_memory(), 0, 0)
+
+    def stage(self, name, df):
+        """Record a stage that just finished.
+
+        :param name: The stage.
+        :type name: str.
+        :param df: The dataframe after the stage.
+        :type df: pandas.Dataframe.
+
+        """
+        if not self.enabled:
+            return
+        now = (time.time(), resident_memory(), peak_memory()) + df.shape
+        last = self.last
+        self.stages.append([name, now[0] - last[0], now[1] / 2.**20, (now[1] - last[1]) / 2.**20, now[2] / 2.**20,
+                            (now[2] - last[2]) / 2.**20, last[3], now[3], last[4], now[4]])
+        self.last = now
+
+    def frame(self):
+        """Return the trace as a dataframe, one row per stage.
+
+        """
+        return pd.DataFrame(self.stages, columns=self.columns)
+
+    def finish(self):
+        """Write the trace to `profile_path(df_name)`, and print it, calling out the stage that raised peak memory the
+        most, and any stages that added rows.
+
+        """
+        if not self.enabled:
+            return
+        df = self.frame()
+        if not os.path.exists(os.path.dirname(profile_path(self.df_name))):
+            os.makedirs(os.path.dirname(profile_path(self.df_name)))
+        df.to_csv(profile_path(self.df_name), index=False)
+        print "Profile of cleaning {}, (written to {}):".format(self.df_name, profile_path(self.df_name))
+        print df.to_string(index=False, float_format=lambda x: '{:.2f}'.format(x))
+        peak = df.loc[df['Peak Change MB'].idxmax()]
+        if peak['Peak Change MB'] > 0:
+            print "Peak memory: {:.0f} MB, raised most by {}, (+{:.0f} MB)".format(df['Peak MB'].max(), peak['Stage'], peak['Peak Change MB'])
+        # every stage but the first should keep the rows it was given, or drop some
+        for _, row in df[1:][df['Rows Out'][1:] > df['Rows In'][1:]].iterrows():
+            print "{} added rows: {} in, {} out".format(row['Stage'], row['Rows In'], row['Rows Out'])
+
+def profile_path(df_name):
+    """Given the data frame name, return the path to the trace of cleaning it, (see :class:`Trace`)
+
+    :param df_name: The dataframe.  This should be in the form `entry_details`, not `EntryDetails`.
+    :type df_name: str.
+
+    """
+    return os.path.join(clean_dir, 'profiles', df_name+'.csv')
 
-def load_clean(df_name):
+def resident_memory():
+    """Return this process's resident memory, in bytes, or NaN if it can't be read, (it's read from `/proc`).
+
+    """
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * resource.getpagesize()
+    except (IOError, IndexError, ValueError):
+        return np.NaN
+
+def peak_memory():
+    """Return this process's peak resident memory so far, in bytes.
+
+    """
+    # `ru_maxrss` is in KB on Linux, (but bytes on OS X)
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return maxrss if sys.platform == 'darwin' else maxrss * 1024
+
+def load_clean(df_name, columns=None, filters=None):
     """Given the data frame name, return the cleaned, pickled data frame
 
+    If :func:`build` is holding the dataframe in memory, return that instead.  If `columns` or `filters` are given and
+    the dataframe is in the columnar store, (see `store_format`,) only read the given columns, (and, for parquet, only
+    the row groups that could match `filters`,) instead of the whole pickle.
+
     :param df_name: The dataframe to load.  This should be in the form `entry_details`, not `EntryDetails`.
     :type df_name: str.
+    :param columns: The columns to load; all of them if not given.
+    :type columns: list of str.
+    :param filters: Only load rows that match all of these `(column, op, value)` conditions, where `op` is one of '==',
+        '!=', '<', '<=', '>', '>=', 'in', or 'not in'.
+    :type filters: list of tuples.
 
     """
-    return pd.io.pickle.read_pickle(pickle_path(df_name))
+    if df_name in in_memory:
+        df = in_memory[df_name]
+    elif (columns is not None or filters is not None) and store_format and os.path.exists(store_path(df_name)):
+        return read_store(df_name, columns, filters)
+    else:
+        df = pd.io.pickle.read_pickle(pickle_path(df_name))
+    if filters:
+        df = df[filter_mask(df, filters)]
+    if columns is not None:
+        df = df[columns]
+    return df
 
 # alias for convenience & backwards compatability
 load = load_clean
@@ -265,15 +366,220 @@ def load_auxiliary(file_name):
     path = os.path.join(auxiliary_path, file_name + '.csv')
     return pd.read_csv(path, dtype=str)
 
+# the number of rows :func:`load_raw` reads at a time
+raw_chunk_size = 100000
+
 def load_raw(df_name):
     """Given the data frame name, return the raw data frame
 
+    The raw CSV is read `raw_chunk_size` rows at a time with the dtypes from the table's schema in `raw_schemas`, and
+    each chunk is converted, (dates parsed, values replaced, rows filtered, and categoricals made,) before the chunks are
+    concatenated, so the whole table is never held as raw strings.
+
     :param df_name: The dataframe to load.  This should be in the form `entry_details`, not `EntryDetails`.
     :type df_name: str.
 
     """
     path = os.path.join(raw_path, raw_names[df_name]+'.csv')
-    return pd.read_csv(path, na_values="NA", low_memory=False)
+    schema = raw_schemas.get(df_name, {})
+    chunks = [convert_raw_chunk(chunk, schema) for chunk in pd.read_csv(path, na_values="NA", dtype=schema.get('dtypes'), chunksize=raw_chunk_size)]
+    return concat_chunks(chunks, schema.get('categoricals', []))
+
+def convert_raw_chunk(chunk, schema):
+    """Given a chunk of a raw table and the table's schema, (see `raw_schemas`,) replace values, parse dates, filter
+    rows, and make categoricals.
+
+    :param chunk: A chunk of the raw table.
+    :type chunk: pandas.Dataframe.
+    :param schema: The table's schema.
+    :type schema: dict.
+
+    """
+    if 'replacements' in schema:
+        chunk.replace(schema['replacements'], inplace=True)
+    for column, date_format in schema.get('dates', {}).iteritems():
+        chunk[column] = pd.to_datetime(chunk[column], format=date_format)
+    if 'rows' in schema:
+        chunk = chunk[schema['rows'](chunk)].copy()
+    for column in schema.get('categoricals', []):
+        chunk[column] = chunk[column].astype('category')
+    return chunk
+
+def concat_chunks(chunks, categoricals):
+    """Given converted chunks of a table, concatenate them, keeping categorical columns categorical by giving each
+    chunk's column the union of all of the chunks' categories.
+
+    :param chunks: The chunks.
+    :type chunks: list of pandas.Dataframe.
+    :param categoricals: The categorical columns.
+    :type categoricals: list of str.
+
+    """
+    for column in categoricals:
+        categories = unique_in_order([c for chunk in chunks for c in chunk[column].cat.categories])
+        for chunk in chunks:
+            chunk[column] = chunk[column].cat.set_categories(categories)
+    return pd.concat(chunks)
+
+# the column the columnar store keeps a dataframe's index in, (the name pyarrow gives it)
+store_index_column = '__index_level_0__'
+
+def write_store(df, df_name):
+    """Given a cleaned dataframe and its name, write it to the columnar store in `store_format`, index and all, so that
+    :func:`read_store` gives back the same rows as the pickle.
+
+    :param df: The cleaned dataframe.
+    :type df: pandas.Dataframe.
+    :param df_name: The dataframe's name.  This should be in the form `entry_details`, not `EntryDetails`.
+    :type df_name: str.
+
+    """
+    import pyarrow as pa
+    df = columnar_frame(df)
+    if store_format == 'parquet':
+        import pyarrow.parquet as pq
+        # always store the index as a column, (rather than as metadata, for a `RangeIndex`,) so that each row group
+        # has its rows' index
+        pq.write_table(pa.Table.from_pandas(df, preserve_index=True), store_path(df_name), row_group_size=row_group_size)
+    elif store_format == 'feather':
+        import pyarrow.feather as pf
+        # feather can't store an index, so store it as a column
+        df.insert(0, store_index_column, df.index)
+        pf.write_feather(df.reset_index(drop=True), store_path(df_name))
+    else:
+        raise ValueError("Unknown store_format: {}".format(store_format))
+
+def columnar_frame(df):
+    """Given a cleaned dataframe, return a copy whose object columns pyarrow can store: any kind of null, (`np.NaN`,
+    `pd.NaT`, or `None`,) becomes `None`, and columns that still mix types become strings.
+
+    :param df: The cleaned dataframe.
+    :type df: pandas.Dataframe.
+
+    """
+    import pyarrow as pa
+    df = df.copy()
+    for c in df.columns[(df.dtypes == object).values]:
+        s = df[c].where(pd.notnull(df[c]), None)
+        try:
+            pa.array(s, from_pandas=True)
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            s = s.map(lambda v: v if v is None else str(v))
+        df[c] = s
+    return df
+
+def read_store(df_name, columns=None, filters=None):
+    """Given the data frame name, read it from the columnar store, only reading the given columns, and for parquet, only
+    the row groups that could match `filters`.  See :func:`load_clean`.
+
+    :param df_name: The dataframe to load.  This should be in the form `entry_details`, not `EntryDetails`.
+    :type df_name: str.
+    :param columns: The columns to load; all of them if not given.
+    :type columns: list of str.
+    :param filters: Only load rows that match all of these `(column, op, value)` conditions.
+    :type filters: list of tuples.
+
+    """
+    filters = filters or []
+    # we need to read the filtered columns too, even if they weren't asked for
+    read_columns = None if columns is None else list(columns) + [c for c, _, _ in filters if c not in columns]
+    if store_format == 'parquet':
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        f = pq.ParquetFile(store_path(df_name))
+        groups = [i for i in range(f.num_row_groups) if row_group_may_match(f.metadata.row_group(i), filters)]
+        if groups:
+            df = pa.concat_tables([f.read_row_group(i, columns=read_columns, use_pandas_metadata=True) for i in groups]).to_pandas()
+        else:
+            # nothing matches, but still return the right columns
+            df = f.read(columns=read_columns, use_pandas_metadata=True).to_pandas()[:0]
+    elif store_format == 'feather':
+        import pyarrow.feather as pf
+        df = pf.read_feather(store_path(df_name), columns=None if read_columns is None else [store_index_column] + read_columns)
+        df = df.set_index(store_index_column)
+        df.index.name = None
+    else:
+        raise ValueError("Unknown store_format: {}".format(store_format))
+    if filters:
+        df = df[filter_mask(df, filters)]
+    return df if columns is None else df[columns]
+
+filter_ops = {'=':  operator.eq,
+              '==': operator.eq,
+              '!=': operator.ne,
+              '<':  operator.lt,
+              '<=': operator.le,
+              '>':  operator.gt,
+              '>=': operator.ge}
+
+def filter_mask(df, filters):
+    """Given a dataframe and a list of `(column, op, value)` filters, return a mask of the rows that match all of them.
+
+    :param df: The dataframe to filter.
+    :type df: pandas.Dataframe.
+    :param filters: The filters.  See :func:`load_clean`.
+    :type filters: list of tuples.
+
+    """
+    mask = pd.Series(True, index=df.index)
+    for column, op, value in filters:
+        if op == 'in':
+            mask &= df[column].isin(value)
+        elif op == 'not in':
+            mask &= ~df[column].isin(value)
+        else:
+            mask &= filter_ops[op](df[column], value)
+    return mask
+
+def row_group_may_match(row_group, filters):
+    """Given parquet row group metadata and a list of filters, return whether the row group's min/max statistics allow any
+    of its rows to match all of the filters.
+
+    :param row_group: The row group metadata.
+    :type row_group: pyarrow.parquet.RowGroupMetaData.
+    :param filters: The filters.  See :func:`load_clean`.
+    :type filters: list of tuples.
+
+    """
+    stats = {}
+    for i in range(row_group.num_columns):
+        column = row_group.column(i)
+        if column.statistics is not None and column.statistics.has_min_max:
+            stats[column.path_in_schema] = (column.statistics.min, column.statistics.max)
+    for column, op, value in filters:
+        if column not in stats:
+            continue
+        lo, hi = stats[column]
+        values = value if op == 'in' else [value]
+        # only compare values with statistics of the same kind, (python 2 will happily compare a str to an int)
+        if not all(comparable(lo, v) for v in values):
+            continue
+        if op in ('=', '==', 'in') and all(v < lo or v > hi for v in values):
+            return False
+        elif (op == '<' and lo >= value) or (op == '<=' and lo > value) or (op == '>' and hi <= value) or (op == '>=' and hi < value):
+            return False
+    return True
+
+def comparable(a, b):
+    """Return whether `a` and `b` are both numbers, both strings, or both dates, and so can be meaningfully compared.
+
+    :param a: A value.
+    :param b: Another value.
+
+    """
+    for kind in ((int, long, float, np.number), basestring, datetime.datetime):
+        if isinstance(a, kind) and isinstance(b, kind):
+            return True
+    return False
+
+def store_path(df_name):
+    """Given the data frame name, return the path to the clean dataframe in the columnar store
+
+    :param df_name: The dataframe to load.  This should be in the form `entry_details`, not `EntryDetails`.
+    :type df_name: str.
+
+    """
+    return os.path.join(clean_dir, store_format+'s', df_name+'.'+store_format)
 
 def pickle_path(df_name):
     """Given the data frame name, return the path to the clean pickle
@@ -310,6 +616,219 @@ raw_names = {'master':              'Master',
              'review_ncb':          'ReviewNCB',
              'review_disabilities': 'ReviewDisabilities'}
 
+# the version of the code that cleans each dataframe; bump a dataframe's version whenever you change how it's cleaned, so
+# that :func:`build` knows to clean it again
+clean_versions = {'master':              9,
+                  'master_all':          9,
+                  'entry_details':       2,
+                  'entry_income':        2,
+                  'entry_ncb':           2,
+                  'entry_disabilities':  2,
+                  'exit_stuff':          2,
+                  'exit_income':         2,
+                  'exit_ncb':            2,
+                  'services':            2,
+                  'providers':           3,
+                  'review_details':      2,
+                  'review_income':       2,
+                  'review_ncb':          2,
+                  'review_disabilities': 3}
+
+# the cleaned dataframes that cleaning each dataframe loads, (dataframes that aren't listed only need their raw data)
+clean_dependencies = {'master':     ['providers', 'master_all', 'review_details', 'entry_disabilities', 'review_disabilities',
+                                     'entry_income', 'exit_income', 'entry_ncb', 'exit_ncb', 'services'],
+                      'master_all': ['providers', 'review_details', 'entry_disabilities', 'review_disabilities',
+                                     'entry_income', 'exit_income', 'entry_ncb', 'exit_ncb', 'services']}
+
+# the auxiliary data that cleaning each dataframe loads
+auxiliary_dependencies = {'master':     ['zips'],
+                          'master_all': ['zips']}
+
+# cleaned dataframes that :func:`build` is holding in memory; :func:`load_clean` returns these rather than reading them
+in_memory = {}
+# the most memory :func:`build` should use for holding cleaned dataframes in memory, in bytes
+build_max_memory = 8 * 2**30
+# how long :func:`build` waits between checking on its workers, in seconds
+build_poll_interval = 0.5
+
+def build(targets, jobs=1, max_memory=build_max_memory):
+    """Given the names of dataframes, clean them and the dataframes they depend on, (see `clean_dependencies`,) skipping
+    any dataframe whose inputs haven't changed since it was last cleaned.
+
+    A dataframe's inputs are the hashes of its raw and auxiliary CSVs, its version in `clean_versions`, and the hashes of
+    the cleaned dataframes it loads.  They're recorded in the build manifest, (see :func:`manifest_path`,) each time a
+    dataframe is cleaned.
+
+    Everything runs in this process, except that with `jobs` > 1, dataframes that only need their raw data are cleaned
+    in parallel by a pool of `jobs` workers.  Cleaned dataframes are kept in memory, (see `in_memory`,) for the
+    dataframes that load them, as long as they fit in `max_memory`, and are evicted once nothing left to clean needs
+    them.
+
+    :param targets: The dataframes to build.  These should be in the form `entry_details`, not `EntryDetails`.
+    :type targets: list of str.
+    :param jobs: The number of worker processes to clean dataframes with.
+    :type jobs: int.
+    :param max_memory: The most memory to use for keeping cleaned dataframes in memory, in bytes.
+    :type max_memory: int.
+
+    """
+    manifest = load_manifest()
+    order = build_order(targets)
+    # the number of dataframes left to clean that load each dataframe
+    consumers = {df_name: sum(df_name in clean_dependencies.get(c, []) for c in order) for df_name in order}
+    sizes = {}
+    waiting, running, done, cleaned = list(order), {}, set(), []
+
+    def finish(df_name, inputs=None, df=None):
+        if inputs is not None:
+            manifest['frames'][df_name] = {'inputs': inputs, 'output': file_hash(pickle_path(df_name), manifest)}
+            save_manifest(manifest)
+            cleaned.append(df_name)
+        done.add(df_name)
+        # keep the dataframe in memory for the dataframes that load it, if there's room
+        if df is not None and consumers[df_name] > 0:
+            size = frame_memory(df)
+            if size <= max_memory - sum(sizes.values()):
+                in_memory[df_name], sizes[df_name] = df, size
+        # evict the dataframes this one loaded that nothing left to clean needs
+        for dependency in clean_dependencies.get(df_name, []):
+            consumers[dependency] -= 1
+            if consumers[dependency] == 0:
+                in_memory.pop(dependency, None)
+                sizes.pop(dependency, None)
+
+    pool = multiprocessing.Pool(jobs) if jobs > 1 else None
+    try:
+        while waiting or running:
+            progressed = False
+            for df_name in [w for w in waiting if all(d in done for d in clean_dependencies.get(w, []))]:
+                waiting.remove(df_name)
+                progressed = True
+                inputs = clean_inputs(df_name, manifest)
+                if manifest['frames'].get(df_name, {}).get('inputs') == inputs and os.path.exists(pickle_path(df_name)):
+                    print "Skipping {}: its inputs haven't changed".format(df_name)
+                    finish(df_name)
+                elif pool is not None and not clean_dependencies.get(df_name):
+                    print "Cleaning {} in a worker".format(df_name)
+                    running[df_name] = (inputs, pool.apply_async(clean_in_worker, (df_name, max_memory - sum(sizes.values()))))
+                else:
+                    print "Cleaning {}".format(df_name)
+                    finish(df_name, inputs, clean(df_name))
+            for df_name, (inputs, result) in running.items():
+                if result.ready():
+                    del running[df_name]
+                    progressed = True
+                    finish(df_name, inputs, result.get())
+            if not progressed:
+                time.sleep(build_poll_interval)
+    finally:
+        if pool is not None:
+            pool.terminate()
+        in_memory.clear()
+    return cleaned
+
+def clean_in_worker(df_name, max_size):
+    """Given the data frame name, clean it in a worker process for :func:`build`, and return it if it's no bigger than
+    `max_size`, (otherwise :func:`build` couldn't keep it in memory anyway, so there's no point in sending it back).
+
+    :param df_name: The dataframe to clean.  This should be in the form `entry_details`, not `EntryDetails`.
+    :type df_name: str.
+    :param max_size: The most memory the dataframe can use and still be returned, in bytes.
+    :type max_size: int.
+
+    """
+    df = clean(df_name)
+    return df if frame_memory(df) <= max_size else None
+
+def frame_memory(df):
+    """Given a dataframe, return the memory it uses, in bytes, including the contents of object columns.
+
+    :param df: The dataframe.
+    :type df: pandas.Dataframe.
+
+    """
+    return df.memory_usage(index=True, deep=True).sum()
+
+def build_order(targets):
+    """Given the names of dataframes, return them and the dataframes they depend on, (see `clean_dependencies`,) in an
+    order in which they can be cleaned.
+
+    :param targets: The dataframes to build.
+    :type targets: list of str.
+
+    """
+    order = []
+    def visit(df_name):
+        if df_name not in order:
+            for dependency in clean_dependencies.get(df_name, []):
+                visit(dependency)
+            order.append(df_name)
+    for df_name in targets:
+        visit(df_name)
+    return order
+
+def clean_inputs(df_name, manifest):
+    """Given the data frame name and the build manifest, return everything cleaning the dataframe depends on: the hashes
+    of its raw and auxiliary CSVs, its version, and the hashes of the cleaned dataframes it loads.
+
+    :param df_name: The dataframe.  This should be in the form `entry_details`, not `EntryDetails`.
+    :type df_name: str.
+    :param manifest: The build manifest.
+    :type manifest: dict.
+
+    """
+    return {'raw':       file_hash(os.path.join(raw_path, raw_names[df_name]+'.csv'), manifest),
+            'auxiliary': {a: file_hash(os.path.join(auxiliary_path, a+'.csv'), manifest) for a in auxiliary_dependencies.get(df_name, [])},
+            'version':   clean_versions[df_name],
+            'upstream':  {d: manifest['frames'].get(d, {}).get('output') for d in clean_dependencies.get(df_name, [])}}
+
+def file_hash(path, manifest):
+    """Given a path and the build manifest, return the SHA-1 of the file.  Hashes are cached in the manifest, and only
+    recomputed when the file's size or modification time changes.
+
+    :param path: The file's path.
+    :type path: str.
+    :param manifest: The build manifest.
+    :type manifest: dict.
+
+    """
+    stat = os.stat(path)
+    cached = manifest['files'].get(path)
+    if cached is None or cached['size'] != stat.st_size or cached['mtime'] != stat.st_mtime:
+        sha1 = hashlib.sha1()
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(2**20), b''):
+                sha1.update(block)
+        cached = manifest['files'][path] = {'size': stat.st_size, 'mtime': stat.st_mtime, 'sha1': sha1.hexdigest()}
+    return cached['sha1']
+
+def manifest_path():
+    """Return the path to the build manifest.
+
+    """
+    return os.path.join(clean_dir, 'manifest.json')
+
+def load_manifest():
+    """Return the build manifest, or an empty one if nothing has been built yet.
+
+    """
+    if not os.path.exists(manifest_path()):
+        return {'frames': {}, 'files': {}}
+    with open(manifest_path()) as f:
+        return json.load(f)
+
+def save_manifest(manifest):
+    """Given the build manifest, save it, replacing the old one all at once so that a killed build can't leave it
+    half-written.
+
+    :param manifest: The build manifest.
+    :type manifest: dict.
+
+    """
+    with open(manifest_path()+'.tmp', 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.rename(manifest_path()+'.tmp', manifest_path())
+
 ## date when HMIS switched to All Chicago 
 switch_date = datetime.datetime(2012, 9, 16)
 
@@ -317,14 +836,81 @@ switch_date = datetime.datetime(2012, 9, 16)
 dump_date = datetime.datetime(2014, 7, 1)
 
 def get_days_geq_0(t):
-    """Given an `numpy.timedelta64`, return the number of days it represents, and if it's less than 0, return `pd.NaT`.
+    """Given an `numpy.timedelta64`, return the number of days it represents, and if it's less than 0, return `np.NaN`,
+    (not `pd.NaT`, so a series of them is numeric, rather than an object series that `pipeline` would take as nominal).
 
     :param t: The timedelta.
     :type t: numpy.timedelta64.
 
     """
     t = t/np.timedelta64(1, 'D')
-    return t if t >= 0 else pd.NaT
+    return t if t >= 0 else np.NaN
+
+def bucketize(s, spec):
+    """Given a numeric series and a bucket spec, return a categorical of the bucket each value falls into.
+
+    A bucket spec is a dict with:
+
+    - `edges`: the sorted boundaries between buckets.  An edge may be repeated to make a bucket of a single value.
+    - `labels`: the label of each bucket, one more than there are edges.  A label may be used for more than one bucket.
+    - `closed`: 'left' if an edge belongs to the bucket above it, (`x < edge` falls below,) or 'right' if it belongs to
+      the bucket below it, (`x <= edge` falls below).  Either one side for all edges, or a list with one per edge.
+    - `categories` (optional): the order of the categories; defaults to the labels in order.
+    - `missing` (optional): the label for null values; defaults to null.
+
+    :param s: The values to bucket.
+    :type s: pandas.Series.
+    :param spec: The bucket spec.
+    :type spec: dict.
+
+    """
+    edges = np.asarray(spec['edges'], dtype=float)
+    closed = spec['closed']
+    closed = np.asarray([closed] * len(edges) if isinstance(closed, str) else closed)
+    categories = spec.get('categories') or unique_in_order(spec['labels'])
+    # `s` may be an object series holding `pd.NaT`s, so normalize the nulls before converting to floats
+    known = pd.notnull(s)
+    values = np.asarray(s.where(known, np.NaN), dtype=float)
+    # the bucket index is the number of edges each value is past: left-closed edges it's reached, plus right-closed edges
+    # it's exceeded
+    index = (np.searchsorted(edges[closed == 'left'], values, side='right') +
+             np.searchsorted(edges[closed == 'right'], values, side='left'))
+    # map bucket indices to category codes, leaving nulls as -1, (or the `missing` label)
+    bucket_codes = np.asarray([categories.index(l) for l in spec['labels']])
+    missing = spec.get('missing')
+    codes = np.where(np.asarray(known), bucket_codes[index], -1 if missing is None else categories.index(missing))
+    return pd.Series(pd.Categorical.from_codes(codes, categories), index=s.index)
+
+def categorize(s, categories):
+    """Given a series of strings and its known categories, return it as a categorical.  Values that aren't among the known
+    categories, (e.g. values that a replacement map passes through unchanged,) are added as categories after them.
+
+    :param s: The series to convert.
+    :type s: pandas.Series.
+    :param categories: The known categories, in order.
+    :type categories: list of str.
+
+    """
+    observed = [v for v in s.dropna().unique() if v not in categories]
+    return s.astype('category').cat.set_categories(list(categories) + sorted(observed))
+
+def replacement_targets(replacements):
+    """Given a replacement map, return the non-null values it replaces with, sorted.
+
+    :param replacements: The replacement map.
+    :type replacements: dict.
+
+    """
+    return sorted({v for v in replacements.itervalues() if pd.notnull(v)})
+
+def unique_in_order(values):
+    """Given a list, return its unique values in the order they first appear.
+
+    :param values: The values.
+    :type values: list.
+
+    """
+    return [v for i, v in enumerate(values) if v not in values[:i]]
 
 def get_refused(row):
     """Given a row from `master`, return whether or not the client ever refused to answer a question.
@@ -338,6 +924,18 @@ def get_refused(row):
             return True
     return False
 
+master_refused_values = ['Refused (HUD)', 'refused']
+
+def get_refused_vectorized(df):
+    """Given `master`, return whether or not each client ever refused to answer a question.  Columnar equivalent of
+    :func:`get_refused`.
+
+    :param df: `master`.
+    :type df: pandas.Dataframe.
+
+    """
+    return df.isin(master_refused_values).any(axis=1)
+
 master_relationship_to_hoh_replacements = {'Son':                'Child',
                                            'Daughter':           'Child',
                                            'Step-son':           'Child',
@@ -376,70 +974,83 @@ def get_age_entered(row):
     else:
         return dateutil.relativedelta.relativedelta(program_entry_date, year_of_birth).years
 
-def get_age_bucket(age):
-    """Return the age bucket.
+def get_age_entered_vectorized(df):
+    """Given `master`, return years between entry date and birth year for each row.  Columnar equivalent of
+    :func:`get_age_entered`: like `relativedelta`, count only whole years, and count backwards if the client "entered"
+    before they were born.
 
-    :param age: Age.
-    :type age: int.
+    :param df: `master`.
+    :type df: pandas.Dataframe.
 
     """
-    if pd.isnull(age):
-        return np.NaN
-    elif age < 6:
-        return 'Under 6 years'
-    elif age < 18:
-        return '6 to 17 years'
-    elif age < 65:
-        return '18 to 64 years'
-    else:
-        return '65 years and over'
-
-def get_dfss_age_bucket(age):
-    """Return the DFSS age bucket.
-
-    :param age: Age.
-    :type age: int.
+    known = np.asarray(pd.notnull(df['ProgramEntryDate']) & pd.notnull(df['YearOfBirth']))
+    entry = pd.DatetimeIndex(df['ProgramEntryDate']).asi8
+    birth = pd.DatetimeIndex(df['YearOfBirth']).asi8
+    # always count from the earlier date to the later one, and flip the sign afterwards
+    forward = entry >= birth
+    later = pd.DatetimeIndex(np.where(forward, entry, birth))
+    earlier = pd.DatetimeIndex(np.where(forward, birth, entry))
+    years = np.asarray(later.year - earlier.year, dtype=float)
+    # don't count the last year if its anniversary, (month, day, and time of day,) hasn't been reached yet
+    years -= anniversary_key(later) < anniversary_key(earlier)
+    years = np.where(forward, years, -years)
+    return pd.Series(np.where(known, years, np.NaN), index=df.index)
+
+def anniversary_key(dates):
+    """Given a `DatetimeIndex`, return an integer for each date that orders dates by month, day, and time of day,
+    ignoring the year.
+
+    :param dates: The dates.
+    :type dates: pandas.DatetimeIndex.
 
     """
-    if pd.isnull(age):
-        return np.NaN
-    elif age < 1:
-        return 'DFSS: Under 1 year'
-    elif age < 6:
-        return 'DFSS: 1 to 5 years'
-    elif age < 13:
-        return 'DFSS: 6 to 12 years'
-    elif age < 18:
-        return 'DFSS: 13 to 17 years'
-    elif age < 25:
-        return 'DFSS: 18 to 24 years'
-    elif age < 31:
-        return 'DFSS: 25 to 30 years'
-    elif age < 51:
-        return 'DFSS: 31 to 50 years'
-    elif age < 62:
-        return 'DFSS: 51 to 61 years'
-    else:
-        return 'DFSS: 62 years and over'
+    time_of_day = dates.asi8 - dates.normalize().asi8
+    return (np.asarray(dates.month, dtype=np.int64) * 32 + np.asarray(dates.day, dtype=np.int64)) * 86400 * 10**9 + time_of_day
 
 age_buckets = ['Under 6 years','6 to 17 years','18 to 64 years','65 years and over']
 
+age_bucket_spec = {'edges':  [6, 18, 65],
+                   'labels': age_buckets,
+                   'closed': 'left'}
+
+dfss_age_bucket_spec = {'edges':  [1, 6, 13, 18, 25, 31, 51, 62],
+                        'labels': ['DFSS: Under 1 year',
+                                   'DFSS: 1 to 5 years',
+                                   'DFSS: 6 to 12 years',
+                                   'DFSS: 13 to 17 years',
+                                   'DFSS: 18 to 24 years',
+                                   'DFSS: 25 to 30 years',
+                                   'DFSS: 31 to 50 years',
+                                   'DFSS: 51 to 61 years',
+                                   'DFSS: 62 years and over'],
+                        'closed': 'left'}
+
 def get_family_composition(df):
-    """Given `master`, compute the age composition for each entry's family.  Do so by pivoting each `Entry Exit GroupID`
-    out on `AgeEnteredBucket`, then merge it into the dataframe to recover `EntryID`, so that it can be easily merged
-    back into `master`.
+    """Given `master`, compute the composition of each entry's family, (everyone who entered with the same `Entry Exit
+    GroupID`, or just the client, if there isn't one): how many members are in each age bucket, the binary variables
+    derived from those counts, the family's size, `HouseholdSize`, the number of distinct people in it, (by
+    `ClientUniqueID`,) `HouseholdClients`, and its head of household's age when entering, `HoHAgeEntered`.
+
+    Each family is factorized into a code, and its members are counted with :func:`numpy.bincount`, so the result lines
+    up with `df`'s rows, and can be joined onto it by index.
+
+    NOTE: only members with an `AgeEnteredBucket` are counted in the age buckets; families without any get `NaN`s for
+    everything but `HouseholdSize`, `HouseholdClients`, and `HoHAgeEntered`.
 
     :param df: `master` dataframe.
     :type df: pandas.Dataframe.
-    
+    :rtype: pandas.DataFrame.
+
     """
-    # prep f to pivot on 'Entry Exit GroupID' if there is one, otherwise on 'EntryID'
-    f = df[['EntryID','Entry Exit GroupID','AgeEnteredBucket']].copy()
-    f['Entry Exit GroupID'][pd.isnull(f['Entry Exit GroupID'])] = -f['EntryID']
-    # build fp, a pivot table on 'AgeEnteredBucket'
-    # NOTE: this drops people who have no AgeEnteredBucket
-    f['count'] = 1
-    fp = pd.pivot_table(f, values='count', index='Entry Exit GroupID', columns='AgeEnteredBucket', aggfunc=np.sum, fill_value=0)
+    # key each entry by its 'Entry Exit GroupID' if there is one, otherwise by its 'EntryID'
+    groups = df['Entry Exit GroupID'].values
+    families, uniques = pd.factorize(np.where(pd.isnull(groups), -df['EntryID'].values, groups))
+    n = len(uniques)
+    # count each family's members in each `AgeEnteredBucket`
+    buckets = pd.Categorical(df['AgeEnteredBucket'], categories=age_buckets).codes.astype(np.int64)
+    aged = buckets >= 0
+    counts = np.bincount(families[aged] * len(age_buckets) + buckets[aged], minlength=n * len(age_buckets))
+    fp = pd.DataFrame(counts.reshape(n, len(age_buckets)), columns=age_buckets)
     # compute 'OtherFamilyMembers'
     fp['OtherFamilyMembers'] = fp.sum(axis=1) - 1
     # compute binary variables
@@ -449,9 +1060,31 @@ def get_family_composition(df):
     fp['SingleAdultWithChildren?'] = fp['SingleAdult?'] & fp['Children?']
     for b in age_buckets:
         fp[b+'?'] = fp[b] > 0
-    # merge fp back into f and return
-    return_cols = ['EntryID','OtherFamilyMembers','Family?','SingleAdult?','Children?','SingleAdultWithChildren?'] + age_buckets + [b+'?' for b in age_buckets]
-    return pd.merge(f, fp, left_on='Entry Exit GroupID', right_index=True)[return_cols]
+    # families without anyone with an `AgeEnteredBucket` don't have a composition, (so the counts are floats, and the
+    # binary variables are objects, with `NaN`s)
+    binary = ['Family?','SingleAdult?','Children?','SingleAdultWithChildren?'] + [b+'?' for b in age_buckets]
+    fp[binary] = fp[binary].astype(object)
+    fp = fp.where(np.repeat((fp['OtherFamilyMembers'] >= 0).values[:, np.newaxis], len(fp.columns), axis=1))
+    # compute household variables: everyone is counted in the household's size, but people with several entries in it
+    # are only counted once as distinct clients, (by `ClientUniqueID`, since a `ClientID` is just one instance of a
+    # client in the system; a client without a `ClientUniqueID` counts as a person of their own)
+    fp['HouseholdSize'] = np.bincount(families, minlength=n)
+    people, _ = pd.factorize(df['ClientUniqueID'].values)
+    people = np.where(people >= 0, people, len(people) + np.arange(len(people)))
+    # a single key for each pair of family and person, (people's codes are all less than twice the number of rows)
+    base = max(2 * len(people), 1)
+    fp['HouseholdClients'] = np.bincount(pd.unique(families.astype(np.int64) * base + people) // base, minlength=n)
+    # the head of household is the member who's marked as one, or the client, if they entered alone, (the first one,
+    # if there are several)
+    heads = np.flatnonzero((df['Head Of Household?'] == 'Yes').values | pd.isnull(groups))[::-1]
+    hoh_age_entered = np.repeat(np.NaN, n)
+    hoh_age_entered[families[heads]] = df['AgeEntered'].values[heads]
+    fp['HoHAgeEntered'] = hoh_age_entered
+    # line each family's composition up with its members
+    return_cols = ['OtherFamilyMembers'] + binary[:4] + age_buckets + binary[4:] + ['HouseholdSize','HouseholdClients','HoHAgeEntered']
+    fp = fp[return_cols].take(families)
+    fp.index = df.index
+    return fp
 
 master_ethnicity_nans = ["Don't Know (HUD)", 'Refused (HUD)', 'Other (Non-Hispanic/Latino)']
 
@@ -488,6 +1121,18 @@ def get_race_ethnicity_4_way(row):
     else:
         return race_replacements_4_way[row['PrimaryRace']] if pd.notnull(row['PrimaryRace']) else np.NaN
 
+def get_race_ethnicity_4_way_vectorized(df):
+    """Given `master`, compute `Race/Ethnicity (4-way)` for each row.  Columnar equivalent of
+    :func:`get_race_ethnicity_4_way`.
+
+    :param df: `master`.
+    :type df: pandas.Dataframe.
+
+    """
+    race = df['PrimaryRace'].map(race_replacements_4_way)
+    race[df['Ethnicity'] == 'Hispanic/Latino (HUD)'] = 'Hispanic/Latino (4-way)'
+    return race
+
 master_veteran_nans = ["Don't Know (HUD)", 'Refused (HUD)']
 
 # TODO this should just be a :func:`fillna`.
@@ -554,42 +1199,51 @@ master_length_of_stay_in_previous_living_situation_replacements = {'More than on
                                                                    'Refused (HUD)':            np.NaN,
                                                                    'don t know':               np.NaN}
 
-def first_entry(ma):
-    """Given `master_all` or a subset thereof, get info about the first entry in a program for each `EntryID`.
+# the columns of `master_all` that :func:`first_entries` needs
+first_entry_columns = ['EntryID','ClientUniqueID','ProgramEntryDate','ProgramType','HomelessnessProgram?']
+
+def first_entries(ma):
+    """Given `master_all`, get info about the first entry in a program for each `EntryID`, both in a program in general,
+    and in a "Homelessness Program", (see `providers_homelessness_programs`,) whose columns are suffixed with
+    'HomelessnessProgram'.  Entries that aren't into a "Homelessness Program" get no info about the latter.
+
+    A client's entries on the same day are taken in `master_all`'s order, (i.e. `Master`'s,) so the first one listed is
+    their first entry.  (The full-width version this replaced used an unstable sort, so which of them came first was
+    arbitrary, and could differ between the two kinds of first entry.)
 
-    :param ma: `master_all` or a subset thereof.
+    :param ma: `master_all`.
     :type ma: pandas.Dataframe.
 
     """
-    # sort `ma` by `ProgramEntryDate` and get the first entry for a given `ClientUniqueID`
-    first_ma = ma.sort('ProgramEntryDate', inplace=False).groupby('ClientUniqueID').first()
-    # merge the firsts back into the dataframe
-    # XXX this can be engineered so that there are fewer columns, (and less memory,) involved
-    ma_first_ma = pd.merge(ma, first_ma, left_on='ClientUniqueID', right_index=True, suffixes=('','OfFirstEntry'))
-    # compute `DaysSinceFirstEntry`
-    ma_first_ma['DaysSinceFirstEntry'] = (ma_first_ma['ProgramEntryDate'] - ma_first_ma['ProgramEntryDateOfFirstEntry']).map(get_days_geq_0)
-    # only return the important columns, including `EntryID` for merging
-    return ma_first_ma[['EntryID','ProgramEntryDateOfFirstEntry','ProgramTypeOfFirstEntry','DaysSinceFirstEntry']]
-
-def get_days_since_first_entry_bucket(d):
-    """Return the days-since-first-entry bucket.
-
-    :param d: Days.
-    :type d: int.
-
-    """
-    if d < 1:
-        return '0 days'
-    elif d <= 7:
-        return 'One week or less'
-    elif d < 30:
-        return 'More than one week, but less than one month'
-    elif d <= 90:
-        return 'One to three months'
-    elif d < 365:
-        return 'More than three months, but less than one year'
-    else:
-        return 'One year or longer'
+    # only keep the columns we need, and sort by `ProgramEntryDate` once for both kinds of first entry; the sort is
+    # stable, so same-day entries stay in `master_all`'s order
+    ma = ma[first_entry_columns].sort('ProgramEntryDate', kind='mergesort')
+    homelessness = (ma['HomelessnessProgram?'] == True).values
+    firsts = pd.DataFrame({'EntryID': ma['EntryID'].values}, index=ma.index)
+    for suffix, rows in (('', np.ones(len(ma), dtype=bool)), ('HomelessnessProgram', homelessness)):
+        # get the first entry for a given `ClientUniqueID`, and line it up with each entry by `ClientUniqueID`
+        first = ma[rows].groupby('ClientUniqueID')[['ProgramEntryDate','ProgramType']].first().reindex(ma['ClientUniqueID'])
+        first.index = ma.index
+        first = first.where(pd.Series(rows, index=ma.index), axis=0)
+        firsts['ProgramEntryDateOfFirstEntry'+suffix] = first['ProgramEntryDate']
+        firsts['ProgramTypeOfFirstEntry'+suffix] = first['ProgramType']
+        # compute `DaysSinceFirstEntry`
+        days = np.repeat(np.NaN, len(ma))
+        days[rows] = (ma['ProgramEntryDate'] - first['ProgramEntryDate'])[rows].map(get_days_geq_0).values
+        firsts['DaysSinceFirstEntry'+suffix] = days
+    return firsts
+
+days_since_first_entry_bucket_spec = {'edges':   [1, 7, 30, 90, 365],
+                                      'labels':  ['0 days',
+                                                  'One week or less',
+                                                  'More than one week, but less than one month',
+                                                  'One to three months',
+                                                  'More than three months, but less than one year',
+                                                  'One year or longer'],
+                                      'closed':  ['left', 'right', 'left', 'right', 'left'],
+                                      # entries with no days since first entry have always fallen through to the last
+                                      # bucket
+                                      'missing': 'One year or longer'}
 
 master_destination_at_exit_replacements = {
     'Emergency shelter':                                            'Emergency shelter, including hotel or motel paid for with emergency shelter voucher (HUD)',
@@ -701,24 +1355,58 @@ def get_case_outcome(row):
     else:
         return master_case_outcomes[row['DestinationAtExit']]
 
+def get_case_outcome_vectorized(df):
+    """Given `master`, compute the `CaseOutcome` for each row.  Columnar equivalent of :func:`get_case_outcome`: PSH rows
+    that stayed, (or have been in since before the `dump_date`,) longer than `psh_permanent_tenure` are 'Permanent', and
+    everything else comes from `DestinationAtExit`.
+
+    :param df: `master`.
+    :type df: pandas.Dataframe.
+
+    """
+    outcome = df['DestinationAtExit'].map(master_case_outcomes)
+    # `LengthOfStay` is NaN where it's unknown, which is never more than `psh_permanent_tenure`
+    los_known = pd.notnull(df['LengthOfStay'])
+    long_stay = df['LengthOfStay'] > psh_permanent_tenure
+    # without `LengthOfStay`, see if they entered >`psh_permanent_tenure` before when we got the data
+    psh_cutoff = dump_date - dateutil.relativedelta.relativedelta(days=psh_permanent_tenure)
+    long_since_entry = ~los_known & pd.notnull(df['ProgramEntryDate']) & (df['ProgramEntryDate'] < psh_cutoff)
+    psh = df['ProgramType'] == 'Permanent supportive housing (HUD)'
+    outcome[psh & (long_stay | long_since_entry)] = 'Permanent'
+    return outcome
+
 def get_reentries(df):
-    """Given `master` or a subset thereof, find the next entry into a "Homelessness Program" for each exit.
+    """Given `master` or a subset thereof, find the next entry into a "Homelessness Program" for each exit.  When a
+    client has more than one such entry on that day, the next entry is the one that comes first in `df`.
 
     :param df: `master`.
     :type df: pandas.Dataframe.
 
     """
     # just get the rows that exited, and get the important columns
-    df_exits = df[pd.notnull(df['ProgramExitDate'])][['ClientUniqueID','ProgramExitDate']]
+    df_exits = df[pd.notnull(df['ProgramExitDate'])][['ClientUniqueID','ProgramExitDate']].drop_duplicates()
     # just get the rows that entered into a homelessness program, and get the columns that are important for reentry
-    df_entries = df[df['HomelessnessProgram?'] == True][['ClientUniqueID','ProgramEntryDate','ProgramType']]
-    # merge on ClientUniqueID to get the cross product of all exits and entries on ClientUniqueID
-    df_ee = pd.merge(df_exits, df_entries, on='ClientUniqueID', how='right')
-    # build a mask for all entries that happened after exits
-    df_reentered = df_ee[df_ee['ProgramExitDate'] < df_ee['ProgramEntryDate']]
-    r_columns = ['ClientUniqueID','ProgramExitDate','ProgramEntryDate','ProgramType']
-    # return the *next* reentry for each exit
-    return df_reentered.sort('ProgramEntryDate', inplace=False).groupby(['ClientUniqueID','ProgramExitDate']).head(1)[r_columns]
+    df_entries = df[(df['HomelessnessProgram?'] == True) & pd.notnull(df['ProgramEntryDate'])][['ClientUniqueID','ProgramEntryDate','ProgramType']]
+    # rather than merging every exit with every entry for a client, sort the entries once by client and date, and
+    # search forward from each exit for the next entry
+    clients, client_uniques = pd.factorize(pd.concat([df_entries['ClientUniqueID'], df_exits['ClientUniqueID']]))
+    dates, date_uniques = pd.factorize(pd.concat([df_entries['ProgramEntryDate'], df_exits['ProgramExitDate']]), sort=True)
+    # a single key that orders by client, then by date
+    keys = clients.astype(np.int64) * len(date_uniques) + dates
+    entry_keys, exit_keys = keys[:len(df_entries)], keys[len(df_entries):]
+    entry_clients, exit_clients = clients[:len(df_entries)], clients[len(df_entries):]
+    # a stable sort, so that ties on the same day go to the entry that came first in `df`
+    order = np.argsort(entry_keys, kind='mergesort')
+    # the first entry strictly after each exit, if it's for the same client
+    nexts = np.searchsorted(entry_keys[order], exit_keys, side='right')
+    found = nexts < len(order)
+    found[found] = entry_clients[order[nexts[found]]] == exit_clients[found]
+    next_entries = df_entries.iloc[order[nexts[found]]]
+    return pd.DataFrame({'ClientUniqueID':   df_exits['ClientUniqueID'].values[found],
+                         'ProgramExitDate':  df_exits['ProgramExitDate'].values[found],
+                         'ProgramEntryDate': next_entries['ProgramEntryDate'].values,
+                         'ProgramType':      next_entries['ProgramType'].values},
+                        columns=['ClientUniqueID','ProgramExitDate','ProgramEntryDate','ProgramType'])
 
 def get_delta_reentries(df, delta):
     """Given `master` or a subset thereof, compute which rows reentered within the given timedelta.
@@ -803,17 +1491,107 @@ disability_types = ['Mental Health Problem (HUD 40118)',
 disability_types_entry = [d+' Entry' for d in disability_types]
 disability_types_review = [d+' Review' for d in disability_types]
 
+class Indicators:
+    """Boolean indicators of which types, (e.g. of disability, ncb, or service,) each stay has, stored as a bitset: one
+    bit per `EntryID` and type, for only the `EntryID`s with any indicators.  Most stays have none, so this is much
+    smaller than a pivot table of `True`s and `NaN`s.
+
+    Export the indicators as dense bool columns with :meth:`dense`, (e.g. to join onto `master`,) or as a sparse matrix
+    with :meth:`sparse`, (e.g. for a model,) without densifying them.
+
+    """
+    def __init__(self, entry_ids, types):
+        """Build indicators from pairs of `EntryID`s and types; pairs missing either are left out, and duplicated pairs
+        are only counted once.
+
+        :param entry_ids: Each pair's `EntryID`.
+        :type entry_ids: numpy.ndarray.
+        :param types: Each pair's type.
+        :type types: numpy.ndarray.
+
+        """
+        entry_ids, types = np.asarray(entry_ids), np.asarray(types, dtype=object)
+        present = pd.notnull(entry_ids) & pd.notnull(types)
+        rows, index = pd.factorize(entry_ids[present], sort=True)
+        columns, types = pd.factorize(types[present], sort=True)
+        self.index = pd.Index(index, name='EntryID')
+        self.types = list(types)
+        self.width = (len(self.types) + 7) // 8
+        # set each pair's bit: the bytes of the bitset are counted into, with each pair's bit as its weight, so pairs
+        # have to be unique for the sums to be the ors
+        pairs = np.unique(rows.astype(np.int64) * len(self.types) + columns)
+        rows, columns = pairs // max(len(self.types), 1), pairs % max(len(self.types), 1)
+        bits = np.bincount(rows * self.width + columns // 8, weights=np.right_shift(128, columns % 8),
+                           minlength=max(len(self.index) * self.width, 1))
+        self.bits = bits[:len(self.index) * self.width].astype(np.uint8).reshape(len(self.index), self.width)
+
+    def column(self, t, entry_ids=None):
+        """Given a type, return which `EntryID`s have it.
+
+        :param t: The type.
+        :type t: str.
+        :param entry_ids: The `EntryID`s; `index` if not given.
+        :type entry_ids: list-like.
+        :rtype: numpy.ndarray of bool.
+
+        """
+        positions = np.arange(len(self.index)) if entry_ids is None else self.index.get_indexer(entry_ids)
+        column = np.zeros(len(positions), dtype=bool)
+        if t in self.types:
+            i = self.types.index(t)
+            found = positions >= 0
+            column[found] = (self.bits[positions[found], i // 8] & (128 >> i % 8)) > 0
+        return column
+
+    def dense(self, entry_ids=None, types=None, suffix=''):
+        """Return the indicators as a dataframe of bool columns, one per type, indexed by `EntryID`.
+
+        :param entry_ids: The `EntryID`s to return rows for, (`False` for those without indicators); `index` if not
+                          given.
+        :type entry_ids: list-like.
+        :param types: The types to return columns for, (`False` for those never seen); `types` if not given.
+        :type types: list of str.
+        :param suffix: A suffix for the columns, (e.g. ' Entry').
+        :type suffix: str.
+        :rtype: pandas.DataFrame.
+
+        """
+        df = pd.DataFrame(index=pd.Index(self.index if entry_ids is None else entry_ids, name='EntryID'))
+        for t in self.types if types is None else types:
+            df[t+suffix] = self.column(t, entry_ids)
+        return df
+
+    def sparse(self, entry_ids=None, types=None):
+        """Return the indicators as a sparse bool matrix, with a row per `EntryID` and a column per type, (in the same
+        order as :meth:`dense`,) without densifying them.
+
+        :param entry_ids: The `EntryID`s to return rows for; `index` if not given.
+        :type entry_ids: list-like.
+        :param types: The types to return columns for; `types` if not given.
+        :type types: list of str.
+        :rtype: scipy.sparse.csc_matrix.
+
+        """
+        import scipy.sparse
+        types = self.types if types is None else types
+        n = len(self.index) if entry_ids is None else len(entry_ids)
+        # build the matrix a column at a time, so only one type is ever dense
+        rows = [np.flatnonzero(self.column(t, entry_ids)) for t in types]
+        pointers = np.concatenate([[0], np.cumsum([len(r) for r in rows])]).astype(np.int64)
+        rows = np.concatenate(rows).astype(np.int64) if rows else np.zeros(0, dtype=np.int64)
+        return scipy.sparse.csc_matrix((np.ones(len(rows), dtype=bool), rows, pointers), shape=(n, len(types)))
+
 def get_disabilities(df_name):
-    """Given either 'entry_disabilities' or 'review_disabilities', compute a pivot table of disabilities.
+    """Given either 'entry_disabilities' or 'review_disabilities', compute the indicators of disabilities, (see
+    :class:`Indicators`).
 
     :param df_name: the name of the dataframe, either 'entry_disabilities' or 'review_disabilities'
     :type df_name: str.
+    :rtype: Indicators.
 
     """
     df = load_clean(df_name)
-    df = df[['EntryID','DisabilityType']].drop_duplicates()
-    df['value'] = True
-    return pd.pivot_table(df, values='value', index='EntryID', columns='DisabilityType')
+    return Indicators(df['EntryID'].values, df['DisabilityType'].values)
 
 income_replacements = {'Employment amount':                              'Earned Income (HUD)',
                        'Self Employment Wages':                          'Earned Income (HUD)',
@@ -879,33 +1657,24 @@ def get_income(df_name):
     """
     df = load_clean(df_name)
     # sort by start date, and only take the most recent entry for a given `SourceOfIncome`
-    df.sort('StartDate', inplace=True)
+    df = df.sort('StartDate')
     df = df.groupby(['EntryID','SourceOfIncome']).last()['Last30DayIncome'].reset_index()
     df_granular = pd.pivot_table(df, values='Last30DayIncome', index='EntryID', columns='SourceOfIncome')
     df_total = df.groupby('EntryID').sum()
     return df_granular, df_total
 
-def get_income_bucket(dollars):
-    """Return the income bucket.
+income_buckets = ['Zero dollars',
+                  '1 to 500 dollars',
+                  '501 to 1000 dollars',
+                  '1001 to 2000 dollars',
+                  '2001 to 3000 dollars',
+                  '3001 dollars and over']
 
-    :param dollars: Income.
-    :type dollars: int.
-
-    """
-    if pd.isnull(dollars):
-        return np.NaN
-    elif dollars == 0:
-        return 'Zero dollars'
-    elif dollars <= 500:
-        return '1 to 500 dollars'
-    elif dollars <= 1000:
-        return '501 to 1000 dollars'
-    elif dollars <= 2000:
-        return '1001 to 2000 dollars'
-    elif dollars <= 3000:
-        return '2001 to 3000 dollars'
-    else:
-        return '3001 dollars and over'
+# the repeated edge at 0 makes a bucket of just 0; (rare) negative incomes have always been counted as '1 to 500 dollars'
+income_bucket_spec = {'edges':      [0, 0, 500, 1000, 2000, 3000],
+                      'labels':     ['1 to 500 dollars'] + income_buckets,
+                      'closed':     ['left', 'right', 'right', 'right', 'right', 'right'],
+                      'categories': income_buckets}
 
 ncb_replacements = {'Other Source (HUD)':                 np.NaN,
                     'Other TANF-Funded Services (HUD)':   np.NaN,
@@ -930,17 +1699,41 @@ ncb_types = ['MEDICAID (HUD)',
 ncb_types_exit = [n+' Exit' for n in ncb_types]
 
 def get_ncb(df_name):
-    """Given either 'entry_ncb' or 'exit_ncb', compute a pivot table of ncbs.
+    """Given either 'entry_ncb' or 'exit_ncb', compute the indicators of ncbs, (see :class:`Indicators`).
 
     :param df_name: the name of the dataframe, either 'entry_ncb' or 'exit_ncb'
     :type df_name: str.
+    :rtype: Indicators.
 
     """
     df = load_clean(df_name)
-    # deduplicate
-    df = df[['EntryID','SourceOfNonCashBenefit']].drop_duplicates()
-    df['value'] = True
-    return pd.pivot_table(df, values='value', index='EntryID', columns='SourceOfNonCashBenefit')
+    return Indicators(df['EntryID'].values, df['SourceOfNonCashBenefit'].values)
+
+def get_income_and_ncb(entry_ids):
+    """Given `master`'s `EntryID`s, compute its entry and exit income and ncb information, (see :func:`get_income` and
+    :func:`get_ncb`,) as one block, indexed by `EntryID`, with a row for every `EntryID`.  Missing incomes are filled in
+    with `0`s, ncbs are bool columns, and total incomes are bucketed, so that the block can be joined onto
+    `master` once, rather than merging each piece and filling it in on the whole, ever-wider, `master`.
+
+    Exit columns are suffixed with ' Exit', (e.g. 'Last30DayIncome Exit' and 'MEDICAID (HUD) Exit').
+
+    :param entry_ids: `master`'s `EntryID`s.
+    :type entry_ids: pandas.Series.
+
+    """
+    index = pd.Index(pd.unique(entry_ids), name='EntryID')
+    blocks = []
+    for df_name, suffix, types, bucket in (('entry_income', '', income_types, 'Last30DayIncomeBucket'),
+                                           ('exit_income', ' Exit', income_types_exit, 'Last30DayIncomeExitBucket')):
+        granular, total = get_income(df_name)
+        granular = granular.reindex(index).rename(columns=lambda x: x+suffix)
+        granular.fillna({i: 0 for i in types}, inplace=True)
+        total = total.reindex(index).rename(columns=lambda x: x+suffix).fillna(0)
+        total[bucket] = bucketize(total['Last30DayIncome'+suffix], income_bucket_spec)
+        blocks += [granular, total]
+    for df_name, suffix in (('entry_ncb', ''), ('exit_ncb', ' Exit')):
+        blocks.append(get_ncb(df_name).dense(index, suffix=suffix))
+    return pd.concat(blocks, axis=1)
 
 review_details_housing_status_nans = ["Don't Know (HUD)", 'Refused (HUD)']
 
@@ -952,35 +1745,183 @@ review_details_housing_status_aggregates = {'Stably housed (HUD)':
 
 service_types = ['B Service', 'D Service', 'F Service', 'H Service', 'L Service', 'N Service', 'P Service', 'R Service', 'T Service']
 
-def get_services(df):
-    """Given either `master` as a dataframe, get the pivot table of services that client received during their stay.
+# the most memory :func:`get_services` should use at once for matching stays to services, in bytes
+services_max_memory = 2**30
+
+def get_services(df, s=None, max_memory=services_max_memory):
+    """Given either `master` as a dataframe, get the indicators of services that client received during their stay,
+    (see :class:`Indicators`).
+
+    Rather than merging every service onto every one of a client's stays, sort the services by client and start date,
+    and count how many of each `ServiceTypeL1` fall in each stay's window, `ProgramEntryDate <= ServiceStartDate <
+    ProgramExitDate`.  Only key columns are involved, and the stays are processed in chunks small enough to stay under
+    `max_memory`.
 
     :param df: `master`.
     :type df: pandas.Dataframe.
+    :param s: `services`; loaded with :func:`load_clean` if not given.
+    :type s: pandas.Dataframe.
+    :param max_memory: The most memory to use at once for matching, in bytes.
+    :type max_memory: int.
+    :rtype: Indicators.
 
     """
     # load services
-    s = load_clean('services')
-    # merge services into `df`
-    dfs = pd.merge(df, s, on='ClientID', how='right')
-    # only keep services that fall between the entry and exit dates
-    dfs = dfs[(dfs['ProgramEntryDate'] <= dfs['ServiceStartDate']) & (dfs['ServiceStartDate'] < dfs['ProgramExitDate'])]
-    dfs['value'] = True
-    # pivot out the services and return
-    return pd.pivot_table(dfs, values='value', index=['EntryID'], columns='ServiceTypeL1')
+    if s is None:
+        s = load_clean('services')
+    # only keep the key columns, and each distinct service type a client got on a given day
+    stays = df[pd.notnull(df['ProgramEntryDate']) & pd.notnull(df['ProgramExitDate'])][['ClientID','EntryID','ProgramEntryDate','ProgramExitDate']]
+    s = s[pd.notnull(s['ServiceStartDate'])][['ClientID','ServiceStartDate','ServiceTypeL1']].drop_duplicates()
+    # build a single key for each date that orders by client, then by date
+    clients, _ = pd.factorize(pd.concat([s['ClientID'], stays['ClientID']]))
+    dates, date_uniques = pd.factorize(pd.concat([s['ServiceStartDate'], stays['ProgramEntryDate'], stays['ProgramExitDate']]), sort=True)
+    n_s, n_stays = len(s), len(stays)
+    service_keys = clients[:n_s].astype(np.int64) * len(date_uniques) + dates[:n_s]
+    entry_keys = clients[n_s:].astype(np.int64) * len(date_uniques) + dates[n_s:n_s+n_stays]
+    exit_keys = clients[n_s:].astype(np.int64) * len(date_uniques) + dates[n_s+n_stays:]
+    # sorted service keys for each service type
+    service_types_l1 = sorted(s['ServiceTypeL1'].dropna().unique())
+    type_keys = [np.sort(service_keys[(s['ServiceTypeL1'] == t).values]) for t in service_types_l1]
+    # process stays in chunks: each one needs its keys and a couple of search results per service type
+    chunk_size = max(1, max_memory // (8 * (4 + 2 * len(service_types_l1))))
+    got = np.zeros((n_stays, len(service_types_l1)), dtype=bool)
+    for start in range(0, n_stays, chunk_size):
+        chunk = slice(start, start+chunk_size)
+        for i, keys in enumerate(type_keys):
+            # the number of services of this type between entry, (inclusive,) and exit, (exclusive)
+            got[chunk, i] = np.searchsorted(keys, exit_keys[chunk], side='left') > np.searchsorted(keys, entry_keys[chunk], side='left')
+    # only stays and service types with any services get indicators, (which combines any duplicated `EntryID`s)
+    rows, columns = np.nonzero(got)
+    return Indicators(stays['EntryID'].values[rows], np.array(service_types_l1, dtype=object)[columns])
+
+# the date format used throughout the raw data
+raw_date_format = "%m/%d/%Y"
+
+# NOTE: `ProviderID` is the provider's name, (e.g. 'Heartland Human Care Services(35)',) as in `Providers`' `Provider`,
+# not a number.  Zip codes are read as strings, so they can be compared with the census zips, (which are strings,) and
+# keep their leading zeros; inferring the column's type would make it numeric when a chunk has only numeric-looking
+# zips, and none of those would ever be valid.
+master_raw_schema = {'dtypes':       {'ClientUniqueID':                str,
+                                      'ClientID':                      np.int32,
+                                      'HouseholdID':                   np.float64,
+                                      'Entry Exit GroupID':            np.float64,
+                                      'EntryID':                       np.int32,
+                                      'ProviderID':                    str,
+                                      'YearOfBirth':                   str,
+                                      'ZipCodeOfLastPermanentAddress': str},
+                     'dates':        {'ProgramEntryDate': raw_date_format,
+                                      'ProgramExitDate':  raw_date_format,
+                                      'YearOfBirth':      "%Y",
+                                      'DateCreated':      raw_date_format,
+                                      'DateUpdated':      raw_date_format},
+                     # NOTE: the other replacements for `master` are made in :func:`clean`, after `Refused` has been
+                     # computed from the raw values
+                     'replacements': {'YearOfBirth': {'#NUM!': np.NaN}},
+                     'categoricals': ['Head Of Household?',
+                                      'SecondaryRace',
+                                      'PrimaryLanguageSpoken',
+                                      'ZipDataQuality',
+                                      'ExitReason',
+                                      'Anonymous']}
+
+# the schemas of the raw tables, (see `data_dictionary.md`,) which :func:`load_raw` uses to read and convert each chunk:
+#   - `dtypes`: the dtypes to read columns as, rather than inferring them; only columns with no blanks are read as ints
+#   - `dates`: the date columns to parse, and their formats
+#   - `replacements`: values to replace, as in :meth:`pandas.DataFrame.replace`
+#   - `rows`: a function that, given a chunk, returns a mask of the rows to keep
+#   - `categoricals`: text columns to store as categoricals
+raw_schemas = {'master':              dict(master_raw_schema,
+                                           # if we're cleaning `master`, (not `master_all`,) only take records after
+                                           # September 2012
+                                           rows=lambda chunk: chunk['DateCreated'] > switch_date),
+               'master_all':          master_raw_schema,
+               'providers':           {'dtypes': {'Provider':        str,
+                                                  'ProgramTypeCode': str,
+                                                  'AltProgramType':  str}},
+               'entry_details':       {'dtypes': {'ClientID': np.float64,
+                                                  'EntryID':  np.float64}},
+               'entry_disabilities':  {'dtypes':       {'ClientID': np.int32,
+                                                        'EntryID':  np.int32},
+                                       'dates':        {'StartDate': raw_date_format,
+                                                        'EndDate':   raw_date_format},
+                                       'replacements': {'DisabilityType': disability_type_replacements},
+                                       'categoricals': ['DisabilityDetermination']},
+               'review_disabilities': {'dates':        {'StartDate': raw_date_format,
+                                                        'EndDate':   raw_date_format},
+                                       'replacements': {'DisabilityType': disability_type_replacements},
+                                       'categoricals': ['DisabilityDetermination']},
+               'entry_income':        {'dtypes':       {'ClientID':         np.int32,
+                                                        'EntryID':          np.int32,
+                                                        'Last30DayIncome':  np.float64},
+                                       'dates':        {'StartDate': raw_date_format,
+                                                        'EndDate':   raw_date_format},
+                                       'replacements': {'SourceOfIncome': income_replacements}},
+               'entry_ncb':           {'dtypes':       {'ClientID': np.int32,
+                                                        'EntryID':  np.int32},
+                                       'dates':        {'StartDate': raw_date_format,
+                                                        'EndDate':   raw_date_format},
+                                       'replacements': {'SourceOfNonCashBenefit': ncb_replacements}},
+               'review_details':      {'dates':        {'ReviewDate': raw_date_format},
+                                       'replacements': {'HousingStatus': {s: np.NaN for s in review_details_housing_status_nans}},
+                                       'categoricals': ['ReviewType',
+                                                        'Do you have a disability of long duration?',
+                                                        'Income received from any source in past 30 days?',
+                                                        'Non-cash benefit received in past 30 days?',
+                                                        'Are you receiving Medicaid?']},
+               'services':            {'dtypes':       {'ServiceID':   np.int32,
+                                                        'ClientID':    np.int32,
+                                                        'ServiceCode': str},
+                                       'dates':        {'ServiceStartDate': raw_date_format,
+                                                        'ServiceEndDate':   raw_date_format,
+                                                        'DateCreated':      raw_date_format,
+                                                        'DateUpdated':      raw_date_format},
+                                       'categoricals': ['ServiceDescription])',
+                                                        'ProviderSpecificCode',
+                                                        'ServiceProvider',
+                                                        'FinancialAssistanceType',
+                                                        'NeedStatus']}}
+# exit income and ncb have the same schemas as entry income and ncb
+raw_schemas['exit_income'] = raw_schemas['entry_income']
+raw_schemas['exit_ncb'] = raw_schemas['entry_ncb']
+
+# the string columns of `master` to store as categoricals, and their known categories; where a column is normalized
+# through a replacement map, the map's targets are its categories
+master_categoricals = {'Relationship to HoH':                   replacement_targets(master_relationship_to_hoh_replacements),
+                       'Ethnicity':                             [],
+                       'PrimaryRace':                           replacement_targets(master_primary_race_replacements),
+                       'Race/Ethnicity (4-way)':                replacement_targets(race_replacements_4_way) + ['Hispanic/Latino (4-way)'],
+                       'Veteran?':                              [],
+                       'Veteran?Imputed':                       [],
+                       'PreviousLivingSituation':               replacement_targets(master_previous_living_situation_replacements),
+                       'LengthOfStayInPreviousLivingSituation': replacement_targets(master_length_of_stay_in_previous_living_situation_replacements),
+                       'DestinationAtExit':                     replacement_targets(master_destination_at_exit_replacements),
+                       'ProgramType':                           [],
+                       'ProgramTypeAggregate':                  replacement_targets(providers_program_type_aggregates),
+                       'CaseOutcome':                           replacement_targets(master_case_outcomes)}
 
 def print_usage():
     print "clean.py"
-    print "Usage: python clean.py DFNAME"
+    print "Usage: python clean.py [--profile] DFNAME"
+    print "       python clean.py [--profile] build [-j JOBS] DFNAME [DFNAME ...]"
     print
     print "Clean the given DFNAME into ./clean/"
+    print "With build, clean the given DFNAMEs and what they depend on, skipping any whose inputs haven't changed, and"
+    print "cleaning independent raw tables in JOBS worker processes"
+    print "With --profile, trace the time, memory, and shape of each stage of cleaning into ./clean/profiles/"
 
 if __name__ == "__main__":
     """Given the data frame name, load the raw data and cleaned dependencies, clean the raw data, and save it as a CSV
     and a pickle.  This should be in the form `entry_details`, not `EntryDetails`.
 
     """
-    if len(sys.argv) != 2:
+    if len(sys.argv) > 1 and sys.argv[1] == '--profile':
+        profile = True
+        del sys.argv[1]
+    if len(sys.argv) > 4 and sys.argv[1] == 'build' and sys.argv[2] == '-j':
+        build(sys.argv[4:], jobs=int(sys.argv[3]))
+    elif len(sys.argv) > 2 and sys.argv[1] == 'build':
+        build(sys.argv[2:])
+    elif len(sys.argv) != 2:
         print_usage()
     else:
         clean(sys.argv[1])
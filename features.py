@@ -75,6 +75,10 @@ family_counts = ['Under 6 years',
                  '65 years and over',
                  'OtherFamilyMembers']
 
+household = ['HouseholdSize',
+             'HouseholdClients',
+             'HoHAgeEntered']
+
 exit_stuff = ['DestinationAtExit',
               'LengthOfStay']
 
@@ -0,0 +1,140 @@
+"""A mock Weka server, for testing :mod:`pipeline` without Jython or Weka.
+
+It speaks the same protocol as `weka_server.py`, (one JSON request and one JSON response per line, on a local port that
+it prints on startup,) but runs in plain Python, e.g.
+
+    server = pipeline.WekaServer(command=[sys.executable, 'mock_weka_server.py'])
+
+Loading a dataset parses the ARFF, (dense or sparse, as written by :func:`pipeline.write_arff`).  Running a model checks
+that its dataset is loaded and has its features and target, like Weka would, and writes results and thresholds in the
+same shape as Weka's, (see :func:`pipeline.cv_results` and :func:`pipeline.threshold_curve`,) for a model that scores
+every row with the share of rows that are positive.
+
+Two classifiers fail like a model whose JVM runs out of heap, to test retrying: `mock.OutOfMemory` always does, and
+`mock.OutOfMemoryOnce` only does the first time it's run for each results path.  Their error says how many times the
+server has run the model, (e.g. 'java.lang.OutOfMemoryError: Java heap space, on run 2'), so tests can see its retries.
+
+"""
+import os, re, sys, csv, json, threading, traceback, collections, SocketServer
+import numpy as np
+import pipeline
+
+datasets = {}
+datasets_lock = threading.Lock()
+# The number of times each model has been run, by its results path
+runs = collections.Counter()
+
+class OutOfMemoryError(Exception):
+    pass
+
+# An ARFF token: quoted, (with backslash escapes,) or not
+arff_token = r"'(?:[^'\\]|\\.)*'|[^,'\s][^,]*"
+arff_escapes = {'n': '\n', 'r': '\r', 't': '\t'}
+
+def arff_unquote(token):
+    """Given an ARFF token, return its value, unquoted.
+
+    """
+    if token.startswith("'"):
+        return re.sub(r'\\(.)', lambda m: arff_escapes.get(m.group(1), m.group(1)), token[1:-1])
+    return token.strip()
+
+def arff_values(text):
+    """Given a comma-separated list of ARFF tokens, return their values.
+
+    """
+    return [arff_unquote(token) for token in re.findall(arff_token, text)]
+
+def read_arff(path):
+    """Given the path to an ARFF, return its attributes, (as a list of each one's name and nominal values, or None if
+    it isn't nominal,) and its rows, (as lists of tokens, with `?` for missing values).
+
+    """
+    attributes, rows, data = [], [], False
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith('%'):
+                continue
+            if data and line.startswith('{'):
+                # sparse rows leave out values that are 0, or the attribute's first value
+                row = ['0' if values is None else values[0] for name, values in attributes]
+                for i, token in re.findall(r'(\d+)\s+(' + arff_token + ')', line[1:-1]):
+                    row[int(i)] = arff_unquote(token)
+                rows.append(row)
+            elif data:
+                rows.append(arff_values(line))
+                if len(rows[-1]) != len(attributes):
+                    raise ValueError('Row {} has {} values, not {}: {}'.format(len(rows), len(rows[-1]), len(attributes), line))
+            elif line.lower().startswith('@attribute'):
+                name, kind = re.match(r"@attribute\s+('(?:[^'\\]|\\.)*'|\S+)\s+(.*)$", line, re.I).groups()
+                attributes.append((arff_unquote(name), arff_values(kind[1:-1]) if kind.startswith('{') else None))
+            elif line.lower().startswith('@data'):
+                data = True
+    return attributes, rows
+
+def load(request):
+    """Load a dataset into `datasets`.
+
+    :param request: The request, with the dataset's name and path.
+    :type request: dict.
+
+    """
+    dataset = read_arff(request['path'])
+    with datasets_lock:
+        datasets[request['dataset']] = dataset
+
+def run(request):
+    """Run a mock model on a loaded dataset, writing its results and thresholds.
+
+    :param request: The request, with the dataset's name, the features, target, classifier, and label to use, and the
+                    paths to write to.
+    :type request: dict.
+
+    """
+    classifier = request['classifier'].split()[0]
+    with datasets_lock:
+        attributes, rows = datasets[request['dataset']]
+        runs[request['results']] += 1
+        run = runs[request['results']]
+    if classifier == 'mock.OutOfMemory' or (classifier == 'mock.OutOfMemoryOnce' and run == 1):
+        raise OutOfMemoryError('Java heap space, on run {}'.format(run))
+    names = [name for name, values in attributes]
+    for c in request['features'] + [request['target']]:
+        if c not in names:
+            raise ValueError('No such attribute: {}'.format(c))
+    target = [row[names.index(request['target'])] for row in rows]
+    y = np.array([v == request['label'] for v in target if v != '?'], dtype=bool)
+    scores = np.repeat(y.mean() if len(y) else 0.0, len(y))
+    # write to temporary files, and rename them once they're written, like `weka_server.py`
+    pipeline.threshold_curve(y, scores).to_csv(request['thresholds'] + '.tmp', index=False, quoting=csv.QUOTE_NONE)
+    with open(request['results'] + '.tmp', 'w') as results:
+        results.write(pipeline.cv_results(request['classifier'], y, scores >= 0.5, 0.0))
+    os.rename(request['thresholds'] + '.tmp', request['thresholds'])
+    os.rename(request['results'] + '.tmp', request['results'])
+
+commands = {'load': load, 'run': run}
+
+class Handler(SocketServer.StreamRequestHandler):
+    def handle(self):
+        for line in iter(self.rfile.readline, ''):
+            request = json.loads(line)
+            try:
+                commands[request['command']](request)
+                response = {'status': 'ok'}
+            except OutOfMemoryError, e:
+                response = {'status': 'error', 'message': 'java.lang.OutOfMemoryError: {}'.format(e)}
+            except Exception:
+                response = {'status': 'error', 'message': traceback.format_exc()}
+            self.wfile.write(json.dumps(response) + '\n')
+            self.wfile.flush()
+
+class Server(SocketServer.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+if __name__ == '__main__':
+    server = Server(('localhost', int(sys.argv[1]) if len(sys.argv) > 1 else 0), Handler)
+    print server.server_address[1]
+    sys.stdout.flush()
+    server.serve_forever()
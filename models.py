@@ -14,3 +14,47 @@ decision_tree_pruned = 'trees.J48 -M 50'
 logistic_small = 'functions.Logistic -M 10'
 logistic = 'functions.Logistic'
 
+
+# Rough relative costs of training each kind of classifier, (per tree, for classifiers that take `-I`,) which
+# `pipeline.Pipeline.model` uses to start the most expensive models first
+classifier_costs = {
+    'trees.RandomForest': 1,
+    'trees.J48': 4,
+    'functions.Logistic': 2,
+}
+# The number of trees Weka builds when a classifier that takes `-I` isn't given it
+default_iterations = 10
+# The largest C, (the inverse of the ridge,) to give scikit-learn's LogisticRegression; Weka's default ridge, 1e-8, is
+# effectively no penalty, and the C it maps to, 5e7, leaves lbfgs badly conditioned, so it's capped to this instead
+max_logistic_C = 1e4
+
+def sklearn_estimator(classifier, n_jobs=1):
+    """Given a classifier from this module, return the closest scikit-learn estimator, for :mod:`pipeline`'s sklearn
+    backend.  RandomForest's `-I` is the number of trees, J48's `-M` is the minimum number of instances per leaf, and
+    Logistic's `-M` and `-R` are the maximum number of iterations and the ridge.  Weka penalizes the log-likelihood by
+    the ridge times the sum of the squared coefficients, and scikit-learn by the sum of the squared coefficients over
+    twice C, so C is 1 / (2 * ridge), (up to `max_logistic_C`).
+
+    :param classifier: The classifier.
+    :type classifier: str.
+    :param n_jobs: The number of jobs to train with, for estimators that can train in parallel.
+    :type n_jobs: int.
+
+    """
+    from sklearn.ensemble import RandomForestClassifier
+    from sklearn.tree import DecisionTreeClassifier
+    from sklearn.linear_model import LogisticRegression
+
+    options = classifier.split()
+    def option(flag, default, kind=int):
+        return kind(options[options.index(flag) + 1]) if flag in options else default
+
+    if options[0] == 'trees.RandomForest':
+        return RandomForestClassifier(n_estimators=option('-I', default_iterations), n_jobs=n_jobs, random_state=1)
+    if options[0] == 'trees.J48':
+        return DecisionTreeClassifier(criterion='entropy', min_samples_leaf=option('-M', 2), random_state=1)
+    if options[0] == 'functions.Logistic':
+        # Weka's -M -1, (the default,) means iterate until convergence
+        iterations = option('-M', -1)
+        return LogisticRegression(C=min(1 / (2 * option('-R', 1e-8, float)), max_logistic_C), max_iter=iterations if iterations > 0 else 1000, solver='lbfgs')
+    raise ValueError("No scikit-learn estimator for {}".format(classifier))
@@ -8,17 +8,52 @@ NOTE: The pipeline takes feature_sets, targets, and classifiers, and computes *a
 So, if you give it 5 feature_sets, 5 targets, and 5 classifiers, you'll end up with 125 models.
 
 """
-import os, csv, subprocess
+import os, re, csv, subprocess, signal, time, json, socket, threading, shlex, traceback, collections, hashlib, numbers
+import numpy as np
 import pandas as pd
 from matplotlib import pyplot as plt
+import models
 
 run_weka = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'run_weka.sh')
+run_weka_fold = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'run_weka_fold.sh')
+
+# The most models to run at once, and the most memory for them to use, in bytes; each model runs in its own JVM with a
+# `model_memory` heap, which is doubled each time a model runs out of memory, up to `oom_retries` times
+max_jobs = 8
+max_memory = 28 * 2**30
+model_memory = 4 * 2**30
+oom_retries = 2
+# In the Weka server, every model shares the server's heap, which is fixed when it starts, so models aren't budgeted
+# against `max_memory`, and one that runs out of memory is retried with the same heap, (in case the models running
+# alongside it were holding the memory,) up to `server_oom_retries` times
+server_oom_retries = 1
+# How long to wait between checking on running models, in seconds
+poll_interval = 1
+# The number of rows to write to ARFF at a time
+arff_chunk_size = 100000
+# The number of jobs each model trains with, with the scikit-learn backend, (-1 for one per core)
+sklearn_jobs = -1
+# The threshold curves most recently loaded by `load_thresholds`, (by path and the CSV's signature,) least recent first,
+# and how many of them to keep
+thresholds_cache = collections.OrderedDict()
+thresholds_cache_size = 64
+
+weka_server = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'weka_server.py')
+# The command to run the Weka server with; its heap, (the `{}`, in MB,) holds every dataset loaded into it and every
+# model running in it at once.  Change this if your install of Weka and/or Jython is different.
+weka_server_command = ['/usr/bin/jython', '-J-Xmx{}m', '-J-cp', '/usr/share/java/weka.jar', weka_server]
 
 class Pipeline:
-    def __init__(self, data, file_path, feature_sets, targets, classifiers):
+    def __init__(self, data, file_path, feature_sets, targets, classifiers, backend='weka', rows=None):
         """Given a data frame, a file_path, (within `weka/`,) feature_sets, targets, and classifiers, construct a
         pipeline.  See the `models.ipynb` example notebook for an example.
 
+        With the 'sklearn' `backend`, :meth:`model` runs the models in this process with scikit-learn, (see
+        :meth:`model_sklearn`,) instead of with Weka.
+
+        With `rows`, only those rows of the data frame are modeled; they're picked out as each dataset is written,
+        rather than by copying them into a data frame of their own, (see :class:`GroupedPipeline`).
+
         :param data: The dataframe to model.
         :type data: pandas.Dataframe
         :param file_path: The file path in which to put the results.
@@ -29,9 +64,15 @@ class Pipeline:
         :type targets: list of str.
         :param classifiers: The classifiers to use for modeling.
         :type classifiers: dict, where keys are str and values are str.
+        :param backend: What to model with: 'weka' or 'sklearn'.
+        :type backend: str.
+        :param rows: Which rows to model, if not all of them.
+        :type rows: numpy.ndarray of bool.
 
         """
         self.data = data
+        self.backend = backend
+        self.rows = rows
 
         self.file_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'weka', file_path)
 
@@ -40,26 +81,470 @@ class Pipeline:
         self.classifiers = classifiers # dict
 
         self.models = {"{}_to_{}_by_{}".format(fsname, t, cname): (fsname, cname, fs, t, c) for fsname, fs in self.feature_sets.iteritems() for t in self.targets for cname, c in self.classifiers.iteritems()}
+        self.status = {}
+
+    def model(self, max_jobs=max_jobs, max_memory=max_memory, server=None, sparse=False, n_jobs=sklearn_jobs, folds=None):
+        """Run the models in parallel, at most `max_jobs` at a time, and only as many as fit in `max_memory`, starting
+        with the most expensive, (see :meth:`cost`).  A model whose JVM runs out of memory is retried, up to
+        `oom_retries` times, with twice the heap.  `self.status` holds each model's status as it runs: 'queued',
+        'running', 'done', or 'failed'.
+
+        Models that already finished are skipped: each model that succeeds is recorded in the pipeline's manifest, (see
+        :meth:`load_manifest`,) with a hash of its data, feature set, target, and classifier, (see
+        :meth:`model_hashes`,) and it's only run again if that changes, or its results are missing.  So rerunning
+        `model()` after a run is killed, (or after some models fail,) only runs the models that didn't finish.
+
+        Each target's data is written to ARFF once, (see :meth:`write_dataset`,) and shared by every model of that
+        target.
+
+        With a `server`, the models run in the Weka server instead of each in its own JVM; the data is written and
+        loaded into the server once, and each model is a request to run on some of its columns.  The server's heap is
+        fixed, so only `max_jobs` limits how many run at once, and a model that runs out of memory is retried with the
+        same heap, up to `server_oom_retries` times.
 
-    def model(self):
-        """Run the models, all in parallel.
+        With `folds`, each model's cross-validation is split into that many jobs, one per fold, which are scheduled like
+        models, (so a single expensive model runs on as many cores as it has folds,) and each fold's predictions are
+        pooled into the model's thresholds and results once they're all done, (see :meth:`write_folds` and
+        :meth:`pool_folds`).  `self.status` then holds each fold's status.
+
+        :param max_jobs: The most models to run at once.
+        :type max_jobs: int.
+        :param max_memory: The most memory for the models running at once to use, in bytes.
+        :type max_memory: int.
+        :param server: The Weka server to run the models in, if any.
+        :type server: :class:`WekaServer`.
+        :param sparse: Whether to write the data in sparse ARFF, (see :func:`write_arff`).
+        :type sparse: bool.
+        :param n_jobs: With the sklearn backend, the number of jobs to train each model with.
+        :type n_jobs: int.
+        :param folds: The number of cross-validation folds to run as separate jobs, if any.
+        :type folds: int.
+        :returns: The exit code of each model, (0 for the ones that were skipped).
+        :rtype: dict, where keys are model names and values are int.
+
+        """
+        if self.backend == 'sklearn':
+            return self.model_sklearn(n_jobs)
+        return run_models([self], max_jobs, max_memory, server, sparse, folds)[0]
+
+    def prepare(self, server=None, sparse=False, folds=None, column_hashes=None):
+        """Get ready to run the models, (see :meth:`model`): find the ones that haven't finished, and write the data
+        they need, (or load it into the `server`).
+
+        :param server: The Weka server to run the models in, if any.
+        :type server: :class:`WekaServer`.
+        :param sparse: Whether to write the data in sparse ARFF.
+        :type sparse: bool.
+        :param folds: The number of cross-validation folds to run as separate jobs, if any.
+        :type folds: int.
+        :param column_hashes: Hashes of columns already computed, (see :meth:`model_hashes`).
+        :type column_hashes: dict.
+        :returns: The manifest, each model's hash, the exit code of each model that's skipped, (0,) and the models
+                  left to run.
+        :rtype: tuple of dict, dict, dict, and list of str.
 
         """
         subprocess.Popen(['mkdir', '-p', self.file_path]).wait()
-        procs = {}
+        manifest = self.load_manifest()
+        hashes = self.model_hashes(folds, column_hashes)
+        codes, pending = {}, []
+        for model_name in sorted(self.models):
+            if self.completed(manifest, model_name, hashes[model_name]):
+                codes[model_name] = 0
+                print "{} is up to date".format(model_name)
+            else:
+                pending.append(model_name)
+        # only write the data that the models left to run need
+        targets = [t for t in self.targets if any(self.models[model_name][3] == t for model_name in pending)]
+        if server is not None:
+            if pending:
+                self.load_server_dataset(server, sparse)
+        elif folds:
+            for t in targets:
+                self.write_folds(t, folds, sparse)
+        else:
+            for t in targets:
+                self.write_dataset(t, sparse)
+        return manifest, hashes, codes, pending
+
+    def model_hashes(self, folds=None, column_hashes=None):
+        """Return a hash of what each model's results depend on: the backend, the number of folds, if any, and the
+        model's feature set, target, and classifier, (with the sklearn backend, the estimator it maps to, see
+        `models.sklearn_estimator`,) and the data in its features and target, (see :func:`column_hash`; each column is
+        hashed once,) and which rows it models.
+
+        :param folds: The number of cross-validation folds run as separate jobs, if any, (see :meth:`model`).
+        :type folds: int.
+        :param column_hashes: Hashes of columns already computed, which are added to, so pipelines of the same data
+                              can share them, (see :func:`run_models`).
+        :type column_hashes: dict, where keys are tuples of the id of the data frame and the column, and values are str.
+        :rtype: dict, where keys are model names and values are str.
+
+        """
+        columns = column_hashes if column_hashes is not None else {}
+        rows = hashlib.sha1(self.rows.tobytes()).hexdigest() if self.rows is not None else None
+        hashes = {}
         for model_name, (fs_name, cname, fs, t, c) in self.models.iteritems():
-            # sort the dataframe by the target so that all models are classifying the same direction
-            # (e.g. we don't want one model to classify as True and another to classify as False
-            self.write_weka_csv(model_name, fs, t, self.data.sort(t, ascending=False))
-            procs[model_name] = subprocess.Popen([run_weka, self.file_path, model_name, c])
-        return [m.wait() for m in procs.values()]
+            for column in fs + [t]:
+                if (id(self.data), column) not in columns:
+                    columns[id(self.data), column] = column_hash(self.data[column])
+            if self.backend == 'sklearn':
+                c = repr(models.sklearn_estimator(c))
+            key = [self.backend, folds or None, rows, fs, t, c, [columns[id(self.data), column] for column in fs + [t]]]
+            hashes[model_name] = hashlib.sha1(json.dumps(key)).hexdigest()
+        return hashes
+
+    def completed(self, manifest, model_name, model_hash):
+        """Given the manifest, a model, and its hash, (see :meth:`model_hashes`,) return whether it's already finished:
+        it succeeded with the same hash, and its thresholds and results are still there.
+
+        :param manifest: The manifest.
+        :type manifest: dict.
+        :param model_name: The model.
+        :type model_name: str.
+        :param model_hash: The model's hash.
+        :type model_hash: str.
+
+        """
+        return (manifest['models'].get(model_name) == model_hash and
+                all(os.path.exists(os.path.join(self.file_path, model_name+suffix)) for suffix in ('_thresholds.csv', '_results.txt')))
+
+    def manifest_path(self):
+        """Return the path to the pipeline's manifest, of the models that have finished, (see :meth:`model`).
+
+        """
+        return os.path.join(self.file_path, 'manifest.json')
+
+    def load_manifest(self):
+        """Return the pipeline's manifest, or an empty one if no models have finished yet.
+
+        """
+        if not os.path.exists(self.manifest_path()):
+            return {'models': {}}
+        with open(self.manifest_path()) as f:
+            return json.load(f)
+
+    def save_manifest(self, manifest):
+        """Given the pipeline's manifest, save it, replacing the old one all at once so that a killed run can't leave it
+        half-written.
+
+        :param manifest: The manifest.
+        :type manifest: dict.
+
+        """
+        with open(self.manifest_path()+'.tmp', 'w') as f:
+            json.dump(manifest, f, indent=2, sort_keys=True)
+        os.rename(self.manifest_path()+'.tmp', self.manifest_path())
+
+    def job_name(self, model_name, fold=None):
+        """Given a model, and one of its folds, if any, return the name of the job that runs it, (see :meth:`model`).
+
+        :param model_name: The model.
+        :type model_name: str.
+        :param fold: The fold.
+        :type fold: int.
+
+        """
+        return model_name if fold is None else "{}_fold{}".format(model_name, fold)
+
+    def model_sklearn(self, n_jobs=sklearn_jobs):
+        """Run the models in this process with scikit-learn, (see `models.sklearn_estimator`,) one at a time, each
+        training with `n_jobs` jobs.  Like Weka's `-t`, each model is evaluated by stratified 10-fold cross-validation,
+        and its thresholds and results are written in the same shape as Weka's, so :meth:`plot_roc` and :meth:`plot_pr`
+        work the same.  The design matrix for each feature set and target is built once, and shared by its models.
+        Models that already finished are skipped, like in :meth:`model`.
+
+        :param n_jobs: The number of jobs to train each model with.
+        :type n_jobs: int.
+        :returns: The exit code of each model, (0 if it succeeded, or was skipped, 1 if not, with the error in its
+                  `_errors.txt`).
+        :rtype: dict, where keys are model names and values are int.
+
+        """
+        subprocess.Popen(['mkdir', '-p', self.file_path]).wait()
+        manifest = self.load_manifest()
+        hashes = self.model_hashes()
+        self.status = {model_name: 'queued' for model_name in self.models}
+        codes = {}
+        for fs_name, fs in sorted(self.feature_sets.iteritems()):
+            for t in self.targets:
+                pending = []
+                for cname, c in sorted(self.classifiers.iteritems()):
+                    model_name = "{}_to_{}_by_{}".format(fs_name, t, cname)
+                    if self.completed(manifest, model_name, hashes[model_name]):
+                        codes[model_name] = 0
+                        self.status[model_name] = 'done'
+                        print "{} is up to date".format(model_name)
+                    else:
+                        pending.append((model_name, c))
+                if not pending:
+                    continue
+                known = self.known(t)
+                X = design_matrix(self.data.loc[known, fs])
+                # the target's largest value is the positive class, so every model classifies in the same direction
+                # (e.g. we don't want one model to classify as True and another to classify as False
+                y = (self.data.loc[known, t] == positive_value(self.data[t])).values
+                for model_name, c in pending:
+                    print "Running {} with scikit-learn".format(model_name)
+                    self.status[model_name] = 'running'
+                    with open(os.path.join(self.file_path, model_name+'_errors.txt'), 'w') as errors:
+                        try:
+                            self.run_sklearn(model_name, models.sklearn_estimator(c, n_jobs), X, y, n_jobs)
+                            codes[model_name] = 0
+                        except Exception:
+                            errors.write(traceback.format_exc())
+                            codes[model_name] = 1
+                    self.status[model_name] = 'done' if codes[model_name] == 0 else 'failed'
+                    print "{} {}".format(model_name, self.status[model_name])
+                    if codes[model_name] == 0:
+                        manifest['models'][model_name] = hashes[model_name]
+                        self.save_manifest(manifest)
+        return codes
+
+    def run_sklearn(self, model_name, estimator, X, y, n_jobs=sklearn_jobs):
+        """Cross-validate a scikit-learn estimator, and write its thresholds, (see :func:`threshold_curve`,) and results.
+
+        :param model_name: The model.
+        :type model_name: str.
+        :param estimator: The estimator.
+        :type estimator: sklearn.base.BaseEstimator.
+        :param X: The design matrix.
+        :type X: numpy.ndarray.
+        :param y: Whether each row is positive.
+        :type y: numpy.ndarray of bool.
+        :param n_jobs: The number of jobs to run the folds with.
+        :type n_jobs: int.
+
+        """
+        from sklearn.model_selection import StratifiedKFold, cross_val_predict
+
+        folds = StratifiedKFold(n_splits=10, shuffle=True, random_state=1)
+        # estimators that train in parallel already use n_jobs, so only run their folds one at a time
+        fold_jobs = 1 if getattr(estimator, 'n_jobs', None) is not None else n_jobs
+        start = time.time()
+        scores = cross_val_predict(estimator, X, y, cv=folds, method='predict_proba', n_jobs=fold_jobs)[:, 1]
+        seconds = time.time() - start
+        self.write_model_results(model_name, threshold_curve(y, scores), cv_results(repr(estimator), y, scores >= 0.5, seconds))
+
+    def write_model_results(self, model_name, thresholds, results):
+        """Write a model's thresholds and results, (see :func:`threshold_curve` and :func:`cv_results`,) each to a
+        temporary file that's renamed once it's written, so a killed run never leaves half of either.
+
+        :param model_name: The model.
+        :type model_name: str.
+        :param thresholds: The threshold curve.
+        :type thresholds: pandas.DataFrame.
+        :param results: The results.
+        :type results: str.
+
+        """
+        path = os.path.join(self.file_path, model_name)
+        thresholds.to_csv(path+'_thresholds.csv.tmp', index=False, quoting=csv.QUOTE_NONE)
+        with open(path+'_results.txt.tmp', 'w') as f:
+            f.write(results)
+        os.rename(path+'_thresholds.csv.tmp', path+'_thresholds.csv')
+        os.rename(path+'_results.txt.tmp', path+'_results.txt')
+
+    def start(self, model_name, heap, server=None, fold=None):
+        """Start running a model with Weka, in a subprocess, with the given heap size, on its target's dataset, (see
+        :meth:`write_dataset`); or, with a `server`, in the Weka server, (see :meth:`load_server_dataset`); or, with a
+        `fold`, start running just that fold of it, (see :meth:`write_folds`).
+
+        :param model_name: The model to run.
+        :type model_name: str.
+        :param heap: The most memory Weka can use, in bytes, (ignored with a `server`, whose heap is fixed).
+        :type heap: int.
+        :param server: The Weka server to run the model in, if any.
+        :type server: :class:`WekaServer`.
+        :param fold: The fold to run, if any.
+        :type fold: int.
+        :returns: The subprocess, (or server job,) running the model.
+        :rtype: subprocess.Popen, or :class:`ServerJob`.
+
+        """
+        fs_name, cname, fs, t, c = self.models[model_name]
+        if server is not None:
+            print "Running {} in the Weka server".format(model_name)
+            return server.run(self.file_path, fs, t, c, positive_value(self.data[t]),
+                              os.path.join(self.file_path, model_name+'_results.txt'),
+                              os.path.join(self.file_path, model_name+'_thresholds.csv'),
+                              os.path.join(self.file_path, model_name+'_errors.txt'))
+        job = self.job_name(model_name, fold)
+        print "Running {} with {}MB".format(job, heap / 2**20)
+        with open(os.path.join(self.file_path, job+'_errors.txt'), 'w') as errors:
+            if fold is not None:
+                return subprocess.Popen([run_weka_fold, self.file_path, self.fold_name(t, fold), job, '{}m'.format(heap / 2**20)] + self.classifier_options(model_name), stderr=errors)
+            return subprocess.Popen([run_weka, self.file_path, self.dataset_name(t), model_name, '{}m'.format(heap / 2**20)] + self.classifier_options(model_name), stderr=errors)
+
+    def known(self, target):
+        """Given a target, return which rows of the data frame are modeled, (see `rows`,) and have it.
+
+        :param target: The target.
+        :type target: str.
+        :rtype: numpy.ndarray of bool.
+
+        """
+        known = self.data[target].notnull().values
+        return known & self.rows if self.rows is not None else known
+
+    def dataset_name(self, target):
+        """Given a target, return the name of its dataset, (see :meth:`write_dataset`).
 
-    def write_weka_csv(self, model_name, feature_set, target, m):
-        """Write a CSV for Weka to use in file_path.
+        :param target: The target.
+        :type target: str.
 
+        """
+        return "{}_dataset".format(target)
+
+    def dataset_features(self):
+        """Return every feature that any feature set uses, in the order they first appear in the feature sets, (sorted
+        by name,) which is the order of the features in each target's dataset.
+
+        """
+        features = []
+        for fs_name in sorted(self.feature_sets):
+            features += [f for f in self.feature_sets[fs_name] if f not in features]
+        return features
+
+    def write_dataset(self, target, sparse=False):
+        """Write the dataset for a target, with every feature that any feature set uses, and the target, to ARFF, (see
+        :func:`write_arff`,) for every model of that target to share.
+
+        :param target: The target.
+        :type target: str.
+        :param sparse: Whether to write sparse ARFF.
+        :type sparse: bool.
+
+        """
+        name = self.dataset_name(target)
+        write_arff(self.data, os.path.join(self.file_path, name+'.arff'), name, self.dataset_features(), target, sparse, rows=self.rows)
+
+    def fold_name(self, target, fold):
+        """Given a target and a fold, return the name of the fold's datasets, (see :meth:`write_folds`).
+
+        :param target: The target.
+        :type target: str.
+        :param fold: The fold.
+        :type fold: int.
+
+        """
+        return "{}_fold{}".format(self.dataset_name(target), fold)
+
+    def write_folds(self, target, folds, sparse=False):
+        """Split the rows with a target into stratified folds, (see :func:`stratified_folds`,) and write a training set,
+        (the rows in every other fold,) and a test set, (the rows in the fold,) for each fold to ARFF, like
+        :meth:`write_dataset`, for every model of that target to share.
+
+        :param target: The target.
+        :type target: str.
+        :param folds: The number of folds.
+        :type folds: int.
+        :param sparse: Whether to write sparse ARFF.
+        :type sparse: bool.
+
+        """
+        known = self.known(target)
+        assignments = np.repeat(-1, len(self.data))
+        assignments[known] = stratified_folds(self.data[target].values[known], folds)
+        for fold in range(folds):
+            name = self.fold_name(target, fold)
+            for kind, rows in (('train', known & (assignments != fold)), ('test', assignments == fold)):
+                write_arff(self.data, os.path.join(self.file_path, name+'_'+kind+'.arff'), name+'_'+kind, self.dataset_features(), target, sparse, rows=rows)
+
+    def pool_folds(self, model_name, folds, codes, seconds):
+        """Given a model whose folds have been run, (see :meth:`model`,) with each job's exit code and how long it took,
+        pool the folds' predictions, and write the model's thresholds, (see :func:`threshold_curve`,) and results, as if
+        Weka had cross-validated it in one job.
+
+        :param model_name: The model.
+        :type model_name: str.
+        :param folds: The number of folds.
+        :type folds: int.
+        :param codes: The exit code of each job.
+        :type codes: dict, where keys are job names and values are int.
+        :param seconds: How long each job took, in seconds.
+        :type seconds: dict, where keys are job names and values are float.
+        :returns: The model's exit code, (0 if every fold succeeded, otherwise the first fold's that didn't).
+        :rtype: int.
+
+        """
+        jobs = [self.job_name(model_name, fold) for fold in range(folds)]
+        failed = [codes[job] for job in jobs if codes[job] != 0]
+        if failed:
+            return failed[0]
+        predictions = []
+        for job in jobs:
+            with open(os.path.join(self.file_path, job+'_predictions.txt')) as f:
+                predictions.append(parse_predictions(f.read()))
+        y, scores, predicted = [np.concatenate(p) for p in zip(*predictions)]
+        self.write_model_results(model_name, threshold_curve(y, scores), cv_results(self.models[model_name][4], y, predicted, sum(seconds[job] for job in jobs)))
+        return 0
+
+    def classifier_options(self, model_name):
+        """Given a model, return the arguments for running its classifier with Weka, (after `weka.classifiers.`,) on its
+        target's dataset: the classifier itself if the model uses every feature in the dataset, otherwise the classifier
+        wrapped in a FilteredClassifier that removes the features the model doesn't use.
+
+        :param model_name: The model.
+        :type model_name: str.
+
+        """
+        fs_name, cname, fs, t, c = self.models[model_name]
+        options = shlex.split(c)
+        features = self.dataset_features()
+        if set(fs) == set(features):
+            return options
+        # keep the model's features and the target, (which is last,) by their 1-based indices
+        keep = ','.join(str(features.index(f) + 1) for f in fs) + ',last'
+        return ['meta.FilteredClassifier', '-F', 'weka.filters.unsupervised.attribute.Remove -V -R {}'.format(keep),
+                '-W', 'weka.classifiers.' + options[0], '--'] + options[1:]
+
+    def cost(self, model_name):
+        """Estimate how expensive a model is to train, relative to the others, (even other pipelines',) from its
+        classifier, (see `models.classifier_costs`,) its number of features, and its number of rows.
+
+        :param model_name: The model.
+        :type model_name: str.
+
+        """
+        fs_name, cname, fs, t, c = self.models[model_name]
+        options = c.split()
+        cost = models.classifier_costs.get(options[0], 1)
+        if '-I' in options:
+            cost *= int(options[options.index('-I') + 1])
+        elif options[0] == 'trees.RandomForest':
+            cost *= models.default_iterations
+        return cost * len(fs) * (self.rows.sum() if self.rows is not None else len(self.data))
+
+    def out_of_memory(self, model_name, code):
+        """Given a model that exited with `code`, return whether it ran out of memory: either the JVM threw an
+        OutOfMemoryError, or the process was killed, (which the kernel does when the machine runs out of memory).
+
+        :param model_name: The model.
+        :type model_name: str.
+        :param code: The model's exit code.
+        :type code: int.
+
+        """
+        if code in (-signal.SIGKILL, 128 + signal.SIGKILL):
+            return True
+        with open(os.path.join(self.file_path, model_name+'_errors.txt')) as errors:
+            return 'OutOfMemoryError' in errors.read()
+
+    def load_server_dataset(self, server, sparse=False):
+        """Write every column that any model uses to ARFF, and load it into the Weka server, as the dataset named by
+        this pipeline's file_path.
+
+        :param server: The Weka server.
+        :type server: :class:`WekaServer`.
+        :param sparse: Whether to write sparse ARFF.
+        :type sparse: bool.
 
         """
-        m[feature_set+[target]].dropna(subset=[target]).to_csv(os.path.join(self.file_path, model_name+'.csv'), na_rep='?', quoting=csv.QUOTE_NONNUMERIC, index=False)
+        columns = self.dataset_features() + [t for t in self.targets if t not in self.dataset_features()]
+        path = os.path.join(self.file_path, 'data.arff')
+        write_arff(self.data, path, 'data', columns, sparse=sparse, rows=self.rows)
+        server.load(self.file_path, path)
 
     def plot_roc(self, feature_sets=None, targets=None, classifiers=None, label_prefix=''):
         """Use output from :func:`model` to plot receiver-operator curves for all or a given subset of the models this
@@ -89,6 +574,64 @@ class Pipeline:
         """
         self.plot('Recall', 'Precision', feature_sets, targets, classifiers, label_prefix)
 
+    def results(self, feature_sets=None, targets=None, classifiers=None):
+        """Use output from :func:`model` to summarize all or a given subset of the models this pipeline embodies, from
+        their threshold curves, (see :func:`load_thresholds`).  Models without results yet are left out.
+
+        :param feature_sets: The feature sets to summarize.
+        :type feature_sets: list of str, the keys for the `feature_sets` for this pipeline.
+        :param targets: The targets sets to summarize.
+        :type targets: list of str, matching the `targets` for this pipeline.
+        :param classifiers: The classifiers to summarize.
+        :type feature_sets: list of str, the keys for the `classifiers` for this pipeline.
+        :returns: One row per model, with its feature set, target, and classifier, the number of instances it was
+                  evaluated on, the areas under its ROC and precision-recall curves, and its best F-measure and the
+                  threshold it's at.
+        :rtype: pandas.DataFrame, indexed by model name.
+
+        """
+        feature_sets = feature_sets or self.feature_sets
+        targets = targets or self.targets
+        classifiers = classifiers or self.classifiers
+
+        rows = {}
+        for model_name, (fsname, cname, fs, t, c) in self.models.iteritems():
+            path = os.path.join(self.file_path, model_name+'_thresholds.csv')
+            if fsname in feature_sets and t in targets and cname in classifiers and os.path.exists(path):
+                rows[model_name] = dict(threshold_summary(load_thresholds(path)), FeatureSet=fsname, Target=t, Classifier=cname)
+        columns = ['FeatureSet', 'Target', 'Classifier', 'Instances', 'ROC AUC', 'PR AUC', 'Best FMeasure', 'Best Threshold']
+        return pd.DataFrame.from_dict(rows, orient='index').reindex(columns=columns).sort_index()
+
+    def summary(self, feature_sets=None, targets=None, classifiers=None):
+        """Use output from :func:`model` to tabulate the metrics Weka reports in its results, (see :func:`parse_results`,)
+        for all or a given subset of the models this pipeline embodies.  Models without results yet are left out.
+
+        :param feature_sets: The feature sets to summarize.
+        :type feature_sets: list of str, the keys for the `feature_sets` for this pipeline.
+        :param targets: The targets sets to summarize.
+        :type targets: list of str, matching the `targets` for this pipeline.
+        :param classifiers: The classifiers to summarize.
+        :type feature_sets: list of str, the keys for the `classifiers` for this pipeline.
+        :returns: One row per model and metric, with the model's name, feature set, target, and classifier, and the
+                  evaluation, (e.g. 'Stratified cross-validation',) metric, class, (for per-class metrics,) and value.
+        :rtype: pandas.DataFrame.
+
+        """
+        feature_sets = feature_sets or self.feature_sets
+        targets = targets or self.targets
+        classifiers = classifiers or self.classifiers
+
+        summaries = []
+        for model_name, (fsname, cname, fs, t, c) in sorted(self.models.iteritems()):
+            path = os.path.join(self.file_path, model_name+'_results.txt')
+            if fsname in feature_sets and t in targets and cname in classifiers and os.path.exists(path):
+                summary = load_results(path)
+                for column, value in (('Model', model_name), ('FeatureSet', fsname), ('Target', t), ('Classifier', cname)):
+                    summary[column] = value
+                summaries.append(summary)
+        columns = ['Model', 'FeatureSet', 'Target', 'Classifier'] + results_columns
+        return pd.concat(summaries, ignore_index=True)[columns] if summaries else pd.DataFrame(columns=columns)
+
     def plot(self, x, y, feature_sets=None, targets=None, classifiers=None, label_prefix=''):
         """Helper method for :func:`plot_roc` and :func:`plot_rc`.
 
@@ -99,9 +642,715 @@ class Pipeline:
 
         for model_name, (fsname, cname, fs, t, c) in self.models.iteritems():
             if fsname in feature_sets and t in targets and cname in classifiers:
-                thresholds = pd.read_csv(os.path.join(self.file_path, model_name+'_thresholds.csv'))
+                thresholds = load_thresholds(os.path.join(self.file_path, model_name+'_thresholds.csv'))
                 plt.plot(thresholds[x], thresholds[y], label=label_prefix+model_name)
                 plt.axis('image')
                 plt.xlabel(x)
                 plt.ylabel(y)
                 plt.legend(loc=4)
+
+def run_models(pipelines, max_jobs=max_jobs, max_memory=max_memory, server=None, sparse=False, folds=None):
+    """Run the models of one or more pipelines in one pool, like :meth:`Pipeline.model`, (which has the details,) at
+    most `max_jobs` at a time, and only as many as fit in `max_memory`, starting with the most expensive of any
+    pipeline's, (see :meth:`Pipeline.cost`).  Each pipeline's `status` holds the status of its models.
+
+    :param pipelines: The pipelines.
+    :type pipelines: list of :class:`Pipeline`.
+    :param max_jobs: The most models to run at once.
+    :type max_jobs: int.
+    :param max_memory: The most memory for the models running at once to use, in bytes.
+    :type max_memory: int.
+    :param server: The Weka server to run the models in, if any.
+    :type server: :class:`WekaServer`.
+    :param sparse: Whether to write the data in sparse ARFF, (see :func:`write_arff`).
+    :type sparse: bool.
+    :param folds: The number of cross-validation folds to run as separate jobs, if any.
+    :type folds: int.
+    :returns: The exit code of each model of each pipeline, (0 for the ones that were skipped).
+    :rtype: list of dict, one per pipeline, where keys are model names and values are int.
+
+    """
+    if folds and server is not None:
+        raise ValueError("Folds can't be run as separate jobs in the Weka server")
+    column_hashes = {}
+    manifests, hashes, codes, pending = zip(*[p.prepare(server, sparse, folds, column_hashes) for p in pipelines])
+    # each job is a model, or one fold of a model, of one of the pipelines, (by its index)
+    fold_range = range(folds) if folds else [None]
+    jobs = {(i, p.job_name(model_name, fold)): (model_name, fold) for i, p in enumerate(pipelines) for model_name in pending[i] for fold in fold_range}
+    queue = sorted(jobs, key=lambda job: pipelines[job[0]].cost(jobs[job][0]), reverse=True)
+    heaps = {job: model_memory for job in queue}
+    tries = {job: 0 for job in queue}
+    for i, p in enumerate(pipelines):
+        p.status = {p.job_name(model_name, fold): 'done' for model_name in codes[i] for fold in fold_range}
+    for i, job in queue:
+        pipelines[i].status[job] = 'queued'
+    # name jobs by their pipeline's directory too, if there's more than one
+    name = lambda job: job[1] if len(pipelines) == 1 else os.path.join(os.path.basename(pipelines[job[0]].file_path), job[1])
+    procs, job_codes, started, seconds = {}, [{} for p in pipelines], {}, [{} for p in pipelines]
+    while queue or procs:
+        progressed = False
+        # start jobs in order, as long as they fit, (but always start one if nothing's running, so a job that needs
+        # more than max_memory still runs, alone; jobs in the server all share its heap, so they always fit)
+        while queue and len(procs) < max_jobs and (server is not None or not procs or sum(heaps[j] for j in procs) + heaps[queue[0]] <= max_memory):
+            job = queue.pop(0)
+            i, job_name = job
+            procs[job] = pipelines[i].start(jobs[job][0], heaps[job], server=server, fold=jobs[job][1])
+            started[job] = time.time()
+            tries[job] += 1
+            pipelines[i].status[job_name] = 'running'
+            progressed = True
+        for job, proc in procs.items():
+            code = proc.poll()
+            if code is None:
+                continue
+            del procs[job]
+            progressed = True
+            i, job_name = job
+            p = pipelines[i]
+            if code != 0 and p.out_of_memory(job_name, code) and tries[job] <= (oom_retries if server is None else server_oom_retries):
+                if server is None:
+                    heaps[job] *= 2
+                    print "{} ran out of memory; retrying with {}MB".format(name(job), heaps[job] / 2**20)
+                else:
+                    print "{} ran out of memory in the Weka server; retrying with the same heap".format(name(job))
+                p.status[job_name] = 'queued'
+                queue.insert(0, job)
+                continue
+            job_codes[i][job_name] = code
+            seconds[i][job_name] = time.time() - started[job]
+            p.status[job_name] = 'done' if code == 0 else 'failed'
+            print "{} {}".format(name(job), p.status[job_name])
+            # record each model as soon as it's finished, (once all its folds are,) so a killed run keeps it
+            model_name = jobs[job][0]
+            if all(p.job_name(model_name, fold) in job_codes[i] for fold in fold_range):
+                codes[i][model_name] = p.pool_folds(model_name, folds, job_codes[i], seconds[i]) if folds else code
+                if codes[i][model_name] == 0:
+                    manifests[i]['models'][model_name] = hashes[i][model_name]
+                    p.save_manifest(manifests[i])
+        if not progressed:
+            time.sleep(poll_interval)
+    return list(codes)
+
+class GroupedPipeline:
+    def __init__(self, data, file_path, group_by, feature_sets, targets, classifiers, groups=None, backend='weka'):
+        """Given a data frame, a file_path, (within `weka/`,) a column to group by, feature_sets, targets, and
+        classifiers, construct a pipeline for each group's rows, (e.g. each program type,) with all of the models,
+        in a directory of its own within file_path.
+
+        Each group's rows are found once, and its pipeline models just those rows of the data frame, without copying
+        them, (see `Pipeline.rows`).  :meth:`model` runs every group's models in one pool, and :meth:`results` and
+        :meth:`summary` tabulate them by group; each group's pipeline is `self.pipelines[group]`.
+
+        :param data: The dataframe to model.
+        :type data: pandas.Dataframe
+        :param file_path: The file path in which to put each group's results.
+        :type file_path: str.
+        :param group_by: The column to group by.
+        :type group_by: str.
+        :param feature_sets: The feature sets on which to model.
+        :type feature_sets: dict, where keys are str and values are lists of str.
+        :param targets: The targets sets on which to model.
+        :type targets: list of str.
+        :param classifiers: The classifiers to use for modeling.
+        :type classifiers: dict, where keys are str and values are str.
+        :param groups: The groups to model, and the directory to put each one's results in, (by default, every group,
+                       in a directory named after its value).
+        :type groups: dict, where keys are values of the group_by column and values are str.
+        :param backend: What to model with: 'weka' or 'sklearn'.
+        :type backend: str.
+
+        """
+        self.group_by = group_by
+        codes, values = pd.factorize(data[group_by], sort=True)
+        if groups is None:
+            # directory names are passed to `run_weka.sh` unquoted, so keep them to letters, digits, and .-_
+            groups = {value: re.sub(r'[^\w.-]+', '_', unicode(value)).strip('_') for value in values}
+        self.pipelines = {value: Pipeline(data, os.path.join(file_path, groups[value]), feature_sets, targets,
+                                          classifiers, backend, rows=codes == i)
+                          for i, value in enumerate(values) if value in groups}
+
+    def model(self, max_jobs=max_jobs, max_memory=max_memory, server=None, sparse=False, n_jobs=sklearn_jobs, folds=None):
+        """Run every group's models, (see :meth:`Pipeline.model`,) all in one pool, (see :func:`run_models`,) or, with
+        the sklearn backend, one after another.
+
+        :returns: The exit code of each model of each group.
+        :rtype: dict, where keys are groups and values are dicts, where keys are model names and values are int.
+
+        """
+        groups = sorted(self.pipelines)
+        pipelines = [self.pipelines[group] for group in groups]
+        if pipelines and pipelines[0].backend == 'sklearn':
+            return {group: self.pipelines[group].model_sklearn(n_jobs) for group in groups}
+        return dict(zip(groups, run_models(pipelines, max_jobs, max_memory, server, sparse, folds)))
+
+    def results(self, feature_sets=None, targets=None, classifiers=None):
+        """Summarize every group's models, (see :meth:`Pipeline.results`,) with a column for the group.
+
+        :rtype: pandas.DataFrame, indexed by group and model name.
+
+        """
+        return self.by_group(lambda p: p.results(feature_sets, targets, classifiers))
+
+    def summary(self, feature_sets=None, targets=None, classifiers=None):
+        """Tabulate the metrics of every group's models, (see :meth:`Pipeline.summary`,) with a column for the group.
+
+        :rtype: pandas.DataFrame, indexed by group and row.
+
+        """
+        return self.by_group(lambda p: p.summary(feature_sets, targets, classifiers))
+
+    def by_group(self, f):
+        """Given a function of a pipeline that returns a dataframe, return every group's, one after another, with a
+        column for the group.
+
+        """
+        groups = sorted(self.pipelines)
+        frames = [f(self.pipelines[group]) for group in groups]
+        for group, frame in zip(groups, frames):
+            frame.insert(0, self.group_by, group)
+        return pd.concat(frames, keys=groups) if frames else pd.DataFrame(columns=[self.group_by])
+
+class WekaServer:
+    def __init__(self, heap=max_memory, command=None):
+        """Start a Weka server, (see `weka_server.py`,) in a subprocess, which keeps datasets loaded and runs models on
+        them, for :meth:`Pipeline.model`.  Share one server among pipelines to run them all in the same JVM, and
+        :meth:`close` it when you're done.
+
+        :param heap: The most memory the server can use, in bytes.
+        :type heap: int.
+        :param command: The command to run the server with, (see `weka_server_command`).
+        :type command: list of str.
+
+        """
+        command = command or weka_server_command
+        self.proc = subprocess.Popen([c.format(heap / 2**20) for c in command], stdout=subprocess.PIPE)
+        # the server prints the port it's listening on once it's ready
+        self.port = int(self.proc.stdout.readline())
+
+    def request(self, **request):
+        """Send a request to the server, over its own connection, and return the response.
+
+        """
+        connection = socket.create_connection(('localhost', self.port))
+        try:
+            stream = connection.makefile()
+            stream.write(json.dumps(request) + '\n')
+            stream.flush()
+            return json.loads(stream.readline())
+        finally:
+            connection.close()
+
+    def load(self, dataset, path):
+        """Load an ARFF, as written by :meth:`Pipeline.load_server_dataset`, into the server as `dataset`.
+
+        :param dataset: The name to give the dataset.
+        :type dataset: str.
+        :param path: The path to the ARFF.
+        :type path: str.
+
+        """
+        response = self.request(command='load', dataset=dataset, path=path)
+        if response['status'] != 'ok':
+            raise RuntimeError("Couldn't load {} into the Weka server: {}".format(path, response['message']))
+
+    def run(self, dataset, features, target, classifier, label, results, thresholds, errors):
+        """Start running a model in the server, in a thread, and return the :class:`ServerJob` running it.
+
+        :param dataset: The dataset to model.
+        :type dataset: str.
+        :param features: The features to model on.
+        :type features: list of str.
+        :param target: The target to model.
+        :type target: str.
+        :param classifier: The classifier, as in :mod:`models`.
+        :type classifier: str.
+        :param label: The target's value to compute thresholds for.
+        :type label: str.
+        :param results: The path to write results to.
+        :type results: str.
+        :param thresholds: The path to write thresholds to.
+        :type thresholds: str.
+        :param errors: The path to write errors to.
+        :type errors: str.
+
+        """
+        return ServerJob(self, errors, command='run', dataset=dataset, features=features, target=target,
+                         classifier=classifier, label=str(label), results=results, thresholds=thresholds)
+
+    def close(self):
+        """Stop the server.
+
+        """
+        self.proc.terminate()
+        self.proc.wait()
+
+class ServerJob(threading.Thread):
+    def __init__(self, server, errors, **request):
+        """Run a request in the Weka server, in a thread, writing any error to `errors`.  Like subprocess.Popen, a job's
+        :meth:`poll` returns None while it's running, and then its exit code, (0 if it succeeded, 1 if not,) so
+        :meth:`Pipeline.model` can schedule jobs and subprocesses alike.
+
+        """
+        threading.Thread.__init__(self)
+        self.daemon = True
+        self.server, self.errors, self.request = server, errors, request
+        self.returncode = None
+        self.start()
+
+    def run(self):
+        try:
+            response = self.server.request(**self.request)
+        except Exception as e:
+            response = {'status': 'error', 'message': str(e)}
+        with open(self.errors, 'w') as errors:
+            errors.write(response.get('message', ''))
+        self.returncode = 0 if response['status'] == 'ok' else 1
+
+    def poll(self):
+        return self.returncode
+
+def column_hash(s):
+    """Given a series, return the SHA-1 of its type and values, for :meth:`Pipeline.model_hashes`.
+
+    :param s: The series.
+    :type s: pandas.Series.
+
+    """
+    sha1 = hashlib.sha1(str(s.dtype))
+    if str(s.dtype) == 'category':
+        sha1.update(json.dumps([unicode(c) for c in s.cat.categories]))
+        values = s.cat.codes.values
+    elif s.dtype == object:
+        # hash the text of each value, and which ones are missing, (so None and 'None' differ)
+        sha1.update(u'\x00'.join(unicode(v) for v in s.values.tolist()).encode('utf-8'))
+        values = s.isnull().values
+    else:
+        values = s.values
+    sha1.update(np.ascontiguousarray(values).tobytes())
+    return sha1.hexdigest()
+
+def load_thresholds(path):
+    """Given the path to a threshold curve CSV, (see :meth:`Pipeline.plot`,) return the curve.  The CSV is parsed once,
+    and stored in binary beside it, (as `_thresholds.npz`,) which is what's loaded from then on, until the CSV changes.
+    The most recently used `thresholds_cache_size` curves are also kept in memory, (see `thresholds_cache`).
+
+    The CSV has changed if its signature, (its modification time, size, and inode,) isn't the one the `.npz` was stored
+    with.  Its writers rename a new file over it, which changes its inode, so even a rewrite within the resolution of
+    its modification time is seen.
+
+    :param path: The path to the CSV.
+    :type path: str.
+    :rtype: pandas.DataFrame.
+
+    """
+    stat = os.stat(path)
+    signature = repr((stat.st_mtime, stat.st_size, stat.st_ino))
+    key = (path, signature)
+    if key in thresholds_cache:
+        # move it to the end, as the most recently used
+        thresholds_cache[key] = thresholds_cache.pop(key)
+        return thresholds_cache[key]
+
+    binary = os.path.splitext(path)[0] + '.npz'
+    thresholds = None
+    if os.path.exists(binary):
+        with np.load(binary) as stored:
+            if 'signature' in stored.files and str(stored['signature']) == signature:
+                thresholds = pd.DataFrame(stored['values'], columns=stored['columns'].tolist())
+    if thresholds is None:
+        thresholds = pd.read_csv(path)
+        # write to a temporary file and rename it, so a reader never sees half of it
+        np.savez(binary + '.tmp.npz', columns=np.array(thresholds.columns.tolist()), values=thresholds.values.astype(float),
+                 signature=np.array(signature))
+        os.rename(binary + '.tmp.npz', binary)
+
+    thresholds_cache[key] = thresholds
+    while len(thresholds_cache) > thresholds_cache_size:
+        thresholds_cache.popitem(last=False)
+    return thresholds
+
+def threshold_summary(thresholds):
+    """Given a threshold curve, return its summary metrics, for :meth:`Pipeline.results`.
+
+    :param thresholds: The threshold curve.
+    :type thresholds: pandas.DataFrame.
+    :rtype: dict.
+
+    """
+    fpr, tpr = thresholds["'False Positive Rate'"].values, thresholds["'True Positive Rate'"].values
+    recall, precision = thresholds['Recall'].values, thresholds['Precision'].values
+    # integrate along each curve in order of its x-axis; precision is undefined where nothing's predicted positive, so
+    # leave those points out, and start the precision-recall curve at 0 recall with the precision of its first point
+    predicted = (thresholds["'True Positives'"] + thresholds["'False Positives'"]).values > 0
+    recall, precision = recall[predicted], precision[predicted]
+    roc, pr = np.argsort(fpr, kind='mergesort'), np.argsort(recall, kind='mergesort')
+    recall, precision = np.append(0, recall[pr]), np.append(precision[pr][:1], precision[pr])
+    best = thresholds['FMeasure'].values.argmax() if len(thresholds) else None
+    counts = ["'True Positives'", "'False Negatives'", "'False Positives'", "'True Negatives'"]
+    return {'Instances': thresholds[counts].iloc[0].sum() if len(thresholds) else 0,
+            'ROC AUC': np.trapz(tpr[roc], fpr[roc]),
+            'PR AUC': np.trapz(precision, recall) if len(recall) > 1 else np.NaN,
+            'Best FMeasure': thresholds['FMeasure'].values[best] if best is not None else np.NaN,
+            'Best Threshold': thresholds['Threshold'].values[best] if best is not None else np.NaN}
+
+# The columns of the metrics :func:`parse_results` finds in Weka's results
+results_columns = ['Evaluation', 'Metric', 'Class', 'Value']
+
+def load_results(path):
+    """Given the path to a model's Weka results, return the metrics in them, (see :func:`parse_results`).  They're parsed
+    once, and stored beside the results, (as `_summary.csv`,) which is what's loaded from then on, until the results
+    change.
+
+    :param path: The path to the results.
+    :type path: str.
+    :rtype: pandas.DataFrame.
+
+    """
+    stored = path[:-len('_results.txt')] + '_summary.csv' if path.endswith('_results.txt') else path + '.summary.csv'
+    if os.path.exists(stored) and os.path.getmtime(stored) >= os.path.getmtime(path):
+        return pd.read_csv(stored)
+    with open(path) as f:
+        summary = pd.DataFrame(parse_results(f.read()), columns=results_columns)
+    summary.to_csv(stored + '.tmp', index=False)
+    os.rename(stored + '.tmp', stored)
+    # read it back, so the metrics are the same, (e.g. missing classes are NaN,) whether they were just parsed or not
+    return pd.read_csv(stored)
+
+def parse_results(text):
+    """Given Weka's results, (as written by `run_weka.sh`,) return the metrics in them:
+
+      - the times Weka took, (e.g. 'Time taken to build model,') in seconds, with no evaluation
+      - for each evaluation, (e.g. 'Error on training data' or 'Stratified cross-validation',) its summary statistics,
+        (e.g. 'Correctly Classified Instances', and, for those reported as a count and a percentage, 'Correctly Classified
+        Instances %',) its detailed accuracy by class, (e.g. 'ROC Area' for each class, and 'Weighted Avg.',) and its
+        confusion matrix, (as 'Classified as LABEL' for each actual class)
+
+    :param text: The results.
+    :type text: str.
+    :returns: The metrics.
+    :rtype: list of tuples of (evaluation, metric, class, value).
+
+    """
+    metrics = []
+    evaluation, section, header, matrix = None, None, None, []
+    for line in text.splitlines() + ['=== End ===']:
+        heading = re.match(r'^=== (.+) ===\s*$', line)
+        if heading:
+            metrics += confusion_metrics(evaluation, matrix)
+            section, header, matrix = heading.group(1), None, []
+            if section.startswith('Error on') or section.endswith('cross-validation'):
+                evaluation = section
+            continue
+        time_taken = re.match(r'^(Time taken to .+?):\s+(-?[\d.]+) seconds', line)
+        if time_taken:
+            metrics.append((None, time_taken.group(1), None, float(time_taken.group(2))))
+        elif not line.strip() or evaluation is None:
+            continue
+        elif section == 'Detailed Accuracy By Class':
+            if header is None:
+                header = re.split(r'\s{2,}', line.strip())[:-1]
+            else:
+                tokens = line.split()
+                if line.startswith('Weighted Avg.'):
+                    label, values = 'Weighted Avg.', tokens[2:2+len(header)]
+                else:
+                    label, values = ' '.join(tokens[len(header):]), tokens[:len(header)]
+                metrics += [(evaluation, h, label, number(v)) for h, v in zip(header, values)]
+        elif section == 'Confusion Matrix':
+            row = re.match(r'^\s*([-\d.\s]+)\|\s*(\S+) = (.+?)\s*$', line)
+            if row:
+                matrix.append((row.group(3), [number(v) for v in row.group(1).split()]))
+        else:
+            statistic = re.match(r'^(\S.*?)\s{2,}(-?[\d.]+)(?:\s+(-?[\d.]+))?\s*%?\s*$', line)
+            if statistic:
+                metrics.append((evaluation, statistic.group(1), None, number(statistic.group(2))))
+                if statistic.group(3) is not None:
+                    metrics.append((evaluation, statistic.group(1) + ' %', None, number(statistic.group(3))))
+    return metrics
+
+def confusion_metrics(evaluation, matrix):
+    """Given an evaluation and its confusion matrix, (as a list of each actual class and how many of it were classified
+    as each class, in order,) return its metrics for :func:`parse_results`.
+
+    """
+    labels = [label for label, counts in matrix]
+    return [(evaluation, 'Classified as ' + labels[j], label, count) for label, counts in matrix for j, count in enumerate(counts) if j < len(labels)]
+
+def number(value):
+    """Given a number from Weka's results, return it as a float, or NaN if Weka couldn't compute it, (`?`).
+
+    """
+    try:
+        return float(value)
+    except ValueError:
+        return np.NaN
+
+def write_arff(df, path, relation, columns, target=None, sparse=False, chunk_size=arff_chunk_size, rows=None):
+    """Write some columns of a dataframe, and a target, if any, (which goes last, and rows missing which are skipped,) to
+    an ARFF file for Weka, `chunk_size` rows at a time.  Categorical, bool, and text columns are declared nominal, (with
+    the target's values declared largest first, so every model classifies in the same direction, e.g. we don't want one
+    model to classify as True and another to classify as False,) dates are declared dates, and the rest numeric.
+
+    With `sparse`, rows are written in sparse ARFF, leaving out numeric values that are 0 and nominal values that are the
+    attribute's first value, (e.g. False,) which is much smaller for indicator features.
+
+    :param df: The dataframe.
+    :type df: pandas.Dataframe.
+    :param path: The path to write to.
+    :type path: str.
+    :param relation: The name of the relation.
+    :type relation: str.
+    :param columns: The columns to write, in order.
+    :type columns: list of str.
+    :param target: The target, if any.
+    :type target: str.
+    :param sparse: Whether to write sparse ARFF.
+    :type sparse: bool.
+    :param chunk_size: The number of rows to write at a time.
+    :type chunk_size: int.
+    :param rows: Which rows to write, if not all of them, (the nominal values are declared from all of them, so that
+                 subsets of the same dataframe, e.g. training and test sets, have the same header).
+    :type rows: numpy.ndarray of bool.
+
+    """
+    columns = columns + ([target] if target is not None else [])
+    values = {c: nominal_values(df[c]) for c in columns}
+    if target is not None and values[target] is not None:
+        values[target] = values[target][::-1]
+    with open(path, 'w') as f:
+        f.write('@relation {}\n\n'.format(arff_quote(relation)))
+        for c in columns:
+            f.write('@attribute {} {}\n'.format(arff_quote(c), arff_type(df[c], values[c])))
+        f.write('\n@data\n')
+        # the tokens that sparse rows leave out
+        zeros = [set(['0', '0.0', '-0.0']) if values[c] is None else set([arff_quote(values[c][0])]) if values[c] else set() for c in columns]
+        for start in xrange(0, len(df), chunk_size):
+            chunk = df.iloc[start:start+chunk_size][columns]
+            if rows is not None:
+                chunk = chunk[rows[start:start+chunk_size]]
+            if target is not None:
+                chunk = chunk[chunk[target].notnull()]
+            lines = zip(*[arff_tokens(chunk[c], values[c]) for c in columns])
+            if sparse:
+                f.writelines('{' + ','.join('{} {}'.format(i, t) for i, t in enumerate(line) if t not in zeros[i]) + '}\n' for line in lines)
+            else:
+                f.writelines(','.join(line) + '\n' for line in lines)
+
+def nominal_values(s):
+    """Given a series, return its nominal values, as str, if it's nominal, (categorical, bool, or text,) otherwise None.
+    An object series whose values are all numbers, (e.g. floats with `pd.NaT` for missing values,) is numeric, not
+    nominal.
+
+    :param s: The series.
+    :type s: pandas.Series.
+
+    """
+    if str(s.dtype) == 'category':
+        return [unicode(c) for c in s.cat.categories]
+    if s.dtype == bool:
+        return [u'False', u'True']
+    if s.dtype == object:
+        values = pd.unique(s.dropna().values)
+        if len(values) and all(isinstance(v, numbers.Number) and not isinstance(v, (bool, np.bool_)) for v in values):
+            return None
+        return sorted(set(unicode(v) for v in values))
+    return None
+
+def numeric_values(s):
+    """Given a numeric series, (see :func:`nominal_values`,) return its values as floats, with NaN for missing values.
+
+    :param s: The series.
+    :type s: pandas.Series.
+    :rtype: numpy.ndarray of float.
+
+    """
+    # an object series may hold `pd.NaT`s, so normalize the nulls before converting to floats
+    return np.asarray(s.where(s.notnull(), np.NaN) if s.dtype == object else s, dtype=float)
+
+def arff_type(s, values):
+    """Given a series and its nominal values, (see :func:`nominal_values`,) return its ARFF attribute type.
+
+    :param s: The series.
+    :type s: pandas.Series.
+    :param values: Its nominal values, or None if it isn't nominal.
+    :type values: list of str, or None.
+
+    """
+    if values is not None:
+        return '{' + ','.join(arff_quote(v) for v in values) + '}'
+    if s.dtype.kind == 'M':
+        return 'date "yyyy-MM-dd HH:mm:ss"'
+    return 'numeric'
+
+def arff_tokens(s, values):
+    """Given a series and its nominal values, (see :func:`nominal_values`,) return its values as ARFF tokens, with ?s for
+    missing values.
+
+    :param s: The series.
+    :type s: pandas.Series.
+    :param values: Its nominal values, or None if it isn't nominal.
+    :type values: list of str, or None.
+
+    """
+    if str(s.dtype) == 'category':
+        # quote each category once, and look them up by code, (where -1, i.e. missing, is the last one, ?)
+        quoted = np.array([arff_quote(c) for c in s.cat.categories] + ['?'], dtype=object)
+        return quoted[s.cat.codes.values].tolist()
+    if values is not None:
+        quoted = {v: arff_quote(v) for v in values}
+        return ['?' if v is None or v != v else quoted[unicode(v)] for v in s.values.tolist()]
+    if s.dtype.kind == 'M':
+        return ['?' if missing else "'{}'".format(v) for v, missing in zip(s.dt.strftime('%Y-%m-%d %H:%M:%S').values.tolist(), s.isnull().values.tolist())]
+    if s.dtype == object:
+        s = pd.Series(numeric_values(s))
+    number = repr if s.dtype.kind == 'f' else str
+    return ['?' if v != v else number(v) for v in s.values.tolist()]
+
+def arff_quote(value):
+    """Given a name or nominal value, return it quoted for ARFF, if it needs to be.
+
+    :param value: The name or value.
+    :type value: str.
+
+    """
+    value = unicode(value)
+    if value and not any(c in value for c in " \t\n\r,{}%'\"\\?"):
+        return value.encode('utf-8')
+    for c, escaped in (('\\', '\\\\'), ("'", "\\'"), ('\n', '\\n'), ('\r', '\\r'), ('\t', '\\t')):
+        value = value.replace(c, escaped)
+    return u"'{}'".format(value).encode('utf-8')
+
+def positive_value(s):
+    """Given a target, return its largest value, (its last category, if it's categorical,) which every model treats as
+    the positive class, and :func:`write_arff` declares first.
+
+    :param s: The target.
+    :type s: pandas.Series.
+
+    """
+    if str(s.dtype) == 'category':
+        return s.cat.categories[-1]
+    return s.dropna().max()
+
+def design_matrix(df):
+    """Given the features of a dataframe, return a design matrix for scikit-learn: numeric columns as they are, with
+    missing values replaced by the column's mean, (like Weka's ReplaceMissingValues,) and bool, categorical, and text
+    columns as one indicator column per value, (where a missing value has none set).  Which columns are numeric is up to
+    :func:`nominal_values`, like for Weka.
+
+    :param df: The features.
+    :type df: pandas.Dataframe.
+
+    """
+    columns = []
+    for c in df.columns:
+        s = df[c]
+        if nominal_values(s) is not None:
+            s = s.astype(object).where(s.notnull(), None) if s.dtype != object else s
+            columns.append(pd.get_dummies(s.map(lambda v: v if v is None else unicode(v)), prefix=c).values.astype(float))
+        else:
+            values = numeric_values(s)
+            mean = np.nanmean(values) if np.isfinite(values).any() else 0.0
+            columns.append(np.where(np.isnan(values), mean, values)[:, None])
+    return np.hstack(columns) if columns else np.empty((len(df), 0))
+
+# The columns of Weka's threshold curves, (quoted like Weka quotes the ones with spaces,) which :func:`threshold_curve`
+# writes for the scikit-learn backend
+threshold_columns = ["'True Positives'", "'False Negatives'", "'False Positives'", "'True Negatives'",
+                     "'False Positive Rate'", "'True Positive Rate'", 'Precision', 'Recall', 'Fallout', 'FMeasure',
+                     "'Sample Size'", 'Lift', 'Threshold']
+
+def threshold_curve(y, scores):
+    """Given whether each row is positive, and each row's score, return the threshold curve, in the same shape as Weka's
+    `-threshold-file`: one row per distinct score, predicting positive the rows whose score is at least it, from lowest
+    to highest, and then one predicting every row negative.
+
+    :param y: Whether each row is positive.
+    :type y: numpy.ndarray of bool.
+    :param scores: Each row's score, (the probability that it's positive).
+    :type scores: numpy.ndarray of float.
+
+    """
+    y = np.asarray(y, dtype=bool)
+    scores = np.asarray(scores, dtype=float)
+    order = np.argsort(scores, kind='mergesort')
+    scores, y = scores[order], y[order]
+    thresholds = np.unique(scores)
+    # the number of positives and negatives with scores below each threshold
+    below = np.searchsorted(scores, thresholds, side='left')
+    positives_below = np.concatenate([[0], np.cumsum(y)])[below]
+    n, n_positive = len(y), y.sum()
+    tp = np.append(n_positive - positives_below, 0).astype(float)
+    fp = np.append((n - below) - (n_positive - positives_below), 0).astype(float)
+    fn, tn = n_positive - tp, (n - n_positive) - fp
+    rate = lambda a, b: np.where(b > 0, a / np.where(b > 0, b, 1), 0.0)
+    precision, recall = rate(tp, tp + fp), rate(tp, tp + fn)
+    fpr = rate(fp, fp + tn)
+    fmeasure = rate(2 * precision * recall, precision + recall)
+    sample_size = (tp + fp) / n if n else tp
+    lift = rate(precision, np.repeat(float(n_positive) / n if n else 0, len(tp)))
+    return pd.DataFrame(np.column_stack([tp, fn, fp, tn, fpr, recall, precision, recall, fpr, fmeasure, sample_size,
+                                         lift, np.append(thresholds, 1.0)]), columns=threshold_columns)
+
+def stratified_folds(y, folds, seed=1):
+    """Given a target's values, assign each row to one of `folds` folds, at random, (but the same each time, for a given
+    seed,) so that each fold has about the same number of rows of each value.
+
+    :param y: The target's values.
+    :type y: numpy.ndarray.
+    :param folds: The number of folds.
+    :type folds: int.
+    :param seed: The random seed.
+    :type seed: int.
+    :returns: Each row's fold.
+    :rtype: numpy.ndarray of int.
+
+    """
+    values, codes = np.unique(y, return_inverse=True)
+    shuffled = np.random.RandomState(seed).permutation(len(y))
+    # deal the rows of each value out to the folds in turn, (sorting stably by value keeps them shuffled within it)
+    order = shuffled[np.argsort(codes[shuffled], kind='mergesort')]
+    assignments = np.empty(len(y), dtype=int)
+    assignments[order] = np.arange(len(y)) % folds
+    return assignments
+
+def parse_predictions(text):
+    """Given Weka's predictions for a test set, (from `-p 0 -distribution`, as written by `run_weka_fold.sh`,) return
+    whether each instance is positive, (the target's first declared value, see :func:`write_arff`,) the predicted
+    probability that it is, and whether it was predicted positive.
+
+    :param text: The predictions.
+    :type text: str.
+    :rtype: tuple of numpy.ndarray of bool, numpy.ndarray of float, numpy.ndarray of bool.
+
+    """
+    y, scores, predicted = [], [], []
+    for line in text.splitlines():
+        tokens = line.split()
+        # e.g. "1 1:True 2:False + *0.4,0.6"
+        if len(tokens) >= 4 and tokens[0].isdigit() and ':' in tokens[1]:
+            y.append(tokens[1].split(':')[0] == '1')
+            predicted.append(tokens[2].split(':')[0] == '1')
+            scores.append(float(tokens[-1].split(',')[0].lstrip('*')))
+    return np.array(y, dtype=bool), np.array(scores, dtype=float), np.array(predicted, dtype=bool)
+
+def cv_results(model, y, predicted, seconds):
+    """Given a description of a model, (e.g. a scikit-learn estimator's repr,) whether each row is positive, whether it
+    was predicted positive in cross-validation, and how long cross-validation took, return a summary of its results, in
+    the same shape as Weka's, (see :func:`parse_results`).
+
+    """
+    n = len(y)
+    correct = (y == predicted).sum()
+    tp, fn = (y & predicted).sum(), (y & ~predicted).sum()
+    fp, tn = (~y & predicted).sum(), (~y & ~predicted).sum()
+    return '\n'.join(['=== Classifier model ===', '', model, '',
+                      'Time taken to perform cross-validation: {:.2f} seconds'.format(seconds), '',
+                      '=== Stratified cross-validation ===', '',
+                      'Correctly Classified Instances     {:>10}    {:>10.4f} %'.format(correct, 100.0 * correct / n if n else 0),
+                      'Incorrectly Classified Instances   {:>10}    {:>10.4f} %'.format(n - correct, 100.0 * (n - correct) / n if n else 0),
+                      'Total Number of Instances          {:>10}'.format(n), '',
+                      '=== Confusion Matrix ===', '',
+                      '     a     b   <-- classified as',
+                      ' {:>5} {:>5} |     a = positive'.format(tp, fn),
+                      ' {:>5} {:>5} |     b = negative'.format(fp, tn), ''])
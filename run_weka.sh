@@ -1,28 +1,34 @@
 #!/bin/bash
 
-# This script is used by pipeline.py to run Weka in subprocesses.  It takes 3 arguments:
-#   - FPATH: the file_path in which to find ${MODELNAME}.csv to convert to ARFF, and in which to put all results
-#   - MODELNAME: the name of the CSV to find in FPATH
+# This script is used by pipeline.py to run Weka in subprocesses.  It takes 5 or more arguments:
+#   - FPATH: the file_path in which to find ${DATASET}.arff, (written by pipeline.py,) and in which to put all results
+#   - DATASET: the name of the ARFF to find in FPATH
+#   - MODELNAME: the name to give the results
+#   - HEAP: the most memory Weka can use, in Java's -Xmx format, (e.g. 4g)
 #   - ALGORITHM: the algorithm to use for Weka: weka.classifiers.${ALGORITHM}
+#   - the rest are the algorithm's options, one per argument
 
 FPATH=$1
-MODELNAME=$2
-ALGORITHM=$3
+DATASET=$2
+MODELNAME=$3
+HEAP=$4
+ALGORITHM=$5
+shift 5
 
 # Construct important variables.
-CSV=${FPATH%%/}/${MODELNAME}.csv
-PREPPEDCSV=${FPATH%%/}/${MODELNAME}_prepped.csv
-ARFF=${FPATH%%/}/${MODELNAME}.arff
+ARFF=${FPATH%%/}/${DATASET}.arff
 THRESHOLDS=${FPATH%%/}/${MODELNAME}_thresholds.csv
 RESULTS=${FPATH%%/}/${MODELNAME}_results.txt
+# (Weka picks the threshold-file's format by its extension, so keep .csv)
+THRESHOLDS_TMP=${FPATH%%/}/${MODELNAME}_thresholds.tmp.csv
+RESULTS_TMP=${RESULTS}.tmp
 
 # Change these if your install of Weka and/or Java is different.
 CP='/usr/share/java/weka.jar'
 JAVA='/usr/bin/java'
 
-# Replace quoted "?"s, (which Pandas produces,) into unquoted ?s, which Weka understands as missing values
-sed 's/"?"/?/g' ${CSV} > ${PREPPEDCSV}
-# Convert the CSV into ARFF
-${JAVA} -cp ${CP} weka.core.converters.CSVLoader ${PREPPEDCSV} > ${ARFF}
-# Run Weka, outputting a threshold-file and detailed results
-${JAVA} -cp ${CP} -Xmx4g weka.classifiers.${ALGORITHM} -t ${ARFF} -threshold-file ${THRESHOLDS} -i > ${RESULTS}
+# Run Weka, outputting a threshold-file and detailed results, (the general options go first, since a FilteredClassifier
+# passes everything after -- to the classifier it wraps,) to temporary files, which replace the old ones only once Weka
+# succeeds, so a killed run never leaves half of either
+${JAVA} -cp ${CP} -Xmx${HEAP} weka.classifiers.${ALGORITHM} -t ${ARFF} -threshold-file ${THRESHOLDS_TMP} -i "$@" > ${RESULTS_TMP} || exit $?
+mv ${THRESHOLDS_TMP} ${THRESHOLDS} && mv ${RESULTS_TMP} ${RESULTS}
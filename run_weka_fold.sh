@@ -0,0 +1,33 @@
+#!/bin/bash
+
+# This script is used by pipeline.py to run one fold of a model's cross-validation with Weka in a subprocess, (see
+# Pipeline.model's folds).  It takes 5 or more arguments:
+#   - FPATH: the file_path in which to find ${FOLD}_train.arff and ${FOLD}_test.arff, (written by pipeline.py,) and in
+#     which to put the predictions
+#   - FOLD: the name of the fold's ARFFs to find in FPATH
+#   - JOBNAME: the name to give the predictions
+#   - HEAP: the most memory Weka can use, in Java's -Xmx format, (e.g. 4g)
+#   - ALGORITHM: the algorithm to use for Weka: weka.classifiers.${ALGORITHM}
+#   - the rest are the algorithm's options, one per argument
+
+FPATH=$1
+FOLD=$2
+JOBNAME=$3
+HEAP=$4
+ALGORITHM=$5
+shift 5
+
+# Construct important variables.
+TRAIN=${FPATH%%/}/${FOLD}_train.arff
+TEST=${FPATH%%/}/${FOLD}_test.arff
+PREDICTIONS=${FPATH%%/}/${JOBNAME}_predictions.txt
+
+# Change these if your install of Weka and/or Java is different.
+CP='/usr/share/java/weka.jar'
+JAVA='/usr/bin/java'
+
+# Train on the fold's training set, and output the predicted distribution for each instance in its test set, (the
+# general options go first, since a FilteredClassifier passes everything after -- to the classifier it wraps,) to a
+# temporary file, which replaces the old predictions only once Weka succeeds
+${JAVA} -cp ${CP} -Xmx${HEAP} weka.classifiers.${ALGORITHM} -t ${TRAIN} -T ${TEST} -p 0 -distribution "$@" > ${PREDICTIONS}.tmp || exit $?
+mv ${PREDICTIONS}.tmp ${PREDICTIONS}
@@ -0,0 +1,626 @@
+"""The synthetic data module.
+
+Generate fake versions of the raw HMIS tables, (see `data_dictionary.md`,) at any scale, so that :mod:`clean` can be
+run, and benchmarked, (see :mod:`benchmark`,) without the real export.  Every table has the columns, formats, and quirks
+:func:`clean.load_raw` and :func:`clean.clean` expect, (e.g. the blank rows at the end of `Providers`, `EntryDetails`,
+and `ReviewDetail`,) and the skew of the real data: most clients enter once or twice, but some, (often anonymous ones,)
+enter dozens of times; about a third of entries are of families; a few big programs get most of the entries; and most
+stays get a few services, but some get many.
+
+    $ python synthetic.py ROWS RAW_PATH AUXILIARY_PATH
+
+writes a `Master` of ROWS rows, and the other tables in proportion, (see `table_ratios`,) to RAW_PATH, and the zip codes
+to AUXILIARY_PATH.
+
+The values are drawn from the raw values :mod:`clean` knows about, (the keys and values of its replacement maps,) so
+cleaning makes the same replacements it does on the real data, but they're drawn independently, so no statistics of the
+real data should be read into them.
+
+"""
+import os, sys, datetime
+import numpy as np
+import pandas as pd
+import clean
+
+# the number of rows of each table per row of `Master`, (from the row counts in `data_dictionary.md`)
+table_ratios = {'EntryIncome':       82214. / 262806,
+                'ExitIncome':        136038. / 262806,
+                'EntryNCB':          100378. / 262806,
+                'ExitNCB':           145720. / 262806,
+                'EntryDisabilities': 72181. / 262806,
+                'ReviewDetail':      7378. / 262806,
+                'Services':          1150529. / 262806,
+                'Providers':         1280. / 262806}
+# the number of rows of each review table per review
+review_ratio = 1.
+# the number of blank rows at the end of `EntryDetails`, which :func:`clean.clean` drops
+entry_details_blank_rows = 45292
+
+# the fraction of each column that's missing, (from `data_dictionary.md`)
+missing_fractions = {'Master':       {'Ethnicity':                     .13,
+                                      'PrimaryRace':                   .13,
+                                      'SecondaryRace':                 .81,
+                                      'PrimaryLanguageSpoken':         .92,
+                                      'ZipCodeOfLastPermanentAddress': .32,
+                                      'ZipDataQuality':                .24,
+                                      'YearOfBirth':                   .01,
+                                      'ProgramExitDate':               .1},
+                     'Income':       {'SourceOfIncome':  .05,
+                                      'Last30DayIncome': .05,
+                                      'EndDate':         .85},
+                     'NCB':          {'SourceOfNonCashBenefit': .01,
+                                      'EndDate':                .88},
+                     'Disabilities': {'DisabilityType':          .02,
+                                      'DisabilityDetermination': .25,
+                                      'EndDate':                 .85},
+                     'Services':     {'ServiceStartDate':        .00005,
+                                      'ServiceEndDate':          .33,
+                                      'ProviderSpecificCode':    .98,
+                                      'FinancialAssistanceType': .94,
+                                      'TotalCost':               .98}}
+
+# the fraction of entries with no entry date, (legacy entries,) and the fraction with the old system's default entry
+# date, 1980-01-01
+legacy_fraction = .22
+default_date_fraction = .01
+# the fraction of entries that are exited before they're entered, and the fraction whose `EntryID` is duplicated
+swapped_fraction = 1137. / 262806
+duplicated_fraction = 23. / 262806
+# the fraction of heads of household who come with a family, and the chance that each family member after the first
+# brings another
+family_fraction = .2
+family_continue = .45
+# the chance that a client enters again after each entry, and the fraction of clients who are anonymous, and so share a
+# `ClientUniqueID` over dozens of entries
+reentry_chance = .45
+anonymous_fraction = .002
+# how skewed entries are towards the biggest programs: a program's share of entries goes as 1 / rank**provider_skew
+provider_skew = 1.
+# the dispersion of the number of services per entry, (the smaller, the more stays with many,) and the fraction of
+# services that were entered twice
+services_dispersion = .5
+duplicated_services_fraction = 120790. / 1150529
+
+# the first and last dates in the data, (ServicePoint was adopted in 2007)
+first_date = datetime.datetime(2007, 1, 1)
+last_date = clean.dump_date
+
+# each program type, the fraction of programs of that type, and the mean length of their stays, in days
+program_types = {'Emergency Shelter (HUD)':                            (.3, 30),
+                 'Transitional housing (HUD)':                         (.2, 180),
+                 'Permanent supportive housing (HUD)':                 (.2, 700),
+                 'Services Only program (HUD)':                        (.15, 60),
+                 'Homelessness Prevention and Rapid Re-Housing (HUD)': (.1, 120),
+                 'Safe Haven (HUD)':                                   (.05, 365)}
+alt_program_types = ['Interim', 'PHwSS', 'Supportive Services for Veteran Families']
+# the names of the providers at each level, which are suffixed with each provider's ID, (e.g. the agency 'Heartland
+# Human Care Services(35)' and its program 'Heartland Human Care Services Families Building Community(266)'); programs
+# are named after their agency, and sub-programs after their program
+alliance_name = 'Chicago Alliance to End Homelessness'
+agency_names = ['Heartland Human Care Services', 'Catholic Charities', 'The Salvation Army', 'Thresholds, Inc.',
+                'Matthew House, Inc.', 'Inspiration Corporation', "Deborah's Place", 'Breakthrough Urban Ministries',
+                'A Safe Haven', 'Featherfist']
+program_names = ['Families Building Community', 'Emergency Shelter', 'Transitional Housing', 'Permanent Housing',
+                 'Supportive Services', 'Rapid Re-Housing', 'Youth Program', 'Veterans Program']
+sub_program_names = ['North', 'South', 'West', 'Families', 'Singles']
+
+# the raw values of columns that :mod:`clean` doesn't replace
+yes_no = ['Yes (HUD)', 'No (HUD)', "Don't Know (HUD)", 'Refused (HUD)']
+ethnicities = ['Non-Hispanic/Non-Latino (HUD)', 'Hispanic/Latino (HUD)'] + clean.master_ethnicity_nans
+secondary_races = ['White (HUD)', 'Black or African American (HUD)', 'American Indian or Alaska Native (HUD)']
+languages = ['English', 'Spanish', 'Polish', 'Arabic']
+zip_codes = ['606{:02d}'.format(z) for z in range(1, 62)] + ['60827']
+invalid_zip_codes = ['99999', '0000', '606', '46312']
+zip_data_qualities = ['Full or partial zip code reported (HUD)', "Client doesn't know (HUD)", 'Client refused (HUD)']
+exit_reasons = ['Completed program', 'Left for a housing opportunity before completing program',
+                'Non-compliance with program', 'Unknown/Disappeared', 'Reached maximum time allowed',
+                'Needs could not be met', 'Disagreement with rules/persons', 'Criminal activity / violence', 'Death',
+                'Other']
+housing_statuses = ['Literally Homeless (HUD)', 'Imminently losing their housing (HUD)',
+                    'Unstably housed and at-risk of losing their housing (HUD)', 'Stably housed (HUD)'] + clean.review_details_housing_status_nans
+review_types = ['Annual Assessment', '6 month Follow Up', '2 month Follow Up', 'Quarterly Review']
+need_statuses = ['Closed', 'Met', 'Completed', 'Partially Met', 'Not Met', 'Identified', 'In Progress']
+financial_assistance_types = ['Rental Assistance', 'Security Deposit', 'Utility Assistance', 'Moving cost assistance']
+# the first letters of AIRS service codes, (see `ServiceCode` in `data_dictionary.md`,) and the number of codes under each
+service_categories = ['B', 'D', 'F', 'H', 'J', 'L', 'N', 'P', 'R', 'T', 'Y']
+services_per_category = 8
+
+master_columns = ['ClientUniqueID', 'ClientID', 'HouseholdID', 'Head Of Household?', 'Relationship to HoH',
+                  'Entry Exit GroupID', 'EntryID', 'ProviderID', 'ProgramEntryDate', 'ProgramExitDate', 'YearOfBirth',
+                  'Ethnicity', 'PrimaryRace', 'SecondaryRace', 'PrimaryLanguageSpoken', 'Veteran?',
+                  'PreviousLivingSituation', 'LengthOfStayInPreviousLivingSituation', 'ZipCodeOfLastPermanentAddress',
+                  'ZipDataQuality', 'DestinationAtExit', 'ExitReason', 'Anonymous', 'DateCreated', 'DateUpdated']
+providers_columns = ['Provider', 'ProviderLevel', 'ParentProvider', 'CurrentlyOperational', 'AddressLine1',
+                     'AddressLine2', 'City', 'State', 'Zip', 'NumActiveUsers', 'ProgramTypeCode', 'AltProgramType']
+entry_details_columns = ['ClientID', 'EntryID', 'HousingStatusAtEntry', 'Do you have a disability of long duration?',
+                         'Income received from any source in past 30 days?', 'No cash benefit received in past 30 days?']
+exit_stuff_columns = ['ClientID', 'EntryID', 'HousingStatusAtExit', 'Income received from any source in past 30 days?',
+                      'No cash benefit received in past 30 days?']
+review_columns = ['ReviewID', 'EntryID', 'ReviewType', 'ReviewDate', 'HousingStatus',
+                  'Do you have a disability of long duration?', 'Income received from any source in past 30 days?',
+                  'Non-cash benefit received in past 30 days?', 'Are you receiving Medicaid?']
+services_columns = ['ServiceID', 'ClientID', 'ServiceDescription])', 'ServiceCode', 'ProviderSpecificCode',
+                    'ServiceProvider', 'ServiceStartDate', 'ServiceEndDate', 'FinancialAssistanceType', 'NeedStatus',
+                    'TotalCost', 'DateCreated', 'DateUpdated']
+
+def generate(n, path, auxiliary_path=None, seed=0):
+    """Given a number of rows, generate a `Master` of that many rows, and every other raw table in proportion, and write
+    them to `path`, named as in `clean.raw_names`, (e.g. `path/Master.csv`,) and the auxiliary zip codes to
+    `auxiliary_path`.
+
+    :param n: The number of rows of `Master`.
+    :type n: int.
+    :param path: The directory to write the raw tables to; point `clean.raw_path` here.
+    :type path: str.
+    :param auxiliary_path: The directory to write the auxiliary data to; point `clean.auxiliary_path` here.  Defaults
+                           to `path`.
+    :type auxiliary_path: str.
+    :param seed: The random seed; the same seed and `n` always generate the same tables.
+    :type seed: int.
+
+    """
+    rng = np.random.RandomState(seed)
+    providers = generate_providers(rng, int(round(n * table_ratios['Providers'])))
+    master = generate_master(rng, n, providers)
+    entries = entry_keys(master)
+    exits = entry_keys(master, exited=True)
+    reviews = generate_reviews(rng, entries, table_ratios['ReviewDetail'])
+    review_keys = pd.DataFrame({'EntryID': reviews['EntryID'], 'ReviewID': reviews['ReviewID'], 'Date': reviews['ReviewDate']},
+                               columns=['EntryID', 'ReviewID', 'Date'])
+    # exit tables are only about exited entries, so there are more of their rows per exit
+    exit_ratio = float(len(entries)) / max(len(exits), 1)
+    tables = {'Master':             master,
+              'Providers':          providers,
+              'EntryDetails':       generate_details(rng, master, entry_details_columns),
+              'ExitStuff':          generate_details(rng, master, exit_stuff_columns, exited=True),
+              'EntryIncome':        generate_income(rng, entries, table_ratios['EntryIncome']),
+              'ExitIncome':         generate_income(rng, exits, table_ratios['ExitIncome'] * exit_ratio),
+              'EntryNCB':           generate_ncb(rng, entries, table_ratios['EntryNCB']),
+              'ExitNCB':            generate_ncb(rng, exits, table_ratios['ExitNCB'] * exit_ratio),
+              'EntryDisabilities':  generate_disabilities(rng, entries, table_ratios['EntryDisabilities']),
+              'ReviewDetail':       reviews,
+              'ReviewIncome':       generate_income(rng, review_keys, review_ratio),
+              'ReviewNCB':          generate_ncb(rng, review_keys, review_ratio),
+              'ReviewDisabilities': generate_disabilities(rng, review_keys, review_ratio),
+              'Services':           generate_services(rng, master, providers, table_ratios['Services'])}
+    # the raw export ends `Providers`, `EntryDetails`, and `ReviewDetail` with blank rows
+    blank_rows = {'Providers': 1, 'EntryDetails': entry_details_blank_rows, 'ReviewDetail': 1}
+    for name, df in tables.iteritems():
+        write_raw(df, os.path.join(path, name + '.csv'), blank_rows.get(name, 0))
+    write_raw(pd.DataFrame({'zip': zip_codes}), os.path.join(auxiliary_path or path, 'zips.csv'))
+
+def write_raw(df, path, blank_rows=0):
+    """Given a table, write it as a raw CSV, (with the raw date format, and without an index,) followed by `blank_rows`
+    blank rows.
+
+    :param df: The table.
+    :type df: pandas.Dataframe.
+    :param path: The path to write to.
+    :type path: str.
+    :param blank_rows: The number of blank rows to end with.
+    :type blank_rows: int.
+
+    """
+    df.to_csv(path, index=False, date_format=clean.raw_date_format)
+    with open(path, 'a') as f:
+        f.write((',' * (len(df.columns) - 1) + '\n') * blank_rows)
+
+def raw_values(replacements, values=()):
+    """Given a replacement map, return the raw values of a column it's applied to: the values it replaces, and the
+    values it replaces them with, (and any other `values`).
+
+    :param replacements: The replacement map.
+    :type replacements: dict.
+    :param values: Other values the column holds.
+    :type values: list.
+
+    """
+    return sorted({k for k in replacements if pd.notnull(k)} | set(clean.replacement_targets(replacements)) |
+                  {v for v in values if pd.notnull(v)})
+
+def choose(rng, values, size, missing=0., p=None):
+    """Given some values, return `size` of them chosen at random, with a `missing` fraction of them NaN.
+
+    :param rng: The random number generator.
+    :type rng: numpy.random.RandomState.
+    :param values: The values to choose from.
+    :type values: list.
+    :param size: The number of values to choose.
+    :type size: int.
+    :param missing: The fraction of them to leave missing.
+    :type missing: float.
+    :param p: The probability of each value, if they aren't equally likely.
+    :type p: list of float.
+    :rtype: numpy.ndarray of object.
+
+    """
+    chosen = np.asarray(values, dtype=object)[rng.choice(len(values), size, p=p)]
+    return masked(chosen, rng.rand(size) >= missing)
+
+def masked(values, mask):
+    """Given values and a mask, return the values as objects, with NaN wherever the mask is `False`.
+
+    :param values: The values.
+    :type values: numpy.ndarray.
+    :param mask: Where to keep them.
+    :type mask: numpy.ndarray of bool.
+    :rtype: numpy.ndarray of object.
+
+    """
+    values = np.array(values, dtype=object)
+    values[~np.asarray(mask)] = np.NaN
+    return values
+
+def days_after(rng, dates, mean, missing=0.):
+    """Given dates, return dates an exponentially distributed number of days after them, with a `missing` fraction of
+    them, (and any after `last_date`,) NaT.
+
+    :param rng: The random number generator.
+    :type rng: numpy.random.RandomState.
+    :param dates: The dates to start from.
+    :type dates: pandas.DatetimeIndex.
+    :param mean: The mean number of days after.
+    :type mean: float.
+    :param missing: The fraction of them to leave missing.
+    :type missing: float.
+    :rtype: pandas.DatetimeIndex.
+
+    """
+    later = dates + pd.to_timedelta(np.floor(rng.exponential(mean, len(dates))), unit='D')
+    return dates_where(later, (rng.rand(len(dates)) >= missing) & (later <= last_date))
+
+def dates_where(dates, mask, other=pd.NaT):
+    """Given dates, return them where `mask` is `True`, and `other` elsewhere.
+
+    :param dates: The dates.
+    :type dates: pandas.DatetimeIndex.
+    :param mask: Where to keep them.
+    :type mask: numpy.ndarray of bool.
+    :param other: What to replace them with: a date, or dates.
+    :type other: datetime.datetime or pandas.DatetimeIndex.
+    :rtype: pandas.DatetimeIndex.
+
+    """
+    other = other if np.isscalar(other) or other is pd.NaT else pd.Series(other)
+    return pd.DatetimeIndex(pd.Series(dates).where(np.asarray(mask), other))
+
+def group_index(sizes):
+    """Given the sizes of consecutive groups, return each row's index within its group.
+
+    :param sizes: The size of each group.
+    :type sizes: numpy.ndarray of int.
+
+    """
+    return np.arange(sizes.sum()) - np.repeat(np.cumsum(sizes) - sizes, sizes)
+
+def generate_providers(rng, n):
+    """Generate `Providers`: the Chicago Alliance at level 1, an agency at level 2 for every ten programs, and the
+    programs at level 3, (a few split into level 4 sub-programs).  Agencies have no program type, and a few programs have
+    an alternative program type.  Each `Provider`, (and `ParentProvider`,) is a name, like in the real data, (see
+    `agency_names`,) and three programs are the ones :mod:`clean` makes street outreach, (see
+    `clean.providers_street_outreach`).
+
+    :param rng: The random number generator.
+    :type rng: numpy.random.RandomState.
+    :param n: The number of providers, (at least 12).
+    :type n: int.
+    :rtype: pandas.DataFrame.
+
+    """
+    n = max(n, 12)
+    index = np.arange(n)
+    levels = np.where(index == 0, 1, np.where(index % 10 == 1, 2, np.where(rng.rand(n) < .05, 4, 3)))
+    # each provider's parent is the last provider before it at a higher level, and is named after it
+    parents = np.repeat(-1, n)
+    bases = np.empty(n, dtype=object)
+    bases[0] = alliance_name
+    agencies = np.flatnonzero(levels == 2)
+    bases[agencies] = [agency_names[i % len(agency_names)] + ('' if i < len(agency_names) else ' {}'.format(i // len(agency_names) + 1))
+                       for i in range(len(agencies))]
+    for level in (2, 3, 4):
+        above = np.flatnonzero(levels < level)
+        at = levels == level
+        parents[at] = above[np.searchsorted(above, index[at]) - 1]
+    for level, separator, names in ((3, ' ', program_names), (4, ' - ', sub_program_names)):
+        at = levels == level
+        bases[at] = bases[parents[at]] + separator + choose(rng, names, at.sum())
+    providers = np.array(['{}({})'.format(base, i + 1) for i, base in enumerate(bases)], dtype=object)
+    # make a few programs without sub-programs the street outreach programs :mod:`clean` knows about
+    programs = levels >= 3
+    outreach = rng.permutation(np.flatnonzero((levels == 3) & (np.append(levels[1:], 0) != 4)))[:len(clean.providers_street_outreach)]
+    providers[outreach] = clean.providers_street_outreach[:len(outreach)]
+    types = sorted(program_types)
+    return pd.DataFrame({'Provider':             providers,
+                         'ProviderLevel':        ['Level {}'.format(l) for l in levels],
+                         'ParentProvider':       masked(providers[np.maximum(parents, 0)], parents >= 0),
+                         'CurrentlyOperational': choose(rng, ['Yes', 'No'], n, p=[.7, .3]),
+                         'AddressLine1':         choose(rng, ['1 W Madison St', '200 S State St', '4300 N Broadway'], n, .62),
+                         'AddressLine2':         choose(rng, ['Suite 100', '2nd Floor'], n, .92),
+                         'City':                 choose(rng, ['Chicago'], n, .62),
+                         'State':                choose(rng, ['IL '], n, .62),
+                         'Zip':                  choose(rng, zip_codes, n, .63),
+                         'NumActiveUsers':       rng.poisson(3, n) * (levels <= 2),
+                         'ProgramTypeCode':      masked(choose(rng, types, n, p=[program_types[t][0] for t in types]), programs),
+                         'AltProgramType':       masked(choose(rng, alt_program_types, n, .9), programs)},
+                        columns=providers_columns)
+
+def generate_master(rng, n, providers):
+    """Generate `Master`: `n` entries into providers' programs, of heads of household who enter again and again, (see
+    `reentry_chance`,) some with the same family each time, (see `family_fraction`).  Each head's entries are on random
+    days, each lasting about as long as its program's stays, (see `program_types`).
+
+    :param rng: The random number generator.
+    :type rng: numpy.random.RandomState.
+    :param n: The number of entries.
+    :type n: int.
+    :param providers: `Providers`.
+    :type providers: pandas.DataFrame.
+    :rtype: pandas.DataFrame.
+
+    """
+    # each head of household enters a geometric number of times, (or, if they're anonymous, dozens of times,) bringing
+    # the same family each time; take only as many heads as it takes to make `n` entries
+    entries_per_head = rng.geometric(1 - reentry_chance, n)
+    anonymous = rng.rand(n) < anonymous_fraction
+    entries_per_head[anonymous] = rng.randint(20, 200, anonymous.sum())
+    family_size = np.where(rng.rand(n) < family_fraction, 1 + rng.geometric(1 - family_continue, n), 1)
+    heads = np.searchsorted(np.cumsum(entries_per_head * family_size), n) + 1
+    entries_per_head, anonymous, family_size = entries_per_head[:heads], anonymous[:heads], family_size[:heads]
+
+    # each of a head's entries, (an event,) is into a program, mostly the big ones
+    event_head = np.repeat(np.arange(heads), entries_per_head)
+    events = len(event_head)
+    programs = providers[providers['ProgramTypeCode'].notnull()]
+    weights = 1. / np.arange(1, len(programs) + 1) ** provider_skew
+    event_program = rng.choice(len(programs), events, p=weights / weights.sum())
+    stays = np.floor(rng.exponential([program_types[t][1] for t in programs['ProgramTypeCode'].values[event_program]]))
+    # each head's entries are on random days, in order
+    days = np.sort(rng.randint(0, (last_date - first_date).days, events) + event_head * 2**16)
+    event_entry = pd.DatetimeIndex(first_date + pd.to_timedelta(days - event_head * 2**16, unit='D'))
+    event_exit = event_entry + pd.to_timedelta(stays, unit='D')
+
+    # each of an event's family members gets an entry
+    entry_event = np.repeat(np.arange(events), family_size[event_head])[:n]
+    member = group_index(family_size[event_head])[:n]
+    head = event_head[entry_event]
+    family = family_size[head] > 1
+    # a client is a head of household or one of their family members; some clients have two `ClientID`s
+    client = np.unique(head * 64 + np.minimum(member, 63), return_inverse=True)[1]
+    client_id = 100000 + client * 2 + (rng.rand(n) < .1)
+    client_unique_id = np.array(['{:032x}'.format((c + 1) * 0x9e3779b97f4a7c15f39cc0605cedc835 % 16**32) for c in client], dtype=object)
+
+    # legacy entries have no entry date, (or the default entry date,) and none of the entry questions answered
+    entry_date = event_entry[entry_event]
+    exit_date = event_exit[entry_event]
+    created = entry_date + pd.to_timedelta(rng.randint(0, 30, n), unit='D')
+    created = dates_where(created, created <= last_date, last_date)
+    legacy = rng.rand(n) < legacy_fraction
+    entry_date = dates_where(dates_where(entry_date, ~legacy), rng.rand(n) >= default_date_fraction, datetime.datetime(1980, 1, 1))
+    exit_date = dates_where(exit_date, (exit_date <= last_date) & (rng.rand(n) >= missing_fractions['Master']['ProgramExitDate']))
+    swapped = rng.rand(n) < swapped_fraction
+    entry_date, exit_date = dates_where(entry_date, ~swapped, exit_date), dates_where(exit_date, ~swapped, entry_date)
+    exited = np.asarray(pd.notnull(exit_date))
+
+    # family members are about the head's age, or children
+    head_birth = rng.randint(1940, 1996, heads)[head]
+    birth = np.where(member == 0, head_birth, np.where(member == 1, head_birth + rng.randint(-5, 6, n), rng.randint(1995, 2014, n)))
+    year_of_birth = masked(birth.astype(str), rng.rand(n) >= missing_fractions['Master']['YearOfBirth'])
+    year_of_birth[rng.rand(n) < .001] = '#NUM!'
+
+    missing = missing_fractions['Master']
+    relationships = raw_values(clean.master_relationship_to_hoh_replacements)
+    races = raw_values(clean.master_primary_race_replacements, clean.race_replacements_4_way)
+    destinations = raw_values(clean.master_destination_at_exit_replacements, clean.master_case_outcomes)
+    df = pd.DataFrame({'ClientUniqueID':                        client_unique_id,
+                       'ClientID':                              client_id,
+                       'HouseholdID':                           np.where(family, head + 1, np.NaN),
+                       'Head Of Household?':                    masked(np.where(member == 0, 'Yes', 'No'), family),
+                       'Relationship to HoH':                   masked(np.where(member == 0, 'Self', choose(rng, relationships, n)), family),
+                       'Entry Exit GroupID':                    np.where(family, entry_event + 1, np.NaN),
+                       'EntryID':                               np.arange(1, n + 1),
+                       'ProviderID':                            programs['Provider'].values[event_program][entry_event],
+                       'ProgramEntryDate':                      entry_date,
+                       'ProgramExitDate':                       exit_date,
+                       'YearOfBirth':                           year_of_birth,
+                       'Ethnicity':                             choose(rng, ethnicities, n, missing['Ethnicity']),
+                       'PrimaryRace':                           choose(rng, races, n, missing['PrimaryRace']),
+                       'SecondaryRace':                         choose(rng, secondary_races, n, missing['SecondaryRace']),
+                       'PrimaryLanguageSpoken':                 choose(rng, languages, n, missing['PrimaryLanguageSpoken']),
+                       'Veteran?':                              masked(choose(rng, yes_no, n, .05), ~legacy),
+                       'PreviousLivingSituation':               masked(choose(rng, raw_values(clean.master_previous_living_situation_replacements), n, .05), ~legacy),
+                       'LengthOfStayInPreviousLivingSituation': masked(choose(rng, raw_values(clean.master_length_of_stay_in_previous_living_situation_replacements), n, .05), ~legacy),
+                       'ZipCodeOfLastPermanentAddress':         choose(rng, zip_codes + invalid_zip_codes, n, missing['ZipCodeOfLastPermanentAddress']),
+                       'ZipDataQuality':                        choose(rng, zip_data_qualities, n, missing['ZipDataQuality']),
+                       'DestinationAtExit':                     masked(choose(rng, destinations, n, .15), exited),
+                       'ExitReason':                            masked(choose(rng, exit_reasons, n, .05), exited),
+                       'Anonymous':                             masked(np.repeat('Anonymous', n), anonymous[head] | (rng.rand(n) < .1)),
+                       'DateCreated':                           created,
+                       'DateUpdated':                           created + pd.to_timedelta(rng.randint(0, 60, n), unit='D')},
+                      columns=master_columns)
+    # a few `EntryID`s are duplicated, without a `Relationship to HoH`
+    duplicates = df[rng.rand(n) < duplicated_fraction].copy()
+    duplicates['Relationship to HoH'] = np.NaN
+    return pd.concat([df, duplicates]).sort_values('EntryID', kind='mergesort').reset_index(drop=True)
+
+def entry_keys(master, exited=False):
+    """Given `Master`, return the keys of its entries, (or only its exited entries,) and the date each is dated from:
+    its entry date, (or, for legacy entries, the date it was created,) or its exit date.
+
+    :param master: `Master`.
+    :type master: pandas.Dataframe.
+    :param exited: Whether to return only exited entries, dated from their exit dates.
+    :type exited: bool.
+
+    """
+    master = master.drop_duplicates('EntryID')
+    if exited:
+        master = master[master['ProgramExitDate'].notnull()]
+        date = master['ProgramExitDate']
+    else:
+        date = master['ProgramEntryDate'].where(master['ProgramEntryDate'] > first_date, master['DateCreated'])
+    return pd.DataFrame({'ClientID': master['ClientID'], 'EntryID': master['EntryID'], 'Date': date},
+                        columns=['ClientID', 'EntryID', 'Date']).reset_index(drop=True)
+
+def attach(rng, keys, ratio):
+    """Given keys, (see :func:`entry_keys`,) return the keys of a table with a Poisson number of rows per key, `ratio` on
+    average, and the date each row is dated from.
+
+    :param rng: The random number generator.
+    :type rng: numpy.random.RandomState.
+    :param keys: The keys, with their dates in `Date`.
+    :type keys: pandas.Dataframe.
+    :param ratio: The mean number of rows per key.
+    :type ratio: float.
+    :rtype: tuple of pandas.Dataframe and pandas.DatetimeIndex.
+
+    """
+    rows = keys.iloc[np.repeat(np.arange(len(keys)), rng.poisson(ratio, len(keys)))].reset_index(drop=True)
+    return rows.drop('Date', axis=1), pd.DatetimeIndex(rows['Date'])
+
+def started_before(rng, dates, mean):
+    """Given the dates rows are dated from, return their start dates: mostly the day before, (what case managers enter
+    when they don't know,) and otherwise an exponentially distributed number of days before, with a mean of `mean`.
+
+    """
+    before = np.where(rng.rand(len(dates)) < .6, 1, np.floor(rng.exponential(mean, len(dates))))
+    return dates - pd.to_timedelta(before, unit='D')
+
+def generate_details(rng, master, columns, exited=False):
+    """Generate `EntryDetails`, or, if `exited`, `ExitStuff`: a housing status and yes/no questions for each entry,
+    answered for about a third of exits.
+
+    """
+    n = len(master)
+    answered = ~exited | (rng.rand(n) < .38)
+    values = {'ClientID': master['ClientID'].values, 'EntryID': master['EntryID'].values}
+    values.update({c: masked(choose(rng, yes_no if c.endswith('?') else housing_statuses, n, .05), answered) for c in columns[2:]})
+    return pd.DataFrame(values, columns=columns)
+
+def generate_income(rng, keys, ratio):
+    """Generate `EntryIncome`, `ExitIncome`, or `ReviewIncome`: sources of income for some of the `keys`, some of which
+    have several, about one in eight of them zero.
+
+    """
+    df, dates = attach(rng, keys, ratio)
+    n = len(df)
+    missing = missing_fractions['Income']
+    income = np.round(rng.lognormal(6.3, 1, n), 2)
+    income[rng.rand(n) < .12] = 0
+    income[rng.rand(n) < missing['Last30DayIncome']] = np.NaN
+    df['SourceOfIncome'] = choose(rng, raw_values(clean.income_replacements, clean.income_types), n, missing['SourceOfIncome'])
+    df['Last30DayIncome'] = income
+    df['StartDate'] = started_before(rng, dates, 1000)
+    df['EndDate'] = days_after(rng, pd.DatetimeIndex(df['StartDate']), 200, missing['EndDate'])
+    return df
+
+def generate_ncb(rng, keys, ratio):
+    """Generate `EntryNCB`, `ExitNCB`, or `ReviewNCB`: non-cash benefits for some of the `keys`, some of which have
+    several.
+
+    """
+    df, dates = attach(rng, keys, ratio)
+    n = len(df)
+    missing = missing_fractions['NCB']
+    df['SourceOfNonCashBenefit'] = choose(rng, raw_values(clean.ncb_replacements, clean.ncb_types), n, missing['SourceOfNonCashBenefit'])
+    df['StartDate'] = started_before(rng, dates, 1000)
+    df['EndDate'] = days_after(rng, pd.DatetimeIndex(df['StartDate']), 200, missing['EndDate'])
+    return df
+
+def generate_disabilities(rng, keys, ratio):
+    """Generate `EntryDisabilities` or `ReviewDisabilities`: disabling conditions for some of the `keys`, some of which
+    have several.
+
+    """
+    df, dates = attach(rng, keys, ratio)
+    n = len(df)
+    missing = missing_fractions['Disabilities']
+    df['DisabilityType'] = choose(rng, raw_values(clean.disability_type_replacements, clean.disability_types), n, missing['DisabilityType'])
+    df['DisabilityDetermination'] = choose(rng, yes_no[:2], n, missing['DisabilityDetermination'])
+    df['StartDate'] = started_before(rng, dates, 3000)
+    df['EndDate'] = days_after(rng, pd.DatetimeIndex(df['StartDate']), 500, missing['EndDate'])
+    return df
+
+def generate_reviews(rng, entries, ratio):
+    """Generate `ReviewDetail`: reviews of some entries, (some reviewed several times,) a month to two years after entry.
+
+    :param rng: The random number generator.
+    :type rng: numpy.random.RandomState.
+    :param entries: The entries' keys, (see :func:`entry_keys`).
+    :type entries: pandas.Dataframe.
+    :param ratio: The mean number of reviews per entry.
+    :type ratio: float.
+    :rtype: pandas.DataFrame.
+
+    """
+    df, dates = attach(rng, entries, ratio)
+    n = len(df)
+    review_date = dates + pd.to_timedelta(rng.randint(30, 730, n), unit='D')
+    df['ReviewID'] = np.arange(1, n + 1)
+    df['ReviewType'] = choose(rng, review_types, n)
+    df['ReviewDate'] = dates_where(review_date, review_date <= last_date, last_date)
+    df['HousingStatus'] = choose(rng, housing_statuses, n, .01)
+    for question in review_columns[5:-1]:
+        df[question] = choose(rng, yes_no, n, .01)
+    df['Are you receiving Medicaid?'] = choose(rng, yes_no, n, .43)
+    return df[review_columns]
+
+def generate_services(rng, master, providers, ratio):
+    """Generate `Services`: a negative binomial number of services for each entry, (most get a few, and some get many,)
+    starting during the stay, some of them entered twice.
+
+    :param rng: The random number generator.
+    :type rng: numpy.random.RandomState.
+    :param master: `Master`.
+    :type master: pandas.Dataframe.
+    :param providers: `Providers`.
+    :type providers: pandas.Dataframe.
+    :param ratio: The mean number of services per entry.
+    :type ratio: float.
+    :rtype: pandas.DataFrame.
+
+    """
+    keys = entry_keys(master)
+    exits = master.drop_duplicates('EntryID')['ProgramExitDate'].values
+    mean = ratio * (1 - duplicated_services_fraction)
+    counts = rng.negative_binomial(services_dispersion, services_dispersion / (services_dispersion + mean), len(keys))
+    rows = np.repeat(np.arange(len(keys)), counts)
+    n = len(rows)
+    # services start during the stay, (or within a few months of entry, if there's no exit,) and a few after it
+    start = pd.DatetimeIndex(keys['Date'].values[rows])
+    length = np.where(pd.isnull(exits[rows]), 90, (pd.DatetimeIndex(exits[rows]) - start).days + 1)
+    start = start + pd.to_timedelta(np.floor(rng.rand(n) * np.maximum(length, 1) * 1.05), unit='D')
+    start = dates_where(start, start <= last_date, last_date)
+    missing = missing_fractions['Services']
+    codes = np.array(['{}{}-{:04d}'.format(c, chr(ord('A') + i), 1000 + 100 * i) for c in service_categories
+                      for i in range(services_per_category)], dtype=object)
+    code = rng.choice(len(codes), n)
+    df = pd.DataFrame({'ClientID':                keys['ClientID'].values[rows],
+                       'ServiceDescription])':    np.array(['Service ' + c for c in codes], dtype=object)[code],
+                       'ServiceCode':             codes[code],
+                       'ProviderSpecificCode':    choose(rng, ['PSC {}'.format(i) for i in range(20)], n, missing['ProviderSpecificCode']),
+                       'ServiceProvider':         choose(rng, providers['Provider'].values, n),
+                       'ServiceStartDate':        dates_where(start, rng.rand(n) >= missing['ServiceStartDate']),
+                       'ServiceEndDate':          days_after(rng, start, 2, missing['ServiceEndDate']),
+                       'FinancialAssistanceType': choose(rng, financial_assistance_types, n, missing['FinancialAssistanceType']),
+                       'NeedStatus':              choose(rng, need_statuses, n),
+                       'TotalCost':               masked(np.round(rng.lognormal(5, 1.5, n), 2), rng.rand(n) >= missing['TotalCost']),
+                       'DateCreated':             start,
+                       'DateUpdated':             start},
+                      columns=services_columns)
+    # some services were entered twice
+    df = pd.concat([df, df[rng.rand(n) < duplicated_services_fraction]]).reset_index(drop=True)
+    df['ServiceID'] = np.arange(1, len(df) + 1)
+    return df
+
+def print_usage():
+    print "synthetic.py"
+    print "Usage: python synthetic.py ROWS RAW_PATH [AUXILIARY_PATH]"
+    print
+    print "Generate a synthetic Master of ROWS rows, and the other raw tables in proportion, into RAW_PATH, and the"
+    print "auxiliary zip codes into AUXILIARY_PATH, (RAW_PATH if not given)"
+
+if __name__ == '__main__':
+    if len(sys.argv) not in (3, 4):
+        print_usage()
+    else:
+        generate(int(sys.argv[1]), sys.argv[2], sys.argv[3] if len(sys.argv) > 3 else None)
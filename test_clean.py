@@ -0,0 +1,457 @@
+"""Tests for :mod:`clean`.
+
+Run with `python -m unittest discover`, (or `make test`).
+
+"""
+import os, shutil, tempfile, unittest
+import numpy as np
+import pandas as pd
+import clean
+
+def choose(rng, values, n):
+    """Given a random number generator, some values, and a number, choose that many of the values, (as objects, so
+    `np.NaN`s stay `np.NaN`s).
+
+    """
+    values = np.array(values, dtype=object)
+    return values[rng.randint(len(values), size=n)]
+
+def master_fixture(n=2000, seed=0):
+    """Generate `n` rows with the columns of `master` that the row-wise derivations use, with the awkward cases mixed in:
+    missing values, clients who "entered" before they were born, entries on February 29th and on birthdays, stays of
+    exactly `psh_permanent_tenure` days, and PSH entries right around its cutoff before `dump_date`.
+
+    """
+    rng = np.random.RandomState(seed)
+    days = pd.to_timedelta(rng.randint(0, 365 * 25, n), unit='D')
+    entry = pd.Series(pd.Timestamp('1990-01-01') + days)
+    entry[rng.rand(n) < .1] = pd.NaT
+    entry[rng.rand(n) < .05] = pd.Timestamp('2012-02-29')
+    cutoff = clean.dump_date - pd.Timedelta(days=clean.psh_permanent_tenure)
+    entry[rng.rand(n) < .05] = cutoff + pd.to_timedelta(rng.randint(-1, 2, n), unit='D')
+    birth = pd.Series(pd.to_datetime(rng.randint(1920, 2016, n).astype(str), format='%Y'))
+    birth[rng.rand(n) < .1] = pd.NaT
+    # some entries fall on birthdays, (and birth "years" are January 1st,) so anniversaries are hit exactly
+    entry[rng.rand(n) < .05] = pd.Timestamp('2010-01-01')
+    length_of_stay = pd.Series(rng.randint(-5, 400, n).astype(float)).map(lambda t: t if t >= 0 else np.NaN)
+    length_of_stay[rng.rand(n) < .05] = float(clean.psh_permanent_tenure)
+    length_of_stay[rng.rand(n) < .1] = np.NaN
+    return pd.DataFrame({'ProgramEntryDate':  entry,
+                         'YearOfBirth':       birth,
+                         'Ethnicity':         choose(rng, ['Hispanic/Latino (HUD)', 'Non-Hispanic/Latino (HUD)', "Don't Know (HUD)", 'Refused (HUD)', np.NaN], n),
+                         'PrimaryRace':       choose(rng, clean.race_replacements_4_way.keys() + [np.NaN], n),
+                         'Veteran?':          choose(rng, ['Yes (HUD)', 'No (HUD)', 'refused', np.NaN], n),
+                         'ProgramType':       choose(rng, ['Permanent supportive housing (HUD)', 'Emergency Shelter (HUD)', np.NaN], n),
+                         'DestinationAtExit': choose(rng, clean.master_case_outcomes.keys(), n),
+                         'LengthOfStay':      length_of_stay})
+
+class VectorizedParityTest(unittest.TestCase):
+    """The columnar derivations give the same output as the row-wise ones they replace."""
+
+    def setUp(self):
+        self.df = master_fixture()
+
+    def assert_parity(self, row_wise, vectorized):
+        expected = self.df.apply(row_wise, axis=1)
+        actual = vectorized(self.df)
+        self.assertEqual(list(actual.index), list(expected.index))
+        for e, a in zip(expected, actual):
+            if pd.isnull(e):
+                self.assertTrue(pd.isnull(a), (e, a))
+            else:
+                self.assertEqual(e, a)
+
+    def test_refused(self):
+        self.assert_parity(clean.get_refused, clean.get_refused_vectorized)
+
+    def test_age_entered(self):
+        self.assert_parity(clean.get_age_entered, clean.get_age_entered_vectorized)
+
+    def test_race_ethnicity_4_way(self):
+        self.assert_parity(clean.get_race_ethnicity_4_way, clean.get_race_ethnicity_4_way_vectorized)
+
+    def test_case_outcome(self):
+        self.assert_parity(clean.get_case_outcome, clean.get_case_outcome_vectorized)
+
+# the scalar bucket functions that `bucketize` and its specs replace, for parity
+def scalar_age_bucket(age):
+    if pd.isnull(age):
+        return np.NaN
+    elif age < 6:
+        return 'Under 6 years'
+    elif age < 18:
+        return '6 to 17 years'
+    elif age < 65:
+        return '18 to 64 years'
+    else:
+        return '65 years and over'
+
+def scalar_dfss_age_bucket(age):
+    if pd.isnull(age):
+        return np.NaN
+    elif age < 1:
+        return 'DFSS: Under 1 year'
+    elif age < 6:
+        return 'DFSS: 1 to 5 years'
+    elif age < 13:
+        return 'DFSS: 6 to 12 years'
+    elif age < 18:
+        return 'DFSS: 13 to 17 years'
+    elif age < 25:
+        return 'DFSS: 18 to 24 years'
+    elif age < 31:
+        return 'DFSS: 25 to 30 years'
+    elif age < 51:
+        return 'DFSS: 31 to 50 years'
+    elif age < 62:
+        return 'DFSS: 51 to 61 years'
+    else:
+        return 'DFSS: 62 years and over'
+
+def scalar_income_bucket(dollars):
+    if pd.isnull(dollars):
+        return np.NaN
+    elif dollars == 0:
+        return 'Zero dollars'
+    elif dollars <= 500:
+        return '1 to 500 dollars'
+    elif dollars <= 1000:
+        return '501 to 1000 dollars'
+    elif dollars <= 2000:
+        return '1001 to 2000 dollars'
+    elif dollars <= 3000:
+        return '2001 to 3000 dollars'
+    else:
+        return '3001 dollars and over'
+
+def scalar_days_since_first_entry_bucket(d):
+    if d < 1:
+        return '0 days'
+    elif d <= 7:
+        return 'One week or less'
+    elif d < 30:
+        return 'More than one week, but less than one month'
+    elif d <= 90:
+        return 'One to three months'
+    elif d < 365:
+        return 'More than three months, but less than one year'
+    else:
+        return 'One year or longer'
+
+class BucketParityTest(unittest.TestCase):
+    """`bucketize` with each spec gives the same buckets as the scalar function it replaces, on and around every edge."""
+
+    def assert_parity(self, scalar, spec, nulls=(pd.NaT, None)):
+        edges = np.unique(spec['edges']).astype(float)
+        values = np.concatenate([edges, edges - 1, edges + 1, edges - 1e-9, edges + 1e-9, edges - .5, edges + .5,
+                                 [-np.inf, -1e9, -1, -.5, 0, 1e9, np.inf, np.NaN]])
+        rng = np.random.RandomState(0)
+        values = np.concatenate([values, rng.uniform(-10, edges.max() + 10, 1000).round(rng.randint(3))])
+        for s in (pd.Series(values, index=rng.permutation(len(values))),
+                  # objects holding `pd.NaT`s and `None`s, like columns merged from incomplete data
+                  pd.Series(list(values) + list(nulls), dtype=object)):
+            expected = s.apply(scalar)
+            actual = clean.bucketize(s, spec)
+            self.assertEqual(list(actual.index), list(s.index))
+            self.assertEqual(list(actual.cat.categories), spec.get('categories') or clean.unique_in_order(spec['labels']))
+            for v, e, a in zip(s, expected, actual):
+                if pd.isnull(e):
+                    self.assertTrue(pd.isnull(a), (v, e, a))
+                else:
+                    self.assertEqual(e, a, (v, e, a))
+
+    def test_age(self):
+        self.assert_parity(scalar_age_bucket, clean.age_bucket_spec)
+
+    def test_dfss_age(self):
+        self.assert_parity(scalar_dfss_age_bucket, clean.dfss_age_bucket_spec)
+
+    def test_income(self):
+        self.assert_parity(scalar_income_bucket, clean.income_bucket_spec)
+
+    def test_days_since_first_entry(self):
+        # (days since first entry are floats, and the scalar function only put `None` in '0 days' because `None < 1`)
+        self.assert_parity(scalar_days_since_first_entry_bucket, clean.days_since_first_entry_bucket_spec, nulls=[pd.NaT])
+
+class FirstEntriesTest(unittest.TestCase):
+    """`first_entries` finds each client's first entry, and breaks same-day ties by `master_all`'s order."""
+
+    def setUp(self):
+        day = pd.Timestamp('2013-01-01')
+        self.ma = pd.DataFrame({'EntryID':              [1, 2, 3, 4, 5, 6],
+                                'ClientUniqueID':       ['a', 'a', 'a', 'b', 'b', 'b'],
+                                'ProgramEntryDate':     [day + pd.Timedelta(days=10), day, day, day, day, pd.NaT],
+                                'ProgramType':          ['Shelter', 'Outreach', 'Housing', 'Housing', 'Shelter', 'Shelter'],
+                                'HomelessnessProgram?': [True, False, True, True, True, np.NaN]},
+                               columns=clean.first_entry_columns)
+
+    def test_first_entries(self):
+        firsts = clean.first_entries(self.ma).set_index('EntryID').sort_index()
+        # 'a's same-day entries 2 and 3: 2 is listed first, but only 3 is into a "Homelessness Program"
+        self.assertEqual(list(firsts['ProgramTypeOfFirstEntry']), ['Outreach'] * 3 + ['Housing'] * 3)
+        self.assertEqual(list(firsts['ProgramTypeOfFirstEntryHomelessnessProgram'].fillna('-')), ['Housing', '-', 'Housing', 'Housing', 'Housing', '-'])
+        self.assertEqual(list(firsts['DaysSinceFirstEntry'].fillna(-1)), [10, 0, 0, 0, 0, -1])
+        self.assertEqual(list(firsts['DaysSinceFirstEntryHomelessnessProgram'].fillna(-1)), [10, -1, 0, 0, 0, -1])
+        # numeric, (not objects holding `pd.NaT`s,) so `pipeline` models them as numbers
+        self.assertEqual(firsts['DaysSinceFirstEntry'].dtype, float)
+        self.assertEqual(firsts['DaysSinceFirstEntryHomelessnessProgram'].dtype, float)
+
+    def test_ties_follow_row_order(self):
+        # reversing the rows reverses which of each client's same-day entries comes first
+        firsts = clean.first_entries(self.ma.iloc[::-1]).set_index('EntryID').sort_index()
+        self.assertEqual(list(firsts['ProgramTypeOfFirstEntry']), ['Housing'] * 3 + ['Shelter'] * 3)
+
+def cross_product_reentries(df):
+    """`get_reentries` as it was, merging every exit with every entry of the same client, for parity."""
+    df_exits = df[pd.notnull(df['ProgramExitDate'])][['ClientUniqueID','ProgramExitDate']]
+    df_entries = df[df['HomelessnessProgram?'] == True][['ClientUniqueID','ProgramEntryDate','ProgramType']]
+    df_ee = pd.merge(df_exits, df_entries, on='ClientUniqueID', how='right')
+    df_reentered = df_ee[df_ee['ProgramExitDate'] < df_ee['ProgramEntryDate']]
+    r_columns = ['ClientUniqueID','ProgramExitDate','ProgramEntryDate','ProgramType']
+    # (`.sort`, which was unstable)
+    return df_reentered.sort_values('ProgramEntryDate').groupby(['ClientUniqueID','ProgramExitDate']).head(1)[r_columns]
+
+def reentries_fixture(n=2000, seed=0):
+    """Generate `n` entries of a few hundred clients over a couple of years, so clients often exit and enter on the same
+    day, (and enter more than one program on the same day,) with missing dates and homelessness programs mixed in.
+
+    """
+    rng = np.random.RandomState(seed)
+    entry = pd.Series(pd.Timestamp('2007-01-01') + pd.to_timedelta(rng.randint(0, 730, n), unit='D'))
+    entry[rng.rand(n) < .05] = pd.NaT
+    exit = entry + pd.to_timedelta(rng.randint(0, 60, n), unit='D')
+    exit[rng.rand(n) < .2] = pd.NaT
+    return pd.DataFrame({'ClientUniqueID':       rng.randint(300, size=n),
+                         'ProgramEntryDate':     entry,
+                         'ProgramExitDate':      exit,
+                         'HomelessnessProgram?': choose(rng, [True, True, True, False, np.NaN], n),
+                         'ProgramType':          choose(rng, ['SSVF', 'Street Outreach', 'Emergency Shelter', 'Transitional Housing'], n)},
+                        index=rng.permutation(n))
+
+class ReentriesTest(unittest.TestCase):
+    """`get_reentries` finds the same next entries as the cross product it replaces, and breaks same-day ties by the
+    order of `df`, where the cross product's sort didn't break them consistently."""
+
+    def setUp(self):
+        self.df = reentries_fixture()
+
+    def sorted_reentries(self, reentries):
+        return reentries.sort_values(['ClientUniqueID','ProgramExitDate']).reset_index(drop=True)
+
+    def test_parity(self):
+        expected = self.sorted_reentries(cross_product_reentries(self.df))
+        actual = self.sorted_reentries(clean.get_reentries(self.df))
+        self.assertGreater(len(expected), 100)
+        self.assertEqual(list(actual.columns), list(expected.columns))
+        pd.util.testing.assert_frame_equal(actual[['ClientUniqueID','ProgramExitDate','ProgramEntryDate']],
+                                           expected[['ClientUniqueID','ProgramExitDate','ProgramEntryDate']])
+        # the program type is the same, except for a tie between programs on the same day, where it's whichever entry
+        # comes first in `df`
+        entries = self.df[self.df['HomelessnessProgram?'] == True]
+        ties = 0
+        for i, row in actual.iterrows():
+            same_day = entries[(entries['ClientUniqueID'] == row['ClientUniqueID']) & (entries['ProgramEntryDate'] == row['ProgramEntryDate'])]
+            self.assertEqual(row['ProgramType'], same_day['ProgramType'].iloc[0])
+            if same_day['ProgramType'].nunique() == 1:
+                self.assertEqual(row['ProgramType'], expected['ProgramType'][i])
+            else:
+                ties += 1
+        self.assertGreater(ties, 0)
+
+    def test_same_day_tie(self):
+        # like EntryID 1717, which exited before two entries on 2007-08-23, SSVF and then Street Outreach
+        day = pd.Timestamp('2007-08-23')
+        df = pd.DataFrame({'ClientUniqueID':       ['a', 'a', 'a', 'a'],
+                           'ProgramEntryDate':     [day - pd.Timedelta(days=30), day, day, day + pd.Timedelta(days=5)],
+                           'ProgramExitDate':      [day - pd.Timedelta(days=2), pd.NaT, pd.NaT, pd.NaT],
+                           'HomelessnessProgram?': [True, True, True, True],
+                           'ProgramType':          ['Emergency Shelter', 'SSVF', 'Street Outreach', 'Transitional Housing']})
+        self.assertEqual(list(clean.get_reentries(df)['ProgramType']), ['SSVF'])
+        self.assertEqual(list(clean.get_reentries(df.iloc[[0, 2, 1, 3]])['ProgramType']), ['Street Outreach'])
+        # an entry on the day of the exit isn't a reentry
+        df.loc[0, 'ProgramExitDate'] = day
+        self.assertEqual(list(clean.get_reentries(df)['ProgramType']), ['Transitional Housing'])
+
+def merged_services(df, s):
+    """`get_services` as it was, merging every service onto every one of the client's stays, for parity."""
+    dfs = pd.merge(df, s, on='ClientID', how='right')
+    dfs = dfs[(dfs['ProgramEntryDate'] <= dfs['ServiceStartDate']) & (dfs['ServiceStartDate'] < dfs['ProgramExitDate'])]
+    dfs['value'] = True
+    return pd.pivot_table(dfs, values='value', index=['EntryID'], columns='ServiceTypeL1')
+
+def services_fixture(n=500, seed=0):
+    """Generate `n` stays of a hundred clients, (some overlapping, some empty, some with a missing date, and some
+    `EntryID`s repeated,) and services for them, (and for clients with no stays,) which fall on, and a day either side
+    of, the stays' entry and exit dates, or anywhere else nearby, some with a missing date or type.
+
+    """
+    rng = np.random.RandomState(seed)
+    entry = pd.Series(pd.Timestamp('2012-01-01') + pd.to_timedelta(rng.randint(0, 365, n), unit='D'))
+    exit = entry + pd.to_timedelta(rng.randint(0, 60, n), unit='D')
+    entry[rng.rand(n) < .05] = pd.NaT
+    exit[rng.rand(n) < .1] = pd.NaT
+    entry_ids = np.arange(n)
+    entry_ids[rng.rand(n) < .05] = 7
+    df = pd.DataFrame({'ClientID':         rng.randint(100, size=n),
+                       'EntryID':          entry_ids,
+                       'ProgramEntryDate': entry,
+                       'ProgramExitDate':  exit},
+                      index=rng.permutation(n))
+    stays = rng.randint(n, size=4 * n)
+    boundaries = np.where(rng.rand(4 * n) < .5, df['ProgramEntryDate'].values[stays], df['ProgramExitDate'].values[stays])
+    dates = pd.Series(boundaries + pd.to_timedelta(rng.randint(-1, 2, 4 * n), unit='D').values)
+    anywhere = rng.rand(4 * n) < .3
+    dates[anywhere] = pd.Timestamp('2012-01-01') + pd.to_timedelta(rng.randint(0, 425, anywhere.sum()), unit='D')
+    dates[rng.rand(4 * n) < .02] = pd.NaT
+    clients = df['ClientID'].values[stays]
+    clients[rng.rand(4 * n) < .05] = 1000
+    s = pd.DataFrame({'ClientID':         clients,
+                      'ServiceStartDate': dates,
+                      'ServiceTypeL1':    choose(rng, ['B Service', 'D Service', 'F Service', 'H Service', np.NaN], 4 * n)})
+    return df, s
+
+class ServicesTest(unittest.TestCase):
+    """`get_services` finds the same services in each stay as merging every service onto every stay, which it replaces,
+    with services on the entry date in the stay, and those on the exit date out of it."""
+
+    def setUp(self):
+        self.df, self.s = services_fixture()
+
+    def test_parity(self):
+        expected = merged_services(self.df, self.s).notnull()
+        # however many stays it matches at once
+        for max_memory in (clean.services_max_memory, 1, 1000):
+            services = clean.get_services(self.df, self.s, max_memory=max_memory).dense()
+            self.assertEqual(list(services.index), list(expected.index))
+            self.assertEqual(list(services.columns), list(expected.columns))
+            np.testing.assert_array_equal(services.values, expected.values)
+        self.assertGreater(expected.values.sum(), 100)
+
+    def test_boundaries(self):
+        day = pd.Timestamp('2012-03-01')
+        df = pd.DataFrame({'ClientID':         [1, 1, 2],
+                           'EntryID':          [10, 11, 20],
+                           'ProgramEntryDate': [day, day + pd.Timedelta(days=5), day],
+                           'ProgramExitDate':  [day + pd.Timedelta(days=5), day + pd.Timedelta(days=5), pd.NaT]})
+        s = pd.DataFrame({'ClientID':         [1, 1, 1, 1, 2],
+                          'ServiceStartDate': [day - pd.Timedelta(days=1), day, day + pd.Timedelta(days=4),
+                                               day + pd.Timedelta(days=5), day],
+                          'ServiceTypeL1':    ['B Service', 'D Service', 'F Service', 'H Service', 'B Service']})
+        services = clean.get_services(df, s).dense()
+        # stay 10 gets the services on its entry date and the day before its exit; stay 11 is empty, (entered and
+        # exited on the day of the 'H Service',) and stay 20 hasn't exited
+        self.assertEqual(list(services.index), [10])
+        self.assertEqual(list(services.columns[services.loc[10].values]), ['D Service', 'F Service'])
+        pd.util.testing.assert_frame_equal(services, merged_services(df, s).notnull(), check_names=False)
+
+class FamilyCompositionTest(unittest.TestCase):
+    """`get_family_composition` counts each family's members, and finds its head of household."""
+
+    def setUp(self):
+        self.df = pd.DataFrame({'EntryID':            [1, 2, 3, 4, 5, 6],
+                                'Entry Exit GroupID': [10, 10, 10, np.NaN, 20, 20],
+                                'ClientID':           [100, 101, 101, 200, 300, 301],
+                                'ClientUniqueID':     ['p', 'q', 'q', 'r', 's', 's'],
+                                'Head Of Household?': ['No', 'Yes', 'No', np.NaN, 'No', 'No'],
+                                'AgeEntered':         [4, 35, 4, 70, np.NaN, np.NaN],
+                                'AgeEnteredBucket':   ['Under 6 years', '18 to 64 years', 'Under 6 years', '65 years and over', np.NaN, np.NaN]},
+                               index=range(100, 106))
+        self.fp = clean.get_family_composition(self.df)
+
+    def test_index(self):
+        self.assertEqual(list(self.fp.index), list(self.df.index))
+
+    def test_counts(self):
+        # family 10 has client 101 twice, (who's counted in the age buckets and household size each time, but is one
+        # distinct client,) and family 20 is one person under two `ClientID`s, and has no one with an age
+        self.assertEqual(list(self.fp['Under 6 years'].fillna(-1)), [2, 2, 2, 0, -1, -1])
+        self.assertEqual(list(self.fp['18 to 64 years'].fillna(-1)), [1, 1, 1, 0, -1, -1])
+        self.assertEqual(list(self.fp['OtherFamilyMembers'].fillna(-1)), [2, 2, 2, 0, -1, -1])
+        self.assertEqual(list(self.fp['HouseholdSize']), [3, 3, 3, 1, 2, 2])
+        self.assertEqual(list(self.fp['HouseholdClients']), [2, 2, 2, 1, 1, 1])
+
+    def test_missing_client_unique_id(self):
+        # clients without a `ClientUniqueID` are each a person of their own
+        self.df['ClientUniqueID'] = ['p', np.NaN, np.NaN, np.NaN, np.NaN, 's']
+        self.assertEqual(list(clean.get_family_composition(self.df)['HouseholdClients']), [3, 3, 3, 1, 2, 2])
+
+    def test_binary(self):
+        self.assertEqual(list(self.fp['Family?'].fillna('-')), [True, True, True, False, '-', '-'])
+        self.assertEqual(list(self.fp['SingleAdultWithChildren?'].fillna('-')), [True, True, True, False, '-', '-'])
+        self.assertEqual(list(self.fp['65 years and over?'].fillna('-')), [False, False, False, True, '-', '-'])
+
+    def test_hoh_age_entered(self):
+        # the member marked head of household, or the client who entered alone; family 20 has no head marked
+        self.assertEqual(list(self.fp['HoHAgeEntered'].fillna(-1)), [35, 35, 35, 70, -1, -1])
+
+class IndicatorsTest(unittest.TestCase):
+    """`Indicators` holds the same indicators as a pivot table, and exports them densely and sparsely alike."""
+
+    def setUp(self):
+        rng = np.random.RandomState(0)
+        n = 500
+        # more than 8 types, so the bitset is more than a byte wide, with missing values and duplicated pairs
+        self.entry_ids = choose(rng, range(1, 80) + [np.NaN], n)
+        self.types = choose(rng, ['Type {}'.format(i) for i in range(11)] + [np.NaN], n)
+        self.indicators = clean.Indicators(self.entry_ids, self.types)
+
+    def test_dense(self):
+        present = pd.notnull(self.entry_ids) & pd.notnull(self.types)
+        expected = pd.crosstab(self.entry_ids[present].astype(int), self.types[present]) > 0
+        dense = self.indicators.dense()
+        self.assertEqual(list(dense.index), list(expected.index))
+        self.assertEqual(list(dense.columns), list(expected.columns))
+        np.testing.assert_array_equal(dense.values, expected.values)
+
+    def test_dense_reindexed(self):
+        # unknown `EntryID`s and unseen types are all False
+        dense = self.indicators.dense([3, 1000, 5], ['Type 10', 'Type 99', 'Type 0'], suffix=' Entry')
+        self.assertEqual(list(dense.columns), ['Type 10 Entry', 'Type 99 Entry', 'Type 0 Entry'])
+        self.assertFalse(dense.loc[1000].any())
+        self.assertFalse(dense['Type 99 Entry'].any())
+        self.assertEqual(dense.loc[3, 'Type 10 Entry'], ((self.entry_ids == 3) & (self.types == 'Type 10')).any())
+
+    def test_sparse(self):
+        for entry_ids, types in ((None, None), ([3, 1000, 5, 3], ['Type 10', 'Type 99', 'Type 0'])):
+            sparse = self.indicators.sparse(entry_ids, types)
+            self.assertEqual(sparse.dtype, bool)
+            np.testing.assert_array_equal(sparse.toarray(), self.indicators.dense(entry_ids, types).values)
+
+try:
+    import pyarrow
+except ImportError:
+    pyarrow = None
+
+@unittest.skipIf(pyarrow is None, 'pyarrow is not installed')
+class StoreTest(unittest.TestCase):
+    """Projected and filtered loads from the columnar store give the same rows, (and index,) as the pickle."""
+
+    def setUp(self):
+        self.saved = clean.clean_dir, clean.store_format, clean.row_group_size
+        clean.clean_dir = tempfile.mkdtemp()
+        os.makedirs(os.path.join(clean.clean_dir, 'pickles'))
+        # small row groups, so filters skip some of them
+        clean.row_group_size = 3
+        df = pd.DataFrame({'a': range(10), 'b': list('abcdefghij')}, index=range(100, 120, 2))
+        self.df = df[df['a'] % 3 != 0]
+        self.df.to_pickle(clean.pickle_path('x'))
+
+    def tearDown(self):
+        shutil.rmtree(clean.clean_dir)
+        clean.clean_dir, clean.store_format, clean.row_group_size = self.saved
+
+    def check_store(self, store_format):
+        clean.store_format = store_format
+        os.makedirs(os.path.join(clean.clean_dir, store_format+'s'))
+        clean.write_store(self.df, 'x')
+        pd.util.testing.assert_frame_equal(clean.load('x', columns=['b']), self.df[['b']])
+        pd.util.testing.assert_frame_equal(clean.load('x', columns=['b'], filters=[('a', '>', 6)]), self.df[self.df['a'] > 6][['b']])
+
+    def test_parquet(self):
+        self.check_store('parquet')
+
+    def test_feather(self):
+        self.check_store('feather')
+
+if __name__ == '__main__':
+    unittest.main()
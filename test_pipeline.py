@@ -0,0 +1,542 @@
+"""Tests for :mod:`pipeline`.
+
+Run with `python -m unittest discover`, (or `make test`).
+
+"""
+import os, sys, shutil, tempfile, unittest, StringIO
+import numpy as np
+import pandas as pd
+import matplotlib
+# plot without a display
+matplotlib.use('Agg')
+from matplotlib import pyplot as plt
+import pipeline, models
+
+mock_weka_server = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'mock_weka_server.py')
+
+class ArffTest(unittest.TestCase):
+    """:func:`pipeline.write_arff` declares and writes each kind of column."""
+
+    def setUp(self):
+        self.path = tempfile.mktemp(suffix='.arff')
+        self.df = pd.DataFrame({'days': np.array([1.0, pd.NaT, 3.5, 10.0], dtype=object),
+                                'flag': np.array([True, np.NaN, False, True], dtype=object),
+                                'text': ['b', 'a', None, 'b'],
+                                'y':    [True, False, True, False]})
+
+    def tearDown(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+    def read(self):
+        with open(self.path) as f:
+            header, data = f.read().split('@data\n')
+        return header.splitlines(), data.splitlines()
+
+    def test_numeric_objects(self):
+        # numbers stored as objects, (with `pd.NaT`s for missing values,) are numeric
+        self.assertIsNone(pipeline.nominal_values(self.df['days']))
+        self.assertEqual(pipeline.nominal_values(self.df['flag']), ['False', 'True'])
+        self.assertEqual(pipeline.nominal_values(self.df['text']), ['a', 'b'])
+        pipeline.write_arff(self.df, self.path, 'test', ['days', 'flag', 'text'], 'y')
+        header, data = self.read()
+        self.assertIn('@attribute days numeric', header)
+        self.assertIn('@attribute flag {False,True}', header)
+        self.assertIn('@attribute y {True,False}', header)
+        self.assertEqual(data, ['1.0,True,b,True', '?,?,a,False', '3.5,False,?,True', '10.0,True,b,False'])
+
+    def test_sparse(self):
+        pipeline.write_arff(self.df, self.path, 'test', ['days', 'flag', 'text'], 'y', sparse=True)
+        header, data = self.read()
+        self.assertEqual(data, ['{0 1.0,1 True,2 b}', '{0 ?,1 ?,3 False}', '{0 3.5,2 ?}', '{0 10.0,1 True,2 b,3 False}'])
+
+    def test_rows(self):
+        # a row mask picks out the same rows however many chunks they're written in
+        rng = np.random.RandomState(0)
+        df = pd.DataFrame({'x': rng.rand(50), 'y': np.array([True, False, np.NaN], dtype=object)[rng.randint(3, size=50)]})
+        rows = rng.rand(50) < .5
+        pipeline.write_arff(df[rows], self.path, 'test', ['x'], 'y')
+        expected = self.read()
+        pipeline.write_arff(df, self.path, 'test', ['x'], 'y', chunk_size=7, rows=rows)
+        self.assertEqual(self.read(), expected)
+
+class FoldsTest(unittest.TestCase):
+    """Folds are stratified, and their predictions pool into Weka's threshold curve."""
+
+    def test_stratified_folds(self):
+        y = np.array([True] * 30 + [False] * 70)
+        folds = pipeline.stratified_folds(y, 10)
+        np.testing.assert_array_equal(np.bincount(folds[y]), [3] * 10)
+        np.testing.assert_array_equal(np.bincount(folds[~y]), [7] * 10)
+        # the same each time, for a given seed
+        np.testing.assert_array_equal(pipeline.stratified_folds(y, 10), folds)
+        self.assertFalse((pipeline.stratified_folds(y, 10, seed=2) == folds).all())
+
+    def test_parse_predictions(self):
+        text = """
+=== Predictions on test data ===
+
+ inst#     actual  predicted error distribution
+     1     1:True     1:True       *0.8,0.2
+     2    2:False     1:True   +   *0.6,0.4
+     3    2:False    2:False       0.3,*0.7
+     4     1:True    2:False   +   0.1,*0.9
+
+"""
+        y, scores, predicted = pipeline.parse_predictions(text)
+        np.testing.assert_array_equal(y, [True, False, False, True])
+        np.testing.assert_array_equal(scores, [.8, .6, .3, .1])
+        np.testing.assert_array_equal(predicted, [True, True, False, False])
+
+    def test_threshold_curve(self):
+        curve = pipeline.threshold_curve([True, False, True, False, True], [.9, .8, .4, .4, .1])
+        self.assertEqual(list(curve.columns), pipeline.threshold_columns)
+        # one row per distinct score, predicting positive the rows scored at least it, and then one predicting none
+        np.testing.assert_array_equal(curve['Threshold'], [.1, .4, .8, .9, 1.0])
+        np.testing.assert_array_equal(curve["'True Positives'"], [3, 2, 1, 1, 0])
+        np.testing.assert_array_equal(curve["'False Positives'"], [2, 2, 1, 0, 0])
+        np.testing.assert_array_equal(curve["'False Negatives'"], [0, 1, 2, 2, 3])
+        np.testing.assert_array_equal(curve["'True Negatives'"], [0, 0, 1, 2, 2])
+        np.testing.assert_allclose(curve['Precision'], [.6, .5, .5, 1, 0])
+        np.testing.assert_allclose(curve["'False Positive Rate'"], [1, 1, .5, 0, 0])
+        summary = pipeline.threshold_summary(curve)
+        self.assertEqual(summary['Instances'], 5)
+        # the share of positive and negative pairs ranked right, (with ties counting half)
+        self.assertAlmostEqual(summary['ROC AUC'], 2.5 / 6)
+
+class ResultsTest(unittest.TestCase):
+    """:func:`pipeline.parse_results` reads the metrics out of Weka's `-i` results, (as written by `run_weka.sh`)."""
+
+    # J48's results on 200 rows, with a target missing for 12 more, in the format of Weka 3.8's `-t ARFF -i` output
+    text = """
+Options: -M 50 
+
+=== Classifier model (full training set) ===
+
+J48 pruned tree
+------------------
+
+x <= 0.5: False (110.0/20.0)
+x > 0.5: True (90.0/30.0)
+
+Number of Leaves  : \t2
+
+Size of the tree : \t3
+
+
+Time taken to build model: 0.02 seconds
+Time taken to test model on training data: 0.01 seconds
+
+=== Error on training data ===
+
+Correctly Classified Instances         150               75      %
+Incorrectly Classified Instances        50               25      %
+Kappa statistic                          0.4898
+Mean absolute error                      0.3556
+Root mean squared error                  0.4216
+Relative absolute error                 72.8814 %
+Root relative squared error             85.3411 %
+Total Number of Instances              200     
+
+
+=== Detailed Accuracy By Class ===
+
+                 TP Rate  FP Rate  Precision  Recall   F-Measure  MCC      ROC Area  PRC Area  Class
+                 0.667    0.182    0.750      0.667    0.706      0.492    0.742     0.667     True
+                 0.818    0.333    0.750      0.818    0.783      0.492    0.742     0.803     False
+Weighted Avg.    0.750    0.265    0.750      0.750    0.748      0.492    0.742     0.742     
+
+
+=== Confusion Matrix ===
+
+  a  b   <-- classified as
+ 60 30 |  a = True
+ 20 90 |  b = False
+
+Time taken to perform cross-validation: 0.05 seconds
+
+
+=== Stratified cross-validation ===
+
+Correctly Classified Instances         140               70      %
+Incorrectly Classified Instances        60               30      %
+Kappa statistic                          0.3878
+Mean absolute error                      0.3812
+Root mean squared error                  0.4527
+Relative absolute error                 78.1356 %
+Root relative squared error             91.6413 %
+Coverage of cases (0.95 level)          95.5    %
+Mean rel. region size (0.95 level)      87.25   %
+Total Number of Instances              200     
+Ignored Class Unknown Instances                 12     
+
+
+=== Detailed Accuracy By Class ===
+
+                 TP Rate  FP Rate  Precision  Recall   F-Measure  MCC      ROC Area  PRC Area  Class
+                 0.611    0.227    0.688      0.611    0.647      0.390    0.701     0.634     True
+                 0.773    0.389    0.708      0.773    0.739      0.390    0.701     0.772     False
+Weighted Avg.    0.700    0.316    0.699      0.700    0.698      0.390    0.701     0.710     
+
+
+=== Confusion Matrix ===
+
+  a  b   <-- classified as
+ 55 35 |  a = True
+ 25 85 |  b = False
+
+"""
+
+    def test_parse_results(self):
+        metrics = pd.DataFrame(pipeline.parse_results(self.text), columns=pipeline.results_columns)
+        training, cv = 'Error on training data', 'Stratified cross-validation'
+        # the times, with no evaluation
+        times = metrics[metrics['Evaluation'].isnull()]
+        self.assertEqual(list(times['Metric']), ['Time taken to build model', 'Time taken to test model on training data',
+                                                 'Time taken to perform cross-validation'])
+        np.testing.assert_array_equal(times['Value'], [.02, .01, .05])
+        self.assertTrue(times['Class'].isnull().all())
+
+        summary = ['Correctly Classified Instances', 'Correctly Classified Instances %', 'Incorrectly Classified Instances',
+                   'Incorrectly Classified Instances %', 'Kappa statistic', 'Mean absolute error', 'Root mean squared error',
+                   'Relative absolute error', 'Root relative squared error']
+        details = ['TP Rate', 'FP Rate', 'Precision', 'Recall', 'F-Measure', 'MCC', 'ROC Area', 'PRC Area']
+        confusion = ['Classified as True', 'Classified as False']
+        classes = ['True', 'False', 'Weighted Avg.']
+        for evaluation, statistics in ((training, summary + ['Total Number of Instances']),
+                                       (cv, summary + ['Coverage of cases (0.95 level)', 'Mean rel. region size (0.95 level)',
+                                                       'Total Number of Instances', 'Ignored Class Unknown Instances'])):
+            rows = metrics[metrics['Evaluation'] == evaluation]
+            self.assertEqual(list(rows['Metric']), statistics + [d for c in classes for d in details] +
+                                                   [m for c in classes[:2] for m in confusion])
+            self.assertEqual(list(rows['Class'].fillna('')), [''] * len(statistics) + [c for c in classes for d in details] +
+                                                             [c for c in classes[:2] for m in confusion])
+
+        def value(evaluation, metric, label=None):
+            rows = metrics[(metrics['Evaluation'] == evaluation) & (metrics['Metric'] == metric) &
+                           (metrics['Class'].isnull() if label is None else metrics['Class'] == label)]
+            self.assertEqual(len(rows), 1)
+            return rows['Value'].iloc[0]
+        self.assertEqual(value(training, 'Correctly Classified Instances'), 150)
+        self.assertEqual(value(training, 'Correctly Classified Instances %'), 75)
+        self.assertEqual(value(cv, 'Kappa statistic'), .3878)
+        self.assertEqual(value(cv, 'Relative absolute error'), 78.1356)
+        self.assertEqual(value(cv, 'Coverage of cases (0.95 level)'), 95.5)
+        self.assertEqual(value(cv, 'Ignored Class Unknown Instances'), 12)
+        self.assertEqual(value(training, 'ROC Area', 'True'), .742)
+        self.assertEqual(value(training, 'PRC Area', 'False'), .803)
+        self.assertEqual(value(cv, 'F-Measure', 'Weighted Avg.'), .698)
+        self.assertEqual(value(cv, 'PRC Area', 'False'), .772)
+        # the confusion matrix, by actual class
+        self.assertEqual([value(training, m, c) for c in ('True', 'False') for m in confusion], [60, 30, 20, 90])
+        self.assertEqual([value(cv, m, c) for c in ('True', 'False') for m in confusion], [55, 35, 25, 85])
+
+    def test_load_results(self):
+        path = tempfile.mktemp(suffix='_results.txt')
+        stored = path[:-len('_results.txt')] + '_summary.csv'
+        try:
+            with open(path, 'w') as f:
+                f.write(self.text)
+            # the same metrics, whether they're parsed or loaded from the stored summary
+            parsed = pipeline.load_results(path)
+            self.assertTrue(os.path.exists(stored))
+            pd.util.testing.assert_frame_equal(pipeline.load_results(path), parsed)
+            self.assertEqual(len(parsed), len(pipeline.parse_results(self.text)))
+        finally:
+            for p in (path, stored):
+                if os.path.exists(p):
+                    os.remove(p)
+
+class DesignMatrixTest(unittest.TestCase):
+    """:func:`pipeline.design_matrix` builds the same columns as Weka would see."""
+
+    def test_design_matrix(self):
+        df = pd.DataFrame({'days': np.array([1.0, pd.NaT, 3.5, 10.0], dtype=object),
+                           'flag': [True, False, True, True],
+                           'text': ['b', 'a', None, 'b']}, columns=['days', 'flag', 'text'])
+        # numbers stored as objects are one numeric column, with missing values replaced by the mean
+        np.testing.assert_array_equal(pipeline.design_matrix(df[['days']]), [[1.0], [14.5 / 3], [3.5], [10.0]])
+        # one indicator column per value, with none set for missing values
+        np.testing.assert_array_equal(pipeline.design_matrix(df[['flag', 'text']]),
+                                      [[0, 1, 0, 1], [1, 0, 1, 0], [0, 1, 0, 0], [0, 1, 0, 1]])
+
+class ThresholdsCacheTest(unittest.TestCase):
+    """:func:`pipeline.load_thresholds` parses each CSV once, and never serves a curve from before it was rewritten."""
+
+    def setUp(self):
+        self.saved = pipeline.thresholds_cache_size, pd.read_csv
+        pipeline.thresholds_cache.clear()
+        self.file_path = tempfile.mkdtemp()
+        # count the CSVs parsed
+        self.parsed = []
+        read_csv = pd.read_csv
+        def record(path, *args, **kwargs):
+            self.parsed.append(path)
+            return read_csv(path, *args, **kwargs)
+        pd.read_csv = record
+
+    def tearDown(self):
+        pipeline.thresholds_cache_size, pd.read_csv = self.saved
+        pipeline.thresholds_cache.clear()
+        shutil.rmtree(self.file_path)
+
+    def write(self, name, scores, rename=True):
+        """Write a threshold curve CSV, (by renaming a new file over it, like the pipeline does, or in place,) and return
+        its path."""
+        path = os.path.join(self.file_path, name+'_thresholds.csv')
+        curve = pipeline.threshold_curve([True, False] * (len(scores) / 2), scores)
+        curve.to_csv(path + '.tmp' if rename else path, index=False)
+        if rename:
+            os.rename(path + '.tmp', path)
+        return path
+
+    def test_cache(self):
+        path = self.write('a', [.9, .1])
+        thresholds = pipeline.load_thresholds(path)
+        # a hit is the same curve, without parsing or loading it again
+        self.assertIs(pipeline.load_thresholds(path), thresholds)
+        self.assertEqual(self.parsed, [path])
+        # out of memory, it's loaded from the .npz instead of parsed
+        pipeline.thresholds_cache.clear()
+        loaded = pipeline.load_thresholds(path)
+        self.assertIsNot(loaded, thresholds)
+        pd.util.testing.assert_frame_equal(loaded, thresholds)
+        self.assertEqual(self.parsed, [path])
+
+    def test_eviction(self):
+        pipeline.thresholds_cache_size = 2
+        a, b, c = [self.write(name, [.9, .1]) for name in 'abc']
+        first = pipeline.load_thresholds(a)
+        pipeline.load_thresholds(b)
+        # using a makes b the least recently used, so it's evicted
+        self.assertIs(pipeline.load_thresholds(a), first)
+        pipeline.load_thresholds(c)
+        self.assertEqual(sorted(path for path, signature in pipeline.thresholds_cache), [a, c])
+        self.assertIs(pipeline.load_thresholds(a), first)
+
+    def test_rewrite(self):
+        path = self.write('a', [.9, .1])
+        pipeline.load_thresholds(path)
+        mtime = os.path.getmtime(path)
+        # rewritten within the same modification time, (with the same size,) by renaming a new file over it
+        self.write('a', [.8, .2])
+        os.utime(path, (mtime, mtime))
+        np.testing.assert_array_equal(pipeline.load_thresholds(path)['Threshold'], [.2, .8, 1.0])
+        # and in place, with a different size, with the in-memory cache cleared, so only the .npz could be stale
+        pipeline.thresholds_cache.clear()
+        self.write('a', [.7, .3, .6, .4], rename=False)
+        os.utime(path, (mtime, mtime))
+        np.testing.assert_array_equal(pipeline.load_thresholds(path)['Threshold'], [.3, .4, .6, .7, 1.0])
+        self.assertEqual(len(self.parsed), 3)
+        # the .npz now serves the new curve
+        pipeline.thresholds_cache.clear()
+        np.testing.assert_array_equal(pipeline.load_thresholds(path)['Threshold'], [.3, .4, .6, .7, 1.0])
+        self.assertEqual(len(self.parsed), 3)
+
+class SklearnTest(unittest.TestCase):
+    """The sklearn backend writes thresholds and results that the rest of :class:`pipeline.Pipeline` reads like Weka's."""
+
+    def setUp(self):
+        self.file_path = tempfile.mkdtemp()
+        rng = np.random.RandomState(0)
+        n = 200
+        self.data = pd.DataFrame({'x': rng.rand(n),
+                                  'c': np.array(['a', 'b', np.NaN], dtype=object)[rng.randint(3, size=n)],
+                                  'y': np.array([True, False, np.NaN], dtype=object)[rng.choice(3, size=n, p=[.3, .6, .1])]})
+        self.pipeline = pipeline.Pipeline(self.data, self.file_path, {'all': ['x', 'c'], 'x': ['x']}, ['y'],
+                                          {'j48': models.decision_tree_pruned, 'logistic': models.logistic,
+                                           'rf': models.random_forest_small}, backend='sklearn')
+
+    def tearDown(self):
+        shutil.rmtree(self.file_path)
+        plt.close('all')
+
+    def test_model(self):
+        codes = self.pipeline.model(n_jobs=1)
+        self.assertEqual(codes, {model_name: 0 for model_name in self.pipeline.models})
+        y = self.data['y'].dropna().astype(bool)
+        for model_name in self.pipeline.models:
+            curve = pd.read_csv(os.path.join(self.file_path, model_name+'_thresholds.csv'))
+            self.assertEqual(list(curve.columns), pipeline.threshold_columns)
+            # one row per threshold, each splitting every row with a known target
+            self.assertGreater(len(curve), 1)
+            self.assertTrue(((curve["'True Positives'"] + curve["'False Negatives'"]) == y.sum()).all())
+            self.assertTrue(((curve["'False Positives'"] + curve["'True Negatives'"]) == (~y).sum()).all())
+            self.assertTrue(curve['Threshold'].is_monotonic_increasing)
+
+        results = self.pipeline.results()
+        self.assertEqual(sorted(results.index), sorted(self.pipeline.models))
+        self.assertTrue((results['Instances'] == len(y)).all())
+        self.assertTrue(results['ROC AUC'].between(0, 1).all())
+        summary = self.pipeline.summary()
+        self.assertEqual(sorted(summary['Model'].unique()), sorted(self.pipeline.models))
+        self.pipeline.plot_roc()
+        self.pipeline.plot_pr()
+        # both plot onto the same axes, one line per model each
+        self.assertEqual(len(plt.gca().get_lines()), 2 * len(self.pipeline.models))
+
+        # finished models are skipped
+        self.pipeline.model(n_jobs=1)
+        self.assertEqual(set(self.pipeline.status.values()), {'done'})
+
+    def test_logistic_C(self):
+        # Weka's ridge penalizes twice as much as the same scikit-learn C, and its default is capped
+        self.assertEqual(models.sklearn_estimator('functions.Logistic -R 0.5').C, 1.0)
+        self.assertEqual(models.sklearn_estimator('functions.Logistic -R 1e-2').C, 50.0)
+        self.assertEqual(models.sklearn_estimator(models.logistic).C, models.max_logistic_C)
+        self.assertEqual(models.sklearn_estimator('functions.Logistic -M 10').max_iter, 10)
+
+class ServerTest(unittest.TestCase):
+    """Models run in the Weka server, (the mock one, see `mock_weka_server.py`,) through :func:`pipeline.run_models`."""
+
+    def setUp(self):
+        self.saved = pipeline.poll_interval
+        pipeline.poll_interval = .01
+        self.file_path = tempfile.mkdtemp()
+        rng = np.random.RandomState(0)
+        n = 200
+        self.data = pd.DataFrame({'x': rng.rand(n),
+                                  'b': rng.rand(n) < .3,
+                                  'c': np.array(['a b', "it's", 'c,d', np.NaN], dtype=object)[rng.randint(4, size=n)],
+                                  'y': rng.rand(n) < .2})
+        self.pipeline = pipeline.Pipeline(self.data, self.file_path, {'all': ['x', 'b', 'c'], 'x': ['x']}, ['y'],
+                                          {'j48': 'trees.J48 -M 50', 'oom': 'mock.OutOfMemory', 'oom_once': 'mock.OutOfMemoryOnce'})
+        self.server = pipeline.WekaServer(command=[sys.executable, mock_weka_server])
+
+    def tearDown(self):
+        self.server.close()
+        shutil.rmtree(self.file_path)
+        pipeline.poll_interval = self.saved
+
+    def run_models(self, **kwargs):
+        """Run the models, returning their codes and what :func:`pipeline.run_models` printed, by line."""
+        stdout, sys.stdout = sys.stdout, StringIO.StringIO()
+        try:
+            codes = pipeline.run_models([self.pipeline], server=self.server, **kwargs)[0]
+            return codes, sys.stdout.getvalue().splitlines()
+        finally:
+            sys.stdout = stdout
+
+    def test_run_models(self):
+        # the server's heap is fixed, so all of its models start at once, whatever `max_memory` is
+        codes, lines = self.run_models(max_memory=pipeline.model_memory)
+        running = [i for i, line in enumerate(lines) if line.startswith('Running ')]
+        self.assertEqual(running[:6], range(6))
+        for fs_name in ('all', 'x'):
+            self.assertEqual(codes[fs_name+'_to_y_by_j48'], 0)
+            self.assertEqual(codes[fs_name+'_to_y_by_oom_once'], 0)
+            self.assertEqual(codes[fs_name+'_to_y_by_oom'], 1)
+        self.assertEqual(self.pipeline.status, {model_name: 'done' if code == 0 else 'failed' for model_name, code in codes.iteritems()})
+        # a model that runs out of memory is retried with the same heap, `server_oom_retries` times, and no more
+        self.assertEqual(len(running), 6 + 2 + 2 * pipeline.server_oom_retries)
+        self.assertIn('all_to_y_by_oom ran out of memory in the Weka server; retrying with the same heap', lines)
+        self.assertFalse(any('MB' in line for line in lines))
+        with open(os.path.join(self.file_path, 'all_to_y_by_oom_errors.txt')) as errors:
+            self.assertIn('OutOfMemoryError: Java heap space, on run {}'.format(1 + pipeline.server_oom_retries), errors.read())
+
+        results = self.pipeline.results()
+        self.assertEqual(sorted(results.index), sorted(model_name for model_name, code in codes.iteritems() if code == 0))
+        self.assertTrue((results['Instances'] == len(self.data)).all())
+        summary = self.pipeline.summary()
+        correct = summary[summary['Metric'] == 'Correctly Classified Instances']['Value']
+        self.assertTrue((correct == (~self.data['y']).sum()).all())
+
+        # only the models that failed run again
+        codes, lines = self.run_models()
+        self.assertEqual(sorted(line for line in lines if line.startswith('Running ')),
+                         sorted(['Running all_to_y_by_oom in the Weka server', 'Running x_to_y_by_oom in the Weka server'] * (1 + pipeline.server_oom_retries)))
+        self.assertEqual(codes['all_to_y_by_j48'], 0)
+
+    def test_sparse(self):
+        pipeline.run_models([self.pipeline], server=self.server, sparse=True)
+        self.assertTrue((self.pipeline.results()['Instances'] == len(self.data)).all())
+
+    def test_rows(self):
+        self.pipeline.rows = self.data['x'].values < .5
+        pipeline.run_models([self.pipeline], server=self.server)
+        self.assertTrue((self.pipeline.results()['Instances'] == self.pipeline.rows.sum()).all())
+
+    def test_server_job(self):
+        errors = os.path.join(self.file_path, 'errors.txt')
+        results, thresholds = os.path.join(self.file_path, 'results.txt'), os.path.join(self.file_path, 'thresholds.csv')
+        # the dataset isn't loaded yet
+        job = self.server.run(self.file_path, ['x'], 'y', 'trees.J48', True, results, thresholds, errors)
+        job.join()
+        self.assertEqual(job.poll(), 1)
+        with open(errors) as f:
+            self.assertIn('KeyError', f.read())
+
+        self.pipeline.load_server_dataset(self.server)
+        job = self.server.run(self.file_path, ['x'], 'y', 'trees.J48', True, results, thresholds, errors)
+        job.join()
+        self.assertEqual(job.poll(), 0)
+        self.assertEqual(os.path.getsize(errors), 0)
+        self.assertTrue(os.path.exists(results) and os.path.exists(thresholds))
+
+        job = self.server.run(self.file_path, ['z'], 'y', 'trees.J48', True, results, thresholds, errors)
+        job.join()
+        self.assertEqual(job.poll(), 1)
+
+    def test_load_error(self):
+        self.assertRaises(RuntimeError, self.server.load, 'missing', os.path.join(self.file_path, 'missing.arff'))
+
+    def test_folds(self):
+        self.assertRaises(ValueError, pipeline.run_models, [self.pipeline], server=self.server, folds=2)
+
+class GroupedPipelineTest(unittest.TestCase):
+    """Each group's models run on its rows, all in one pool in the Weka server, (the mock one,) through
+    :class:`pipeline.GroupedPipeline`."""
+
+    def setUp(self):
+        self.saved = pipeline.poll_interval, pipeline.run_models
+        pipeline.poll_interval = .01
+        self.file_path = tempfile.mkdtemp()
+        rng = np.random.RandomState(0)
+        n = 200
+        self.data = pd.DataFrame({'x': rng.rand(n),
+                                  'g': np.array(['Street Outreach', 'SSVF'])[rng.randint(2, size=n)],
+                                  'y': rng.rand(n) < .2})
+        self.grouped = pipeline.GroupedPipeline(self.data, self.file_path, 'g', {'x': ['x']}, ['y'],
+                                                {'j48': 'trees.J48 -M 50', 'oom_once': 'mock.OutOfMemoryOnce'})
+        # record each pool of pipelines run
+        self.pools = []
+        run_models = pipeline.run_models
+        def record(pipelines, *args, **kwargs):
+            self.pools.append(pipelines)
+            return run_models(pipelines, *args, **kwargs)
+        pipeline.run_models = record
+        self.server = pipeline.WekaServer(command=[sys.executable, mock_weka_server])
+
+    def tearDown(self):
+        self.server.close()
+        shutil.rmtree(self.file_path)
+        pipeline.poll_interval, pipeline.run_models = self.saved
+
+    def test_groups(self):
+        self.assertEqual(sorted(self.grouped.pipelines), ['SSVF', 'Street Outreach'])
+        for group, p in self.grouped.pipelines.iteritems():
+            # each group's pipeline picks out its rows of the same data frame, without copying it
+            self.assertIs(p.data, self.data)
+            np.testing.assert_array_equal(p.rows, (self.data['g'] == group).values)
+        self.assertEqual(self.grouped.pipelines['Street Outreach'].file_path, os.path.join(self.file_path, 'Street_Outreach'))
+
+        codes = self.grouped.model(server=self.server)
+        self.assertEqual(codes, {group: {'x_to_y_by_j48': 0, 'x_to_y_by_oom_once': 0} for group in self.grouped.pipelines})
+        # every group's models ran in one pool
+        self.assertEqual(len(self.pools), 1)
+        self.assertEqual(sorted(self.pools[0]), sorted(self.grouped.pipelines.values()))
+
+        results = self.grouped.results()
+        self.assertEqual(sorted(results.index), [(group, model_name) for group in ('SSVF', 'Street Outreach')
+                                                 for model_name in ('x_to_y_by_j48', 'x_to_y_by_oom_once')])
+        counts = self.data['g'].value_counts()
+        for (group, model_name), row in results.iterrows():
+            self.assertEqual(row['g'], group)
+            self.assertEqual(row['Instances'], counts[group])
+        summary = self.grouped.summary()
+        correct = summary[summary['Metric'] == 'Correctly Classified Instances']
+        for group, value in zip(correct['g'], correct['Value']):
+            self.assertEqual(value, (~self.data['y'][self.data['g'] == group]).sum())
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,126 @@
+"""The Weka server, for :mod:`pipeline`.
+
+Run Weka in one long-lived JVM, which keeps datasets loaded and runs models on them, instead of starting a JVM, (two,
+actually,) and parsing the dataset from text again for every model, like `run_weka.sh` does.  This is a Jython script,
+so run it with weka.jar on the classpath:
+
+    jython -J-Xmx28g -J-cp /usr/share/java/weka.jar weka_server.py
+
+It listens on a local port, which it prints on startup, and talks JSON, one request and one response per line.  Each
+connection is handled in its own thread, so models on separate connections run in parallel.  Requests are either
+
+    {"command": "load", "dataset": NAME, "path": ARFF}
+
+to load an ARFF, (or any file Weka can load,) as dataset NAME, or
+
+    {"command": "run", "dataset": NAME, "features": [COLUMN, ...], "target": COLUMN, "classifier": "trees.J48 -M 50",
+     "label": "True", "results": RESULTS, "thresholds": THRESHOLDS}
+
+to run a model on some of a loaded dataset's columns, writing the same results and thresholds files as `run_weka.sh`,
+(the thresholds for the class `label`).  Responses are {"status": "ok"}, or {"status": "error", "message": MESSAGE}.
+See :class:`pipeline.WekaServer` for the client.
+
+"""
+import os, sys, json, time, threading, traceback, SocketServer
+import jarray
+from java.io import File
+from java.lang import OutOfMemoryError
+from java.util import Random
+from weka.core import Utils
+from weka.core.converters import ConverterUtils, CSVSaver
+from weka.classifiers import AbstractClassifier, Evaluation
+from weka.classifiers.evaluation import ThresholdCurve
+from weka.filters import Filter
+from weka.filters.unsupervised.attribute import Remove
+
+# The number of cross-validation folds, and the seed for them, (Weka's defaults for `-t`, as run by `run_weka.sh`)
+folds = 10
+seed = 1
+
+datasets = {}
+datasets_lock = threading.Lock()
+
+def load(request):
+    """Load a dataset into `datasets`.
+
+    :param request: The request, with the dataset's name and path.
+    :type request: dict.
+
+    """
+    data = ConverterUtils.DataSource.read(request['path'])
+    with datasets_lock:
+        datasets[request['dataset']] = data
+
+def run(request):
+    """Run a model on a loaded dataset, writing its results and thresholds.
+
+    :param request: The request, with the dataset's name, the features, target, classifier, and label to use, and the
+                    paths to write to.
+    :type request: dict.
+
+    """
+    with datasets_lock:
+        dataset = datasets[request['dataset']]
+    columns = request['features'] + [request['target']]
+    remove = Remove()
+    remove.setAttributeIndicesArray(jarray.array([dataset.attribute(c).index() for c in columns], 'i'))
+    remove.setInvertSelection(True)
+    remove.setInputFormat(dataset)
+    data = Filter.useFilter(dataset, remove)
+    data.setClass(data.attribute(request['target']))
+    data.deleteWithMissingClass()
+
+    options = Utils.splitOptions(request['classifier'])
+    name = options[0]
+    options[0] = ''
+    classifier = AbstractClassifier.forName('weka.classifiers.' + name, options)
+    evaluation = Evaluation(data)
+    start = time.time()
+    evaluation.crossValidateModel(AbstractClassifier.makeCopy(classifier), data, folds, Random(seed))
+    cross_validation = time.time() - start
+    classifier.buildClassifier(data)
+    build = time.time() - start - cross_validation
+    # write to temporary files, and rename them once they're written, so a killed server never leaves half of either
+    with open(request['results'] + '.tmp', 'w') as results:
+        results.write(str(classifier))
+        results.write('\nTime taken to build model: {:.2f} seconds\n'.format(build))
+        results.write('\nTime taken to perform cross-validation: {:.2f} seconds\n'.format(cross_validation))
+        results.write(evaluation.toSummaryString('\n=== Stratified cross-validation ===\n', False))
+        if data.classAttribute().isNominal():
+            results.write(evaluation.toClassDetailsString())
+            results.write(evaluation.toMatrixString())
+
+    if data.classAttribute().isNominal():
+        label = max(data.classAttribute().indexOfValue(request.get('label', '')), 0)
+        saver = CSVSaver()
+        saver.setInstances(ThresholdCurve().getCurve(evaluation.predictions(), label))
+        saver.setFile(File(request['thresholds'] + '.tmp.csv'))
+        saver.writeBatch()
+        os.rename(request['thresholds'] + '.tmp.csv', request['thresholds'])
+    os.rename(request['results'] + '.tmp', request['results'])
+
+commands = {'load': load, 'run': run}
+
+class Handler(SocketServer.StreamRequestHandler):
+    def handle(self):
+        for line in iter(self.rfile.readline, ''):
+            request = json.loads(line)
+            try:
+                commands[request['command']](request)
+                response = {'status': 'ok'}
+            except OutOfMemoryError, e:
+                response = {'status': 'error', 'message': 'java.lang.OutOfMemoryError: {}'.format(e.getMessage())}
+            except Exception:
+                response = {'status': 'error', 'message': traceback.format_exc()}
+            self.wfile.write(json.dumps(response) + '\n')
+            self.wfile.flush()
+
+class Server(SocketServer.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+if __name__ == '__main__':
+    server = Server(('localhost', int(sys.argv[1]) if len(sys.argv) > 1 else 0), Handler)
+    print server.server_address[1]
+    sys.stdout.flush()
+    server.serve_forever()